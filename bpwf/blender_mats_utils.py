@@ -1,6 +1,6 @@
 import bpy
 import bpy_extras
-from mathutils import Matrix
+from mathutils import Matrix, Vector
 
 #---------------------------------------------------------------
 # 3x4 P matrix from Blender camera
@@ -203,8 +203,8 @@ def projection_matrix(camd):
 # Alternate 3D coordinates to 2D pixel coordinate projection code
 # adapted from http://blender.stackexchange.com/questions/882/how-to-find-image-coordinates-of-the-rendered-vertex?lq=1
 # to have the y axes pointing up and origin at the top-left corner
-def project_by_object_utils(cam, point):
-    scene = bpy.context.scene
+def project_by_object_utils(cam, point, scene=None):
+    scene = scene or bpy.context.scene
     co_2d = bpy_extras.object_utils.world_to_camera_view(scene, cam, point)
     render_scale = scene.render.resolution_percentage / 100
     render_size = (
@@ -6,10 +6,20 @@ Core scene management and rendering using bpy directly.
 from __future__ import print_function
 import os
 import copy
+import time
 import random
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 import numpy as np
 from colour import Color
 
+from . import spec as _spec
+from .spec import recorded
+from .frames import FrameSource
+from .geometry_cache import GeometryCache
+
 try:
     import bpy
 except ImportError:
@@ -18,6 +28,320 @@ except ImportError:
 
 np.set_printoptions(threshold=np.inf)
 
+# Object types with geometry that auto-framing takes into account
+_FRAMED_TYPES = ('MESH', 'CURVE', 'CURVES', 'SURFACE', 'META', 'FONT',
+                 'VOLUME', 'POINTCLOUD')
+
+# Datablock types purge() removes, in an order where removing one type can
+# orphan the next (objects' data first, then their materials and textures)
+_PURGE_TYPES = ('meshes', 'curves', 'hair_curves', 'volumes', 'lights', 'cameras',
+                'materials', 'node_groups', 'images')
+
+
+def _alpha_over(top, bottom):
+    """Composite straight-alpha RGBA float images, ``top`` over ``bottom``."""
+    top_alpha = top[..., 3:4]
+    bottom_alpha = bottom[..., 3:4]
+    alpha = top_alpha + bottom_alpha * (1. - top_alpha)
+    rgb = top[..., :3] * top_alpha + bottom[..., :3] * bottom_alpha * (1. - top_alpha)
+    rgb = np.divide(rgb, alpha, out=np.zeros_like(rgb), where=alpha > 0)
+    return np.concatenate([rgb, alpha], axis=-1)
+
+
+def _downsample(arr, factor):
+    """Block-average a 3D array by an integer factor along every axis."""
+    if factor == 1:
+        return np.asarray(arr, dtype=np.float32)
+    pad = [(0, -size % factor) for size in arr.shape]
+    arr = np.pad(np.asarray(arr, dtype=np.float32), pad, mode='edge')
+    nx, ny, nz = (size // factor for size in arr.shape)
+    return arr.reshape(nx, factor, ny, factor, nz, factor).mean(axis=(1, 3, 5))
+
+
+def _colormap_stops(colormap, n=8):
+    """Sample a matplotlib colormap into (position, RGBA) color ramp stops."""
+    import matplotlib
+    
+    cmap = matplotlib.colormaps[colormap] if isinstance(colormap, str) else colormap
+    positions = np.linspace(0., 1., n)
+    return [(float(pos), tuple(float(v) for v in cmap(pos))) for pos in positions]
+
+
+def _build_color_ramp(nodes, colormap, n=8):
+    """Create a ColorRamp node whose stops follow a matplotlib colormap."""
+    ramp = nodes.new("ShaderNodeValToRGB")
+    elements = ramp.color_ramp.elements
+    stops = _colormap_stops(colormap, n)
+    # A new ramp has two elements; reuse them for the end stops
+    elements[0].position, elements[0].color = stops[0]
+    elements[1].position, elements[1].color = stops[-1]
+    for position, color in stops[1:-1]:
+        elements.new(position).color = color
+    return ramp
+
+
+def _face_arrays(faces):
+    """Flatten faces into loop vertex indices and per-polygon loop starts.
+    
+    ``faces`` is either an (F, k) array of polygons with k corners each or a
+    sequence of index sequences of any lengths.
+    """
+    if isinstance(faces, np.ndarray) and faces.ndim == 2:
+        faces = np.ascontiguousarray(faces, dtype=np.int32)
+        k = faces.shape[1]
+        return faces.ravel(), np.arange(0, faces.size, k, dtype=np.int32)
+    sizes = np.fromiter((len(face) for face in faces), dtype=np.int32, count=len(faces))
+    loops = (np.concatenate([np.asarray(face, dtype=np.int32) for face in faces])
+             if len(faces) else np.zeros(0, dtype=np.int32))
+    starts = np.zeros(len(sizes), dtype=np.int32)
+    np.cumsum(sizes[:-1], out=starts[1:])
+    return loops, starts
+
+
+# Freudenthal split of a unit cube into six tetrahedra around its
+# (0, 0, 0)-(1, 1, 1) diagonal; neighbouring cubes share face diagonals,
+# so surfaces stay closed across cube and chunk boundaries
+_CUBE_CORNERS = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [1, 1, 0],
+                          [0, 0, 1], [1, 0, 1], [0, 1, 1], [1, 1, 1]])
+_CUBE_TETS = ((0, 1, 3, 7), (0, 3, 2, 7), (0, 2, 6, 7),
+              (0, 6, 4, 7), (0, 4, 5, 7), (0, 5, 1, 7))
+
+
+def _tet_triangles():
+    """Triangles, as corner pairs of crossed edges, for the 16 tetrahedron cases."""
+    table = []
+    for case in range(16):
+        inside = [i for i in range(4) if case >> i & 1]
+        outside = [i for i in range(4) if not case >> i & 1]
+        if len(inside) in (0, 4):
+            table.append([])
+        elif len(inside) in (1, 3):
+            apex, = inside if len(inside) == 1 else outside
+            table.append([[(apex, other) for other in range(4) if other != apex]])
+        else:
+            (a, b), (c, d) = inside, outside
+            table.append([[(a, c), (a, d), (b, d)], [(a, c), (b, d), (b, c)]])
+    return table
+
+
+_TET_TRIANGLES = _tet_triangles()
+
+
+def _isosurface(volume, level, spacing=1.0, origin=(0., 0., 0.), chunk=32):
+    """Extract an isosurface from a 3D array by marching tetrahedra.
+    
+    The volume is read in slabs of ``chunk`` cells along the first axis, so
+    memory-mapped volumes are never loaded whole; only cells the surface
+    crosses are processed. Vertices on shared edges are merged, and normals
+    point from values above ``level`` towards values below it.
+    
+    Returns:
+        (vertices, faces, normals) arrays
+    """
+    nx, ny, nz = volume.shape
+    if min(nx, ny, nz) < 2:
+        raise ValueError(f"Volume must have at least 2 samples per axis, got {volume.shape}")
+    spacing = np.broadcast_to(np.asarray(spacing, dtype=np.float64), (3,))
+    origin = np.asarray(origin, dtype=np.float64)
+    keys, positions, normals = [], [], []
+    
+    for x0 in range(0, nx - 1, chunk):
+        x1 = min(x0 + chunk, nx - 1)
+        # One extra slice on each side keeps gradients continuous across slabs
+        lo, hi = max(x0 - 1, 0), min(x1 + 2, nx)
+        slab = np.asarray(volume[lo:hi], dtype=np.float32)
+        grad = np.stack(np.gradient(slab, *spacing), axis=-1)
+        slab = slab[x0 - lo:x1 - lo + 1]
+        grad = grad[x0 - lo:x1 - lo + 1]
+        
+        inside = slab >= level
+        corners = [inside[dx:dx + x1 - x0, dy:dy + ny - 1, dz:dz + nz - 1]
+                   for dx, dy, dz in _CUBE_CORNERS]
+        crossed = np.logical_or.reduce(corners) & ~np.logical_and.reduce(corners)
+        cells = np.argwhere(crossed)
+        if not len(cells):
+            continue
+        
+        for tet in _CUBE_TETS:
+            nodes = cells[:, None, :] + _CUBE_CORNERS[list(tet)]
+            values = slab[nodes[..., 0], nodes[..., 1], nodes[..., 2]]
+            case = ((values >= level) << np.arange(4)).sum(axis=1)
+            for code in range(1, 15):
+                sel = np.nonzero(case == code)[0]
+                if not len(sel):
+                    continue
+                for triangle in _TET_TRIANGLES[code]:
+                    a = np.array([edge[0] for edge in triangle])
+                    b = np.array([edge[1] for edge in triangle])
+                    na, nb = nodes[sel][:, a], nodes[sel][:, b]
+                    va, vb = values[sel][:, a], values[sel][:, b]
+                    t = ((level - va) / (vb - va))[..., None]
+                    ga, gb = na + (x0, 0, 0), nb + (x0, 0, 0)
+                    la = (ga[..., 0].astype(np.int64) * ny + ga[..., 1]) * nz + ga[..., 2]
+                    lb = (gb[..., 0].astype(np.int64) * ny + gb[..., 1]) * nz + gb[..., 2]
+                    # An edge is keyed by its (lower, upper) node pair
+                    keys.append(np.stack([np.minimum(la, lb), np.maximum(la, lb)], axis=-1))
+                    positions.append(origin + spacing * (ga + t * (gb - ga)))
+                    grad_a = grad[na[..., 0], na[..., 1], na[..., 2]]
+                    grad_b = grad[nb[..., 0], nb[..., 1], nb[..., 2]]
+                    normals.append(-(grad_a + t * (grad_b - grad_a)))
+    
+    if not keys:
+        return (np.zeros((0, 3), dtype=np.float32), np.zeros((0, 3), dtype=np.int32),
+                np.zeros((0, 3), dtype=np.float32))
+    keys = np.concatenate(keys)
+    positions = np.concatenate(positions)
+    normals = np.concatenate(normals)
+    
+    # Wind every triangle so its face normal agrees with the field normal
+    face_normals = np.cross(positions[:, 1] - positions[:, 0], positions[:, 2] - positions[:, 0])
+    flip = np.einsum('ij,ij->i', face_normals, normals.sum(axis=1)) < 0
+    for corners in (keys, positions, normals):
+        corners[flip] = corners[flip][:, ::-1]
+    
+    # View each node pair as one opaque 16-byte value so np.unique compares
+    # pairs exactly, with no arithmetic that could overflow on large grids
+    pairs = np.ascontiguousarray(keys.reshape(-1, 2)).view(np.dtype((np.void, 16))).ravel()
+    _, first, faces = np.unique(pairs, return_index=True, return_inverse=True)
+    vertices = positions.reshape(-1, 3)[first]
+    normals = normals.reshape(-1, 3)[first]
+    length = np.linalg.norm(normals, axis=1, keepdims=True)
+    normals = np.divide(normals, length, out=np.zeros_like(normals), where=length > 0)
+    return (vertices.astype(np.float32), faces.reshape(-1, 3).astype(np.int32),
+            normals.astype(np.float32))
+
+
+def _write_attribute(mesh, name, values):
+    """Write a per-vertex attribute, creating it from the array shape if needed.
+    
+    (V,) arrays become FLOAT, (V, 3) FLOAT_VECTOR and (V, 4) FLOAT_COLOR
+    attributes; existing color attributes also accept RGB arrays.
+    """
+    values = np.asarray(values)
+    attr = mesh.attributes.get(name)
+    if attr is not None:
+        data_type = attr.data_type
+    else:
+        if values.ndim == 1:
+            data_type = 'FLOAT'
+        elif values.shape[1] == 3:
+            data_type = 'FLOAT_VECTOR'
+        elif values.shape[1] == 4:
+            data_type = 'FLOAT_COLOR'
+        else:
+            raise ValueError(f"Attribute '{name}' must have shape (V,), "
+                             f"(V, 3) or (V, 4), got {values.shape}")
+        attr = mesh.attributes.new(name, data_type, 'POINT')
+    if data_type == 'FLOAT':
+        attr.data.foreach_set("value", np.ascontiguousarray(values, dtype=np.float32).ravel())
+    elif data_type == 'FLOAT_VECTOR':
+        attr.data.foreach_set("vector", np.ascontiguousarray(values, dtype=np.float32).ravel())
+    else:
+        attr.data.foreach_set("color", _rgba_array(values, len(values)).ravel())
+
+
+# foreach_get field, values per element and dtype of each attribute type
+_ATTRIBUTE_BUFFERS = {
+    'FLOAT': ('value', 1, np.float32),
+    'INT': ('value', 1, np.int32),
+    'INT8': ('value', 1, np.int8),
+    'BOOLEAN': ('value', 1, bool),
+    'FLOAT2': ('vector', 2, np.float32),
+    'FLOAT_VECTOR': ('vector', 3, np.float32),
+    'FLOAT_COLOR': ('color', 4, np.float32),
+    'BYTE_COLOR': ('color', 4, np.float32),
+    'QUATERNION': ('value', 4, np.float32),
+}
+
+
+def _mesh_arrays(mesh):
+    """Read a mesh's vertices, loops and polygons into NumPy arrays."""
+    co = np.empty(len(mesh.vertices) * 3, dtype=np.float32)
+    mesh.vertices.foreach_get("co", co)
+    loops = np.empty(len(mesh.loops), dtype=np.int32)
+    mesh.loops.foreach_get("vertex_index", loops)
+    loop_starts = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("loop_start", loop_starts)
+    material_index = np.empty(len(mesh.polygons), dtype=np.int32)
+    mesh.polygons.foreach_get("material_index", material_index)
+    use_smooth = np.empty(len(mesh.polygons), dtype=bool)
+    mesh.polygons.foreach_get("use_smooth", use_smooth)
+    return {"co": co, "loops": loops, "loop_starts": loop_starts,
+            "material_index": material_index, "use_smooth": use_smooth}
+
+
+def _attribute_arrays(mesh):
+    """Read a mesh's own attributes (UV maps included) into NumPy arrays.
+    
+    Attributes written by _mesh_arrays and Blender's internal ones are
+    skipped. Returns None when the mesh holds data that cannot be restored
+    from arrays: custom split normals, edge attributes (edges are rebuilt
+    in a new order) or attribute types without a bulk accessor.
+    """
+    if mesh.has_custom_normals:
+        return None
+    names, arrays = [], {}
+    for attr in mesh.attributes:
+        if attr.name.startswith('.') or attr.name in ('position', 'material_index', 'sharp_face'):
+            continue
+        if attr.domain == 'EDGE' or attr.data_type not in _ATTRIBUTE_BUFFERS:
+            return None
+        field, width, dtype = _ATTRIBUTE_BUFFERS[attr.data_type]
+        values = np.empty(len(attr.data) * width, dtype=dtype)
+        attr.data.foreach_get(field, values)
+        arrays[f"attr_{len(names)}"] = values
+        names.append(f"{attr.name}\t{attr.domain}\t{attr.data_type}")
+    arrays["attr_names"] = np.array(names, dtype=str)
+    return arrays
+
+
+def _mesh_from_arrays(name, arrays):
+    """Create a mesh datablock from arrays in the layout of _mesh_arrays."""
+    mesh = bpy.data.meshes.new(name)
+    mesh.vertices.add(len(arrays["co"]) // 3)
+    mesh.vertices.foreach_set("co", np.ascontiguousarray(arrays["co"], dtype=np.float32).ravel())
+    mesh.loops.add(len(arrays["loops"]))
+    mesh.loops.foreach_set("vertex_index", np.ascontiguousarray(arrays["loops"], dtype=np.int32))
+    mesh.polygons.add(len(arrays["loop_starts"]))
+    if "material_index" in arrays:
+        mesh.polygons.foreach_set("material_index",
+                                  np.ascontiguousarray(arrays["material_index"], dtype=np.int32))
+    mesh.polygons.foreach_set("loop_start",
+                              np.ascontiguousarray(arrays["loop_starts"], dtype=np.int32))
+    if "use_smooth" in arrays:
+        mesh.polygons.foreach_set("use_smooth", np.ascontiguousarray(arrays["use_smooth"], dtype=bool))
+    for i, spec in enumerate(arrays.get("attr_names", ())):
+        name, domain, data_type = str(spec).split('\t')
+        field, _, dtype = _ATTRIBUTE_BUFFERS[data_type]
+        attr = mesh.attributes.new(name, data_type, domain)
+        attr.data.foreach_set(field, np.ascontiguousarray(arrays[f"attr_{i}"], dtype=dtype))
+    return mesh
+
+
+def _z_to_quaternion(normal):
+    """Quaternion (w, x, y, z) rotating the +Z axis onto ``normal``."""
+    normal = np.asarray(normal, dtype=np.float64)
+    normal = normal / np.linalg.norm(normal)
+    dot = normal[2]
+    if dot < -1. + 1e-9:
+        # Opposite directions: half a turn about X
+        return (0., 1., 0., 0.)
+    quat = np.array([1. + dot, -normal[1], normal[0], 0.])
+    return tuple(quat / np.linalg.norm(quat))
+
+
+def _rgba_array(colors, n):
+    """Normalize per-element colors to a contiguous (n, 4) float32 array.
+
+    Accepts (n, 3) or (n, 4) arrays of floats in [0, 1] or of uint8.
+    """
+    colors = np.asarray(colors)
+    scale = 255.0 if colors.dtype == np.uint8 else 1.0
+    colors = colors.astype(np.float32).reshape(n, -1) / scale
+    if colors.shape[1] == 3:
+        colors = np.hstack([colors, np.ones((n, 1), dtype=np.float32)])
+    return np.ascontiguousarray(colors)
+
 
 class FileStringStream:
     """Helper class for building script strings (kept for compatibility)."""
@@ -46,6 +370,9 @@ class PrincipledBSDF:
         if bpy is None:
             raise RuntimeError("bpy module not available. Install with: pip install bpy")
         
+        # Constructor arguments, kept so scene specs can recreate the material
+        self.params = dict(name=name, color=color, specular=specular, roughness=roughness)
+        
         if isinstance(color, str):
             rgb = Color(color).rgb
         else:
@@ -90,12 +417,10 @@ class bpwf:
             raise RuntimeError("bpy module not available. Install with: pip install bpy")
         
         self.filename = "brender_01"
-        self.has_run = False
-        self.proj_matrix = None
         self._draft = False
         self.path = os.getcwd()
         self.default_light = default_light
-        self.particles = []
+        self._init_state()
         
         # Support multiple scenes
         if scene_name:
@@ -106,6 +431,28 @@ class bpwf:
         
         self.scene_setup()
     
+    def _init_state(self):
+        """Reset the per-scene bookkeeping to that of an empty scene."""
+        self.has_run = False
+        self.proj_matrix = None
+        self.particles = []
+        self._objects = {}
+        self._layers = {}
+        self._materials = {}
+        self._ops = []
+        self._record_depth = 0
+        self._render_state = None
+        self.last_changes = None
+        self._auto_purge = set()
+        self._assembly = None
+        self._assemblies = {}
+        self.last_timings = None
+        self._layer_state = {}
+        self._style = None
+        self._volumes = {}
+        self._geometry_cache = GeometryCache.from_env()
+        self._annotations = []
+    
     def scene_setup(self):
         """Set up the scene by removing default objects."""
         # Delete default cube if it exists
@@ -122,7 +469,10 @@ class bpwf:
             if light.name in self.scene.objects:
                 bpy.data.objects.remove(light, do_unlink=True)
         
-        # Create collections for organization
+        self._layer_collections()
+    
+    def _layer_collections(self):
+        """Find or create the collections shared by all scenes for layers."""
         if "freestyle_group" not in bpy.data.collections:
             self.fg = bpy.data.collections.new("freestyle_group")
         else:
@@ -133,12 +483,129 @@ class bpwf:
         else:
             self.tg = bpy.data.collections["transparent_group"]
     
+    def _register(self, name, obj, layer=None):
+        """Record the object created for a user-facing name.
+        
+        Blender renames datablocks whose names are taken (``name.001``), so
+        bpwf keeps its own map from the names callers used to the objects it
+        actually created, and links the object into its layer collection.
+        
+        Args:
+            name: Name the caller asked for
+            obj: Object that was created
+            layer: Layer assignment ('render', 'trans' or None)
+        """
+        self._objects[name] = obj
+        self._layers[name] = layer
+        if layer == 'render':
+            self.fg.objects.link(obj)
+        elif layer == 'trans':
+            self.tg.objects.link(obj)
+    
+    def _unregister(self, name):
+        """Forget a registered object."""
+        self._objects.pop(name, None)
+        self._layers.pop(name, None)
+    
+    def _release_materials(self, name):
+        """Forget the materials created for one object, so purge() may remove them."""
+        for suffix in ('_color', '_sem'):
+            self._materials.pop(f"{name}{suffix}", None)
+    
+    def _lookup(self, name):
+        """Return the object a name refers to in this scene, or None.
+        
+        Objects created by this scene are found in the registry; other
+        objects fall back to a lookup in ``bpy.data.objects``.
+        """
+        obj = self._objects.get(name)
+        if obj is not None:
+            try:
+                obj.name
+                return obj
+            except ReferenceError:
+                # Removed from Blender behind our back
+                self._unregister(name)
+        if name in bpy.data.objects:
+            return bpy.data.objects[name]
+        return None
+    
+    def _scene_objects(self):
+        """Return the objects this scene renders, including assembly members."""
+        objects = {obj.name: obj for obj in self.scene.objects}
+        for coll in self._assemblies.values():
+            for obj in coll.all_objects:
+                objects.setdefault(obj.name, obj)
+        return list(objects.values())
+    
+    @staticmethod
+    def _own_data(obj):
+        """Return an object's data, copying it first if other objects share it.
+        
+        Forks share mesh data with the scene they came from until one of
+        them modifies it.
+        """
+        if obj.data.users > 1:
+            obj.data = obj.data.copy()
+        return obj.data
+    
+    def _own_material(self, material):
+        """Return a material only this scene uses, copying it if another scene shares it.
+        
+        The copy replaces the material in every slot of this scene that used
+        it (as an object-linked slot, so shared mesh data is left alone) and
+        in the material registry.
+        """
+        slots = [slot for obj in self._scene_objects() for slot in obj.material_slots
+                 if slot.material == material]
+        if material.users - int(material.use_fake_user) <= len(slots):
+            return material
+        copied = material.copy()
+        for slot in slots:
+            slot.link = 'OBJECT'
+            slot.material = copied
+        for name, registered in list(self._materials.items()):
+            if registered == material:
+                self._materials[name] = copied
+        return copied
+    
+    def _lookup_material(self, name):
+        """Return the material a name refers to in this scene, or None."""
+        mat = self._materials.get(name)
+        if mat is not None:
+            try:
+                mat.name
+                return mat
+            except ReferenceError:
+                self._materials.pop(name, None)
+        if name in bpy.data.materials:
+            return bpy.data.materials[name]
+        return None
+    
+    def objects(self, layer=None):
+        """List the names of objects created in this scene.
+        
+        Args:
+            layer: Only list objects on this layer ('render' or 'trans')
+        
+        Returns:
+            List of object names
+        """
+        if layer is None:
+            return list(self._objects)
+        return [name for name, obj_layer in self._layers.items() if obj_layer == layer]
+    
+    @recorded
     def delete(self, name):
         """Delete an object by name."""
-        if name in bpy.data.objects:
-            obj = bpy.data.objects[name]
+        obj = self._lookup(name)
+        if obj is not None:
+            self._unregister(name)
+            self._release_materials(name)
             bpy.data.objects.remove(obj, do_unlink=True)
+            self._maybe_purge('delete')
     
+    @recorded
     def sun(self, strength=1.0):
         """Create a sun lamp.
         
@@ -154,9 +621,11 @@ class bpwf:
         
         light_object = bpy.data.objects.new(name="Sun", object_data=light_data)
         self.scene.collection.objects.link(light_object)
+        self._register("Sun", light_object)
         
         return self
     
+    @recorded
     def point(self, location=(0., 0., 0.), strength=1.0, name="Point",
               color='#555555', alpha=1.0, layer='render'):
         """Create a point light.
@@ -180,11 +649,9 @@ class bpwf:
         rgb = Color(color).rgb
         light_data.color = (rgb[0], rgb[1], rgb[2])
         
-        if layer == 'render':
-            self.fg.objects.link(light_object)
-        elif layer == 'trans':
-            self.tg.objects.link(light_object)
+        self._register(name, light_object, layer)
     
+    @recorded
     def sph(self, c=None, r=None, name="sph", color=None, alpha=1.0,
             emis=False, layer='render', subd=4, **kwargs):
         """Create a sphere.
@@ -205,10 +672,7 @@ class bpwf:
         obj.scale = (r, r, r)
         bpy.ops.object.transform_apply(location=True, scale=True)
         
-        if layer == 'render':
-            self.fg.objects.link(obj)
-        elif layer == 'trans':
-            self.tg.objects.link(obj)
+        self._register(name, obj, layer)
         
         if color == 'sem':
             self.sem(name=f'{name}_sem')
@@ -220,6 +684,7 @@ class bpwf:
             self.emis(name=f"{name}_color", alpha=alpha, color=color, **kwargs)
             self.set_matl(obj=name, matl=f"{name}_color")
     
+    @recorded
     def rpp(self, x1=None, x2=None, y1=None, y2=None, z1=None, z2=None, c=None,
             l=None, name="rpp", color=None, alpha=1.0, verts=None,
             emis=False, layer='render', r=None, matl=None, **kwargs):
@@ -262,10 +727,7 @@ class bpwf:
             mesh.from_pydata(verts, [], faces)
             mesh.update(calc_edges=True)
         
-        if layer == 'render':
-            self.fg.objects.link(obj)
-        elif layer == 'trans':
-            self.tg.objects.link(obj)
+        self._register(name, obj, layer)
         
         if color is not None and not emis:
             self.flat(name=f"{name}_color", color=color, alpha=alpha)
@@ -281,6 +743,7 @@ class bpwf:
                 # Assume it's a material name string
                 self.set_matl(obj=name, matl=matl)
     
+    @recorded
     def rcc(self, c=None, r=None, h=None, name="rcc", color=None, direction='z',
             alpha=1.0, emis=False, layer='render', **kwargs):
         """Create a cylinder.
@@ -325,10 +788,7 @@ class bpwf:
         obj.scale = axis
         bpy.ops.object.transform_apply(location=True, scale=True)
         
-        if layer == 'render':
-            self.fg.objects.link(obj)
-        elif layer == 'trans':
-            self.tg.objects.link(obj)
+        self._register(name, obj, layer)
         
         if color is not None and not emis:
             self.flat(name=f"{name}_color", color=color, alpha=alpha)
@@ -337,6 +797,7 @@ class bpwf:
             self.emis(name=f"{name}_color", color=color, **kwargs)
             self.set_matl(obj=name, matl=f"{name}_color")
     
+    @recorded
     def cone(self, c=(0., 0., 0.), r1=None, r2=None, h=None, name="cone",
              color=None, direction='z', alpha=1.0, emis=False, layer='render',
              rotation=None, **kwargs):
@@ -380,10 +841,7 @@ class bpwf:
         obj.rotation_euler = rotation
         bpy.ops.object.transform_apply(rotation=True, location=True)
         
-        if layer == 'render':
-            self.fg.objects.link(obj)
-        elif layer == 'trans':
-            self.tg.objects.link(obj)
+        self._register(name, obj, layer)
         
         if color is not None and not emis:
             self.flat(name=f"{name}_color", color=color, alpha=alpha)
@@ -392,6 +850,7 @@ class bpwf:
             self.emis(name=f"{name}_color", color=color, **kwargs)
             self.set_matl(obj=name, matl=f"{name}_color")
     
+    @recorded
     def plane(self, x1=None, x2=None, y1=None, y2=None, z1=None, z2=None,
               c=None, l=None, name="plane", color=None, alpha=1.0, verts=None,
               emis=False, image=None, layer='render', **kwargs):
@@ -431,10 +890,7 @@ class bpwf:
             obj.rotation_euler = r
             bpy.ops.object.transform_apply(rotation=True, location=True)
             
-            if layer == 'render':
-                self.fg.objects.link(obj)
-            elif layer == 'trans':
-                self.tg.objects.link(obj)
+            self._register(name, obj, layer)
         
         if color is not None and not emis:
             self.flat(name=f"{name}_color", color=color, alpha=alpha)
@@ -446,128 +902,1060 @@ class bpwf:
             self.image(name=f"{name}_color", fname=image, alpha=alpha)
             self.set_matl(obj=name, matl=f"{name}_color")
     
-    def subtract(self, left, right, unlink=True):
-        """Boolean subtraction operation."""
-        self.boolean(left=left, right=right, operation="DIFFERENCE", unlink=unlink)
-    
-    def union(self, left, right, unlink=True):
-        """Boolean union operation."""
-        self.boolean(left=left, right=right, operation="UNION", unlink=unlink)
-    
-    def intersect(self, left, right, unlink=True):
-        """Boolean intersection operation."""
-        self.boolean(left=left, right=right, operation="INTERSECT", unlink=unlink)
-    
-    def boolean(self, left, right, operation, unlink=True):
-        """Perform boolean operation between two objects.
+    @recorded
+    def points(self, positions, radii=0.05, colors=None, name="points",
+               color='#555555', alpha=1.0, layer='render'):
+        """Create a point cloud as a single object rendered as spheres.
+        
+        Positions, radii and colors are written straight from NumPy buffers,
+        so millions of points cost one object and one material.
         
         Args:
-            left: Left operand object name
-            right: Right operand object name
-            operation: Boolean operation type
-            unlink: Whether to unlink the right object after operation
+            positions: (N, 3) array of point positions
+            radii: Scalar radius or (N,) array of per-point radii
+            colors: Optional (N, 3) or (N, 4) array of per-point RGB(A)
+                colors, as floats in [0, 1] or uint8
+            name: Object name
+            color: Material color when no per-point colors are given
+            alpha: Transparency
+            layer: Layer assignment
+        
+        Returns:
+            The created object
         """
-        left_obj = bpy.data.objects[left]
-        right_obj = bpy.data.objects[right]
+        positions = np.ascontiguousarray(positions, dtype=np.float32).reshape(-1, 3)
+        n_points = len(positions)
+        
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(n_points)
+        mesh.vertices.foreach_set("co", positions.ravel())
+        
+        radii = np.asarray(radii, dtype=np.float32)
+        if radii.ndim > 0:
+            radius_attr = mesh.attributes.new("radius", 'FLOAT', 'POINT')
+            radius_attr.data.foreach_set("value", np.ascontiguousarray(radii.ravel()))
+        
+        if colors is not None:
+            color_attr = mesh.attributes.new("color", 'FLOAT_COLOR', 'POINT')
+            color_attr.data.foreach_set("color", _rgba_array(colors, n_points).ravel())
+        mesh.update()
+        
+        obj = bpy.data.objects.new(name, mesh)
+        self.scene.collection.objects.link(obj)
+        
+        # Convert vertices to Cycles point primitives in a geometry node tree
+        tree = bpy.data.node_groups.new(f"{name}_points", 'GeometryNodeTree')
+        tree.interface.new_socket("Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        tree.interface.new_socket("Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+        nodes = tree.nodes
+        links = tree.links
+        group_in = nodes.new("NodeGroupInput")
+        group_out = nodes.new("NodeGroupOutput")
+        to_points = nodes.new("GeometryNodeMeshToPoints")
+        links.new(group_in.outputs[0], to_points.inputs["Mesh"])
+        if radii.ndim > 0:
+            radius_node = nodes.new("GeometryNodeInputNamedAttribute")
+            radius_node.data_type = 'FLOAT'
+            radius_node.inputs["Name"].default_value = "radius"
+            links.new(radius_node.outputs["Attribute"], to_points.inputs["Radius"])
+        else:
+            to_points.inputs["Radius"].default_value = float(radii)
+        links.new(to_points.outputs["Points"], group_out.inputs[0])
         
-        modifier = left_obj.modifiers.new(type="BOOLEAN", name=f"{left}_{operation.lower()}_{right}")
-        modifier.operation = operation
-        modifier.object = right_obj
-        modifier.solver = 'EXACT'
+        modifier = obj.modifiers.new(name=f"{name}_points", type='NODES')
+        modifier.node_group = tree
         
-        # Apply modifier
-        bpy.context.view_layer.objects.active = left_obj
-        bpy.ops.object.modifier_apply(modifier=modifier.name)
+        self._register(name, obj, layer)
         
-        if unlink:
-            bpy.data.objects.remove(right_obj, do_unlink=True)
+        if colors is not None:
+            self.attribute_color(name=f"{name}_color", attribute="color", alpha=alpha)
+        else:
+            self.flat(name=f"{name}_color", color=color, alpha=alpha)
+        self.set_matl(obj=name, matl=f"{name}_color")
+        return obj
     
-    def unlink(self, name):
-        """Unlink an object from the scene."""
-        if name in bpy.data.objects:
-            obj = bpy.data.objects[name]
-            self.scene.collection.objects.unlink(obj)
+    @recorded
+    def tracks(self, polylines, radius=0.01, colors=None, lengths=None, name="tracks",
+               color='#555555', alpha=1.0, resolution=8, layer='render'):
+        """Create many polylines as tubes in a single curves object.
+        
+        Point positions are written in one bulk call and the tubes are
+        built by a Curve to Mesh node, so the object count stays at one
+        however many tracks there are.
+        
+        Args:
+            polylines: Sequence of (n_i, 3) arrays, or with ``lengths`` a
+                (P, 3) array of all points concatenated
+            radius: Tube radius
+            colors: Optional (T, 3) or (T, 4) array of per-track RGB(A)
+                colors, as floats in [0, 1] or uint8
+            lengths: Number of points in each track when ``polylines`` is
+                a concatenated array
+            name: Object name
+            color: Material color when no per-track colors are given
+            alpha: Transparency
+            resolution: Number of sides of each tube
+            layer: Layer assignment
+        
+        Returns:
+            The created object
+        """
+        if lengths is None:
+            lengths = [len(polyline) for polyline in polylines]
+            points = np.concatenate([np.asarray(polyline, dtype=np.float32).reshape(-1, 3)
+                                     for polyline in polylines])
+        else:
+            points = np.asarray(polylines, dtype=np.float32).reshape(-1, 3)
+        lengths = np.asarray(lengths, dtype=np.int64)
+        if (lengths < 2).any():
+            raise ValueError("Every track needs at least two points")
+        if lengths.sum() != len(points):
+            raise ValueError(f"Track lengths add up to {lengths.sum()}, "
+                             f"but {len(points)} points were given")
+        
+        curves = bpy.data.hair_curves.new(name)
+        curves.add_curves(lengths.tolist())
+        curves.position_data.foreach_set("vector", np.ascontiguousarray(points).ravel())
+        if colors is not None:
+            color_attr = curves.attributes.new("color", 'FLOAT_COLOR', 'CURVE')
+            color_attr.data.foreach_set("color", _rgba_array(colors, len(lengths)).ravel())
+        
+        obj = bpy.data.objects.new(name, curves)
+        self.scene.collection.objects.link(obj)
+        
+        # Sweep a circle along every track in a geometry node tree
+        tree = bpy.data.node_groups.new(f"{name}_tracks", 'GeometryNodeTree')
+        tree.interface.new_socket("Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        tree.interface.new_socket("Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+        nodes = tree.nodes
+        links = tree.links
+        group_in = nodes.new("NodeGroupInput")
+        group_out = nodes.new("NodeGroupOutput")
+        spline_type = nodes.new("GeometryNodeCurveSplineType")
+        spline_type.spline_type = 'POLY'
+        profile = nodes.new("GeometryNodeCurvePrimitiveCircle")
+        profile.inputs["Resolution"].default_value = resolution
+        profile.inputs["Radius"].default_value = float(radius)
+        to_mesh = nodes.new("GeometryNodeCurveToMesh")
+        to_mesh.inputs["Fill Caps"].default_value = True
+        links.new(group_in.outputs[0], spline_type.inputs["Curve"])
+        links.new(spline_type.outputs["Curve"], to_mesh.inputs["Curve"])
+        links.new(profile.outputs["Curve"], to_mesh.inputs["Profile Curve"])
+        links.new(to_mesh.outputs["Mesh"], group_out.inputs[0])
+        
+        modifier = obj.modifiers.new(name=f"{name}_tracks", type='NODES')
+        modifier.node_group = tree
+        
+        self._register(name, obj, layer)
+        
+        if colors is not None:
+            self.attribute_color(name=f"{name}_color", attribute="color", alpha=alpha)
+        else:
+            self.flat(name=f"{name}_color", color=color, alpha=alpha)
+        self.set_matl(obj=name, matl=f"{name}_color")
+        return obj
     
-    def flat(self, name="Flat", color='#555555', alpha=1.0):
-        """Create a flat diffuse material.
+    @recorded
+    def glyphs(self, positions, vectors, scale=1.0, colormap=None, clim=None,
+               normalize=False, name="glyphs", color='#555555', alpha=1.0,
+               layer='render'):
+        """Draw a vector field as arrows instanced on points in one object.
+        
+        One arrow is built in a geometry node tree and instanced on every
+        point, aligned with its vector and scaled by its magnitude, so 100k+
+        arrows cost one object and one material.
         
         Args:
-            name: Material name
-            color: Material color
+            positions: (N, 3) array of arrow tails
+            vectors: (N, 3) array of vectors
+            scale: Arrow length per unit of vector magnitude (or the length
+                of every arrow with ``normalize``)
+            colormap: Matplotlib colormap to color arrows by magnitude
+                (defaults to a single color)
+            clim: (min, max) magnitudes mapped to the colormap ends
+                (defaults to the magnitude range)
+            normalize: Give every arrow the same length
+            name: Object name
+            color: Arrow color without a colormap
             alpha: Transparency
+            layer: Layer assignment
+        
+        Returns:
+            The created object
         """
-        mat = bpy.data.materials.new(name)
-        rgb = Color(color).rgb
-        mat.diffuse_color = (rgb[0], rgb[1], rgb[2], alpha)
+        positions = np.ascontiguousarray(positions, dtype=np.float32).reshape(-1, 3)
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1, 3)
+        if len(vectors) != len(positions):
+            raise ValueError(f"Got {len(vectors)} vectors for {len(positions)} positions")
+        magnitude = np.linalg.norm(vectors, axis=1)
+        length = np.full_like(magnitude, scale) if normalize else magnitude * scale
+        
+        mesh = bpy.data.meshes.new(name)
+        mesh.vertices.add(len(positions))
+        mesh.vertices.foreach_set("co", positions.ravel())
+        for attr_name, values in (("direction", vectors), ("magnitude", magnitude),
+                                  ("length", length)):
+            _write_attribute(mesh, attr_name, values)
+        mesh.update()
+        
+        obj = bpy.data.objects.new(name, mesh)
+        self.scene.collection.objects.link(obj)
+        self._register(name, obj, layer)
+        
+        if colormap is not None:
+            if clim is None:
+                clim = (float(magnitude.min()), float(magnitude.max()))
+            self.scalar_color(name=f"{name}_color", attribute="magnitude",
+                              colormap=colormap, clim=clim, alpha=alpha,
+                              attribute_type='INSTANCER')
+        else:
+            self.flat(name=f"{name}_color", color=color, alpha=alpha)
         
-        if alpha < 1.0:
-            mat.use_nodes = True
-            nodes = mat.node_tree.nodes
-            nodes.clear()
-            links = mat.node_tree.links
-            
-            bsdf = nodes.new("ShaderNodeBsdfDiffuse")
-            bsdf.inputs[0].default_value = (rgb[0], rgb[1], rgb[2], alpha)
-            
-            transparent = nodes.new("ShaderNodeBsdfTransparent")
-            mix = nodes.new("ShaderNodeMixShader")
-            mix.inputs[0].default_value = 1.0 - alpha
-            
-            links.new(bsdf.outputs[0], mix.inputs[1])
-            links.new(transparent.outputs[0], mix.inputs[2])
-            
-            material_output = nodes.new("ShaderNodeOutputMaterial")
-            links.new(mix.outputs[0], material_output.inputs[0])
+        # Unit arrow along +Z: a shaft cylinder and a cone head
+        tree = bpy.data.node_groups.new(f"{name}_glyphs", 'GeometryNodeTree')
+        tree.interface.new_socket("Geometry", in_out='INPUT', socket_type='NodeSocketGeometry')
+        tree.interface.new_socket("Geometry", in_out='OUTPUT', socket_type='NodeSocketGeometry')
+        nodes = tree.nodes
+        links = tree.links
+        group_in = nodes.new("NodeGroupInput")
+        group_out = nodes.new("NodeGroupOutput")
+        
+        shaft = nodes.new("GeometryNodeMeshCylinder")
+        shaft.inputs["Vertices"].default_value = 12
+        shaft.inputs["Radius"].default_value = 0.03
+        shaft.inputs["Depth"].default_value = 0.7
+        shaft_offset = nodes.new("GeometryNodeTransform")
+        shaft_offset.inputs["Translation"].default_value = (0., 0., 0.35)
+        head = nodes.new("GeometryNodeMeshCone")
+        head.inputs["Vertices"].default_value = 12
+        head.inputs["Radius Bottom"].default_value = 0.08
+        head.inputs["Depth"].default_value = 0.3
+        head_offset = nodes.new("GeometryNodeTransform")
+        head_offset.inputs["Translation"].default_value = (0., 0., 0.85)
+        arrow = nodes.new("GeometryNodeJoinGeometry")
+        set_material = nodes.new("GeometryNodeSetMaterial")
+        set_material.inputs["Material"].default_value = self._materials[f"{name}_color"]
+        links.new(shaft.outputs["Mesh"], shaft_offset.inputs["Geometry"])
+        links.new(head.outputs["Mesh"], head_offset.inputs["Geometry"])
+        links.new(shaft_offset.outputs["Geometry"], arrow.inputs["Geometry"])
+        links.new(head_offset.outputs["Geometry"], arrow.inputs["Geometry"])
+        links.new(arrow.outputs["Geometry"], set_material.inputs["Geometry"])
+        
+        direction = nodes.new("GeometryNodeInputNamedAttribute")
+        direction.data_type = 'FLOAT_VECTOR'
+        direction.inputs["Name"].default_value = "direction"
+        align = nodes.new("FunctionNodeAlignEulerToVector")
+        align.axis = 'Z'
+        links.new(direction.outputs["Attribute"], align.inputs["Vector"])
+        arrow_length = nodes.new("GeometryNodeInputNamedAttribute")
+        arrow_length.data_type = 'FLOAT'
+        arrow_length.inputs["Name"].default_value = "length"
+        
+        instance = nodes.new("GeometryNodeInstanceOnPoints")
+        links.new(group_in.outputs[0], instance.inputs["Points"])
+        links.new(set_material.outputs["Geometry"], instance.inputs["Instance"])
+        links.new(align.outputs["Rotation"], instance.inputs["Rotation"])
+        links.new(arrow_length.outputs["Attribute"], instance.inputs["Scale"])
+        links.new(instance.outputs["Instances"], group_out.inputs[0])
+        
+        modifier = obj.modifiers.new(name=f"{name}_glyphs", type='NODES')
+        modifier.node_group = tree
+        return obj
     
-    def emis(self, name="Source", color="#555555", alpha=1.0, volume=False,
-             emittance=1.0, **kwargs):
-        """Create an emissive material.
+    @recorded
+    def mesh(self, vertices, faces, normals=None, attributes=None, name="mesh",
+             color=None, alpha=1.0, emis=False, layer='render', **kwargs):
+        """Create a mesh directly from NumPy arrays.
+        
+        Vertices, loops and polygons are written with ``foreach_set`` from
+        NumPy buffers, so multi-million-triangle meshes never pass through
+        Python lists.
         
         Args:
-            name: Material name
-            color: Emission color
+            vertices: (V, 3) array of vertex positions
+            faces: (F, k) array of vertex indices per polygon (k=3 for
+                triangles), or a sequence of index sequences for mixed
+                polygon sizes
+            normals: Optional (V, 3) array of custom vertex normals; the
+                mesh is shaded smooth with these normals
+            attributes: Optional dict of per-vertex attributes, each an
+                (V,) array of scalars, (V, 3) vectors or (V, 4) colors
+            name: Object name
+            color: Material color
             alpha: Transparency
-            volume: Whether to use volume output
-            emittance: Emission strength
+            emis: Whether to use emissive material
+            layer: Layer assignment
+        
+        Returns:
+            The created object
         """
-        if isinstance(color, str):
-            rgb = Color(color).rgb
-        else:
-            rgb = color
+        vertices = np.ascontiguousarray(vertices, dtype=np.float32).reshape(-1, 3)
+        loops, loop_starts = _face_arrays(faces)
+        mesh = _mesh_from_arrays(name, {"co": vertices, "loops": loops,
+                                        "loop_starts": loop_starts})
         
-        mat = bpy.data.materials.new(name)
+        for attr_name, values in (attributes or {}).items():
+            _write_attribute(mesh, attr_name, values)
+        mesh.update(calc_edges=True)
+        
+        if normals is not None:
+            normals = np.ascontiguousarray(normals, dtype=np.float32).reshape(-1, 3)
+            mesh.polygons.foreach_set("use_smooth", np.ones(len(loop_starts), dtype=bool))
+            mesh.normals_split_custom_set_from_vertices(normals)
+        
+        obj = bpy.data.objects.new(name, mesh)
+        self.scene.collection.objects.link(obj)
+        
+        self._register(name, obj, layer)
+        
+        if color is not None and not emis:
+            self.flat(name=f"{name}_color", color=color, alpha=alpha)
+            self.set_matl(obj=name, matl=f"{name}_color")
+        elif color is not None and emis:
+            self.emis(name=f"{name}_color", alpha=alpha, color=color, **kwargs)
+            self.set_matl(obj=name, matl=f"{name}_color")
+        return obj
+    
+    @recorded
+    def volume_from_array(self, arr, spacing=1.0, origin=(0., 0., 0.),
+                          colormap='viridis', name="volume", clim=None,
+                          density=1.0, threshold=0.0, levels=(1, 2, 4, 8),
+                          layer='render'):
+        """Create a volume object from a 3D NumPy array.
+        
+        The array is normalized to [0, 1] and written as a sparse OpenVDB
+        grid for every pyramid level, so voxels at or below ``threshold``
+        are not stored. Draft renders use the coarsest level and final
+        renders the full resolution.
+        
+        Args:
+            arr: (X, Y, Z) array of scalar values
+            spacing: Voxel size, scalar or per axis
+            origin: World position of the center of voxel (0, 0, 0)
+            colormap: Matplotlib colormap name or colormap
+            name: Object name
+            clim: (min, max) values mapped to the ends of the colormap
+                (defaults to the array range)
+            density: Density multiplier
+            threshold: Normalized values at or below this are left empty
+            levels: Downsampling factors of the resolution pyramid
+            layer: Layer assignment
+        
+        Returns:
+            The created object
+        """
+        try:
+            import pyopenvdb as vdb
+        except ImportError:
+            try:
+                import openvdb as vdb
+            except ImportError:
+                raise ImportError("volume_from_array requires the OpenVDB Python "
+                                  "module bundled with Blender (pyopenvdb/openvdb)")
+        
+        arr = np.asarray(arr)
+        if arr.ndim != 3:
+            raise ValueError(f"Expected a 3D array, got shape {arr.shape}")
+        lo, hi = clim if clim is not None else (float(arr.min()), float(arr.max()))
+        spacing = np.broadcast_to(np.asarray(spacing, dtype=np.float64), (3,))
+        
+        paths = {}
+        for factor in sorted(set(levels)):
+            values = _downsample(arr, factor)
+            values = np.clip((values - lo) / ((hi - lo) or 1.0), 0., 1.)
+            grid = vdb.FloatGrid()
+            grid.name = "density"
+            grid.copyFromArray(values, tolerance=threshold)
+            grid.prune()
+            # Block centers of coarse levels sit half a block from voxel (0, 0, 0)
+            size = spacing * factor
+            offset = spacing * (factor - 1) / 2.
+            grid.transform = vdb.createLinearTransform(
+                [[size[0], 0., 0., 0.], [0., size[1], 0., 0.],
+                 [0., 0., size[2], 0.], [*offset, 1.]])
+            path = os.path.join(self.path, f"{self.filename}_{name}_x{factor}.vdb")
+            vdb.write(path, grids=[grid])
+            paths[factor] = path
+        
+        volume = bpy.data.volumes.new(name)
+        volume.filepath = paths[min(paths)]
+        obj = bpy.data.objects.new(name, volume)
+        obj.location = tuple(origin)
+        self.scene.collection.objects.link(obj)
+        self._register(name, obj, layer)
+        self._volumes[name] = paths
+        
+        mat = bpy.data.materials.new(f"{name}_volume")
+        self._materials[f"{name}_volume"] = mat
         mat.use_nodes = True
         nodes = mat.node_tree.nodes
         nodes.clear()
         links = mat.node_tree.links
         
-        emission = nodes.new(type="ShaderNodeEmission")
-        emission.inputs[0].default_value = (rgb[0], rgb[1], rgb[2], alpha)
-        emission.inputs[1].default_value = emittance
-        
-        transparent = nodes.new("ShaderNodeBsdfTransparent")
-        mix = nodes.new("ShaderNodeMixShader")
-        mix.inputs[0].default_value = 1.0 - alpha
+        attr = nodes.new("ShaderNodeAttribute")
+        attr.attribute_name = "density"
+        ramp = _build_color_ramp(nodes, colormap)
+        scale = nodes.new("ShaderNodeMath")
+        scale.operation = 'MULTIPLY'
+        scale.inputs[1].default_value = density
+        principled = nodes.new("ShaderNodeVolumePrincipled")
         
-        links.new(emission.outputs[0], mix.inputs[1])
-        links.new(transparent.outputs[0], mix.inputs[2])
+        links.new(attr.outputs["Fac"], ramp.inputs["Fac"])
+        links.new(attr.outputs["Fac"], scale.inputs[0])
+        links.new(ramp.outputs["Color"], principled.inputs["Color"])
+        links.new(scale.outputs[0], principled.inputs["Density"])
         
         material_output = nodes.new("ShaderNodeOutputMaterial")
-        links.new(mix.outputs[0], material_output.inputs[0])
+        links.new(principled.outputs[0], material_output.inputs[1])
+        self.set_matl(obj=name, matl=f"{name}_volume")
+        return obj
     
-    def trans(self, name="Trans", color="#555555"):
-        """Create a transparent material.
+    def isosurface(self, volume, level, spacing=1.0, origin=(0., 0., 0.),
+                   name="isosurface", color=None, alpha=1.0, emis=False,
+                   target_triangles=None, chunk=32, layer='render', **kwargs):
+        """Create a mesh from an isosurface of a 3D array.
+        
+        The surface is extracted in chunks (so memory-mapped volumes work)
+        and passed to mesh() with smooth normals from the field gradient;
+        the spec records the extracted mesh rather than the volume. With
+        geometry_cache() enabled the extracted surface is cached on disk.
         
         Args:
-            name: Material name
+            volume: (X, Y, Z) array or memory-mapped array of scalars
+            level: Iso value
+            spacing: Voxel size, scalar or per axis
+            origin: World position of sample (0, 0, 0)
+            name: Object name
             color: Material color
+            alpha: Transparency
+            emis: Whether to use emissive material
+            target_triangles: Decimate the mesh to about this many triangles
+            chunk: Cells per slab along the first axis
+            layer: Layer assignment
+        
+        Returns:
+            The created object
         """
-        mat = bpy.data.materials.new(name)
-        rgb = Color(color).rgb
-        mat.diffuse_color = (rgb[0], rgb[1], rgb[2], 1.0)
+        cache = self._geometry_cache
+        cached = key = None
+        if cache is not None:
+            key = cache.key("isosurface", np.asarray(volume), float(level),
+                            np.asarray(spacing, dtype=np.float64).tolist(),
+                            np.asarray(origin, dtype=np.float64).tolist())
+            cached = cache.get(key)
+        if cached is not None:
+            vertices, faces, normals = cached["vertices"], cached["faces"], cached["normals"]
+        else:
+            vertices, faces, normals = _isosurface(volume, level, spacing, origin, chunk)
+            if key is not None:
+                cache.put(key, vertices=vertices, faces=faces, normals=normals)
+        if not len(faces):
+            raise ValueError(f"No isosurface at level {level}")
+        obj = self.mesh(vertices, faces, normals=normals, name=name, color=color,
+                        alpha=alpha, emis=emis, layer=layer, **kwargs)
+        if target_triangles is not None and target_triangles < len(faces):
+            self.decimate(name, ratio=target_triangles / len(faces))
+        return obj
     
-    def sem(self, name="Sem", e_color="#EEEEEE", bsdf_color='#000000',
-            lw_value=0.3, **kwargs):
+    @recorded
+    def decimate(self, name, ratio):
+        """Reduce an object's face count with a collapse Decimate modifier.
+        
+        Args:
+            name: Object name
+            ratio: Fraction of faces to keep
+        """
+        obj = self._lookup(name)
+        modifier = obj.modifiers.get("bpwf_decimate") or obj.modifiers.new(
+            name="bpwf_decimate", type='DECIMATE')
+        modifier.decimate_type = 'COLLAPSE'
+        modifier.ratio = float(ratio)
+    
+    def _select_volume_levels(self, draft):
+        """Point each array volume at its coarsest level for drafts, else full."""
+        for name, paths in self._volumes.items():
+            obj = self._lookup(name)
+            if obj is None:
+                continue
+            path = paths[max(paths) if draft else min(paths)]
+            if obj.data.filepath != path:
+                obj.data.filepath = path
+    
+    @contextmanager
+    def assembly(self, name):
+        """Define a reusable assembly from the objects created in a block.
+        
+        Objects (and booleans between them) are built in the scene as usual
+        and moved into their own collection when the block exits. Place the
+        assembly any number of times with place() or place_many(); each
+        placement is a collection instance sharing the assembly's geometry.
+        
+        Example::
+        
+            with scene.assembly("module"):
+                scene.rpp(c=[0, 0, 0], l=[1, 1, 1], name="housing")
+                scene.rcc(c=[0, 0, -1], r=0.2, h=2, name="bore")
+                scene.subtract("housing", "bore")
+            scene.place_many("module", locations=grid)
+        
+        Args:
+            name: Assembly name
+        """
+        self.begin_assembly(name)
+        try:
+            yield self
+        finally:
+            self.end_assembly()
+    
+    @recorded
+    def begin_assembly(self, name):
+        """Start defining an assembly (see assembly())."""
+        if self._assembly is not None:
+            raise RuntimeError(f"Already defining assembly '{self._assembly[0]}'")
+        self._assembly = (name, set(self._objects))
+    
+    @recorded
+    def end_assembly(self):
+        """Finish the current assembly, moving its objects into a collection.
+        
+        Returns:
+            The assembly collection
+        """
+        if self._assembly is None:
+            raise RuntimeError("No assembly is being defined")
+        name, existing = self._assembly
+        self._assembly = None
+        
+        coll = bpy.data.collections.new(name)
+        for obj_name in [n for n in self._objects if n not in existing]:
+            obj = self._lookup(obj_name)
+            if obj is None:
+                continue
+            coll.objects.link(obj)
+            if obj.name in self.scene.collection.objects:
+                self.scene.collection.objects.unlink(obj)
+            # Assembly members are reached through their placements
+            self._unregister(obj_name)
+        self._assemblies[name] = coll
+        return coll
+    
+    @recorded
+    def place(self, assembly, name=None, location=(0., 0., 0.),
+              rotation=(0., 0., 0.), scale=1.0, layer='render'):
+        """Place an instance of an assembly.
+        
+        Args:
+            assembly: Assembly name
+            name: Object name (defaults to the assembly name)
+            location: Placement position (x, y, z)
+            rotation: Euler rotation (rx, ry, rz) in radians
+            scale: Uniform scale or (sx, sy, sz)
+            layer: Layer assignment
+        
+        Returns:
+            The instancing object
+        """
+        name = name or assembly
+        obj = bpy.data.objects.new(name, None)
+        obj.instance_type = 'COLLECTION'
+        obj.instance_collection = self._assemblies[assembly]
+        obj.location = location
+        obj.rotation_euler = rotation
+        obj.scale = (scale, scale, scale) if np.isscalar(scale) else scale
+        self.scene.collection.objects.link(obj)
+        self._register(name, obj, layer)
+        return obj
+    
+    @recorded
+    def place_many(self, assembly, locations, rotations=None, scales=None,
+                   name=None, layer='render'):
+        """Place many instances of an assembly from arrays of transforms.
+        
+        Args:
+            assembly: Assembly name
+            locations: (N, 3) array of positions
+            rotations: Optional (N, 3) array of Euler rotations in radians
+            scales: Optional (N,) or (N, 3) array of scales
+            name: Name prefix; instances are named ``{name}_{i}``
+            layer: Layer assignment
+        
+        Returns:
+            List of instancing objects
+        """
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 3)
+        n = len(locations)
+        rotations = (np.zeros((n, 3)) if rotations is None
+                     else np.asarray(rotations, dtype=np.float64).reshape(n, 3))
+        scales = np.ones(n) if scales is None else np.asarray(scales, dtype=np.float64)
+        scales = np.broadcast_to(scales.reshape(n, -1), (n, 3))
+        prefix = name or assembly
+        
+        return [self.place(assembly, name=f"{prefix}_{i}", location=tuple(locations[i]),
+                           rotation=tuple(rotations[i]), scale=tuple(scales[i]),
+                           layer=layer)
+                for i in range(n)]
+    
+    @recorded
+    def subtract(self, left, right, unlink=True):
+        """Boolean subtraction operation."""
+        self.boolean(left=left, right=right, operation="DIFFERENCE", unlink=unlink)
+    
+    @recorded
+    def union(self, left, right, unlink=True):
+        """Boolean union operation."""
+        self.boolean(left=left, right=right, operation="UNION", unlink=unlink)
+    
+    @recorded
+    def intersect(self, left, right, unlink=True):
+        """Boolean intersection operation."""
+        self.boolean(left=left, right=right, operation="INTERSECT", unlink=unlink)
+    
+    @recorded
+    def boolean(self, left, right, operation, unlink=True):
+        """Perform boolean operation between two objects.
+        
+        With geometry_cache() enabled, the result is restored from disk when
+        the operands' geometry, attributes, transforms and the operation are
+        unchanged. Meshes with custom split normals or edge attributes are
+        not cached.
+        
+        Args:
+            left: Left operand object name
+            right: Right operand object name
+            operation: Boolean operation type
+            unlink: Whether to unlink the right object after operation
+        """
+        left_obj = self._lookup(left)
+        right_obj = self._lookup(right)
+        if left_obj is None or right_obj is None:
+            raise KeyError(f"Object '{left if left_obj is None else right}' not found")
+        
+        cache = self._geometry_cache
+        cached = key = None
+        if cache is not None:
+            key = self._boolean_key(left_obj, right_obj, operation)
+        if key is not None:
+            cached = cache.get(key)
+        
+        if cached is not None:
+            result = _mesh_from_arrays(left_obj.data.name, cached)
+            for material in left_obj.data.materials:
+                result.materials.append(material)
+            result.update(calc_edges=True)
+            left_obj.data = result
+        else:
+            self._own_data(left_obj)
+            
+            modifier = left_obj.modifiers.new(type="BOOLEAN", name=f"{left}_{operation.lower()}_{right}")
+            modifier.operation = operation
+            modifier.object = right_obj
+            modifier.solver = 'EXACT'
+            
+            # Apply modifier
+            bpy.context.view_layer.objects.active = left_obj
+            bpy.ops.object.modifier_apply(modifier=modifier.name)
+            attributes = _attribute_arrays(left_obj.data) if key is not None else None
+            if attributes is not None:
+                cache.put(key, **_mesh_arrays(left_obj.data), **attributes)
+        
+        if unlink:
+            self._unregister(right)
+            self._release_materials(right)
+            bpy.data.objects.remove(right_obj, do_unlink=True)
+            self._maybe_purge('boolean')
+    
+    def _boolean_key(self, left_obj, right_obj, operation):
+        """Return the geometry cache key of a boolean, or None if it cannot be cached.
+        
+        The right operand is keyed on its evaluated mesh, since the boolean
+        modifier sees it with its own modifiers applied.
+        """
+        right_eval = right_obj.evaluated_get(bpy.context.evaluated_depsgraph_get())
+        right_mesh = right_eval.to_mesh()
+        try:
+            parts = []
+            for obj, mesh in ((left_obj, left_obj.data), (right_obj, right_mesh)):
+                attributes = _attribute_arrays(mesh)
+                if attributes is None:
+                    return None
+                parts += [*_mesh_arrays(mesh).values(), *attributes.values(),
+                          np.array(obj.matrix_world, dtype=np.float64)]
+        finally:
+            right_eval.to_mesh_clear()
+        return GeometryCache.key("boolean", operation, "EXACT", *parts)
+    
+    def geometry_cache(self, directory=None, max_mb=1024):
+        """Enable the on-disk cache for booleans and generated meshes.
+        
+        Results are keyed by a hash of the operands' geometry, transforms
+        and the operation, so re-running a script restores them instead of
+        recomputing. The cache can also be enabled for every scene with the
+        BPWF_GEOMETRY_CACHE_DIR (and BPWF_GEOMETRY_CACHE_MB) environment
+        variables.
+        
+        Args:
+            directory: Cache directory (defaults to ~/.cache/bpwf/geometry);
+                pass False to disable the cache
+            max_mb: Size limit in megabytes
+        
+        Returns:
+            The GeometryCache, whose stats() reports hits and misses
+        """
+        if directory is False:
+            self._geometry_cache = None
+            return None
+        if directory is None:
+            directory = os.path.join(os.path.expanduser("~"), ".cache", "bpwf", "geometry")
+        self._geometry_cache = GeometryCache(directory, int(max_mb * 1024 * 1024))
+        return self._geometry_cache
+    
+    @recorded
+    def cutaway(self, name="cutaway", location=(0., 0., 0.), normal=(1., 0., 0.),
+                objects=None):
+        """Cut objects away on one side of a plane in the shader.
+        
+        The plane is an empty whose local +Z axis is the plane normal;
+        surfaces on that side become transparent. Moving or rotating the
+        empty (or calling cutaway() again with the same name) sweeps the
+        cut without rebuilding any geometry, unlike boolean cuts. Each
+        material of the cut objects gets the cut, so other objects in this
+        scene sharing those materials are cut too; materials shared with
+        other scenes (e.g. a fork) are copied first.
+        
+        Args:
+            name: Cutaway name (the empty is registered as ``bpwf_cut_{name}``)
+            location: A point on the plane
+            normal: Normal pointing towards the side that is removed
+            objects: Names of the objects to cut; assembly placements cut
+                their assembly's meshes (defaults to every mesh, assembly
+                members included). Meshes without a material get a plain
+                gray one so they can be cut.
+        
+        Returns:
+            The plane empty
+        """
+        # The plane belongs to this scene's registry, so other scenes (and
+        # forks, which get their own copy) never move it
+        plane_name = f"bpwf_cut_{name}"
+        plane = self._objects.get(plane_name)
+        if plane is not None:
+            try:
+                plane.name
+            except ReferenceError:
+                plane = None
+        if plane is None:
+            plane = bpy.data.objects.new(plane_name, None)
+            plane.empty_display_type = 'ARROWS'
+            self._register(plane_name, plane)
+        if plane.name not in self.scene.objects:
+            self.scene.collection.objects.link(plane)
+        plane.location = tuple(location)
+        plane.rotation_mode = 'QUATERNION'
+        plane.rotation_quaternion = _z_to_quaternion(normal)
+        
+        if objects is None:
+            targets = [obj for obj in self._scene_objects() if obj.type == 'MESH']
+        else:
+            targets = []
+            for obj_name in objects:
+                obj = self._lookup(obj_name)
+                if obj is None:
+                    raise KeyError(f"Object '{obj_name}' not found")
+                if obj.instance_type == 'COLLECTION' and obj.instance_collection is not None:
+                    # Placements are cut through the meshes of their assembly
+                    targets += [member for member in obj.instance_collection.all_objects
+                                if member.type == 'MESH']
+                else:
+                    targets.append(obj)
+        
+        materials = {}
+        for obj in targets:
+            if not any(slot.material is not None for slot in obj.material_slots):
+                # Meshes without a material render with the default surface;
+                # give them a plain one that can carry the cut
+                default_name = f"bpwf_cut_{name}_default"
+                default = self._lookup_material(default_name)
+                if default is None:
+                    self.flat(name=default_name, color='#CCCCCC')
+                    default = self._materials[default_name]
+                mesh = self._own_data(obj)
+                if obj.material_slots:
+                    for slot in obj.material_slots:
+                        slot.material = default
+                else:
+                    mesh.materials.append(default)
+                materials[default.name] = default
+            for slot in obj.material_slots:
+                if slot.material is not None:
+                    materials[slot.material.name] = slot.material
+        for material in materials.values():
+            self._cut_material(self._own_material(material), plane, name)
+        return plane
+    
+    @staticmethod
+    def _cut_material(material, plane, name):
+        """Insert (or retarget) a plane clip stage before a material's output."""
+        if not material.use_nodes:
+            # Node-less materials render their diffuse color; keep that look
+            color = tuple(material.diffuse_color)
+            material.use_nodes = True
+            material.node_tree.nodes.clear()
+            bsdf = material.node_tree.nodes.new("ShaderNodeBsdfDiffuse")
+            bsdf.inputs[0].default_value = color
+            output = material.node_tree.nodes.new("ShaderNodeOutputMaterial")
+            material.node_tree.links.new(bsdf.outputs[0], output.inputs[0])
+        nodes = material.node_tree.nodes
+        links = material.node_tree.links
+        
+        coords = nodes.get(f"bpwf_cut_{name}_coords")
+        if coords is not None:
+            coords.object = plane
+            return
+        output = next((node for node in nodes if node.bl_idname == 'ShaderNodeOutputMaterial'
+                       and node.is_active_output), None)
+        if output is None or not output.inputs[0].links:
+            return
+        surface = output.inputs[0].links[0].from_socket
+        
+        coords = nodes.new("ShaderNodeTexCoord")
+        coords.name = f"bpwf_cut_{name}_coords"
+        coords.object = plane
+        separate = nodes.new("ShaderNodeSeparateXYZ")
+        side = nodes.new("ShaderNodeMath")
+        side.operation = 'GREATER_THAN'
+        side.inputs[1].default_value = 0.0
+        transparent = nodes.new("ShaderNodeBsdfTransparent")
+        mix = nodes.new("ShaderNodeMixShader")
+        mix.name = f"bpwf_cut_{name}"
+        
+        links.new(coords.outputs["Object"], separate.inputs[0])
+        links.new(separate.outputs["Z"], side.inputs[0])
+        links.new(side.outputs[0], mix.inputs[0])
+        links.new(surface, mix.inputs[1])
+        links.new(transparent.outputs[0], mix.inputs[2])
+        links.new(mix.outputs[0], output.inputs[0])
+    
+    @recorded
+    def unlink(self, name):
+        """Unlink an object from the scene."""
+        obj = self._lookup(name)
+        if obj is not None:
+            self.scene.collection.objects.unlink(obj)
+    
+    @recorded
+    def flat(self, name="Flat", color='#555555', alpha=1.0):
+        """Create a flat diffuse material.
+        
+        Args:
+            name: Material name
+            color: Material color
+            alpha: Transparency
+        """
+        mat = bpy.data.materials.new(name)
+        self._materials[name] = mat
+        rgb = Color(color).rgb
+        mat.diffuse_color = (rgb[0], rgb[1], rgb[2], alpha)
+        
+        if alpha < 1.0:
+            mat.use_nodes = True
+            nodes = mat.node_tree.nodes
+            nodes.clear()
+            links = mat.node_tree.links
+            
+            bsdf = nodes.new("ShaderNodeBsdfDiffuse")
+            bsdf.inputs[0].default_value = (rgb[0], rgb[1], rgb[2], alpha)
+            
+            transparent = nodes.new("ShaderNodeBsdfTransparent")
+            mix = nodes.new("ShaderNodeMixShader")
+            mix.inputs[0].default_value = 1.0 - alpha
+            
+            links.new(bsdf.outputs[0], mix.inputs[1])
+            links.new(transparent.outputs[0], mix.inputs[2])
+            
+            material_output = nodes.new("ShaderNodeOutputMaterial")
+            links.new(mix.outputs[0], material_output.inputs[0])
+    
+    @recorded
+    def emis(self, name="Source", color="#555555", alpha=1.0, volume=False,
+             emittance=1.0, **kwargs):
+        """Create an emissive material.
+        
+        Args:
+            name: Material name
+            color: Emission color
+            alpha: Transparency
+            volume: Whether to use volume output
+            emittance: Emission strength
+        """
+        if isinstance(color, str):
+            rgb = Color(color).rgb
+        else:
+            rgb = color
+        
+        mat = bpy.data.materials.new(name)
+        self._materials[name] = mat
+        mat.use_nodes = True
+        nodes = mat.node_tree.nodes
+        nodes.clear()
+        links = mat.node_tree.links
+        
+        emission = nodes.new(type="ShaderNodeEmission")
+        emission.inputs[0].default_value = (rgb[0], rgb[1], rgb[2], alpha)
+        emission.inputs[1].default_value = emittance
+        
+        transparent = nodes.new("ShaderNodeBsdfTransparent")
+        mix = nodes.new("ShaderNodeMixShader")
+        mix.inputs[0].default_value = 1.0 - alpha
+        
+        links.new(emission.outputs[0], mix.inputs[1])
+        links.new(transparent.outputs[0], mix.inputs[2])
+        
+        material_output = nodes.new("ShaderNodeOutputMaterial")
+        links.new(mix.outputs[0], material_output.inputs[0])
+    
+    @recorded
+    def trans(self, name="Trans", color="#555555"):
+        """Create a transparent material.
+        
+        Args:
+            name: Material name
+            color: Material color
+        """
+        mat = bpy.data.materials.new(name)
+        self._materials[name] = mat
+        rgb = Color(color).rgb
+        mat.diffuse_color = (rgb[0], rgb[1], rgb[2], 1.0)
+    
+    @recorded
+    def attribute_color(self, name="AttributeColor", attribute="color", alpha=1.0):
+        """Create a diffuse material colored by a geometry color attribute.
+        
+        Args:
+            name: Material name
+            attribute: Name of the color attribute to read
+            alpha: Transparency
+        """
+        mat = bpy.data.materials.new(name)
+        self._materials[name] = mat
+        mat.use_nodes = True
+        nodes = mat.node_tree.nodes
+        nodes.clear()
+        links = mat.node_tree.links
+        
+        attr = nodes.new("ShaderNodeAttribute")
+        attr.attribute_type = 'GEOMETRY'
+        attr.attribute_name = attribute
+        
+        bsdf = nodes.new("ShaderNodeBsdfDiffuse")
+        links.new(attr.outputs["Color"], bsdf.inputs[0])
+        
+        transparent = nodes.new("ShaderNodeBsdfTransparent")
+        mix = nodes.new("ShaderNodeMixShader")
+        mix.inputs[0].default_value = 1.0 - alpha
+        
+        links.new(bsdf.outputs[0], mix.inputs[1])
+        links.new(transparent.outputs[0], mix.inputs[2])
+        
+        material_output = nodes.new("ShaderNodeOutputMaterial")
+        links.new(mix.outputs[0], material_output.inputs[0])
+    
+    @recorded
+    def scalar_color(self, name="ScalarColor", attribute="scalar", colormap='viridis',
+                     clim=(0., 1.), alpha=1.0, attribute_type='GEOMETRY'):
+        """Create a diffuse material mapping a scalar attribute through a colormap.
+        
+        Args:
+            name: Material name
+            attribute: Name of the scalar attribute to read
+            colormap: Matplotlib colormap name or colormap
+            clim: (min, max) attribute values mapped to the colormap ends
+            alpha: Transparency
+            attribute_type: 'GEOMETRY', or 'INSTANCER' to read the attribute
+                from the points instances were placed on
+        """
+        mat = bpy.data.materials.new(name)
+        self._materials[name] = mat
+        mat.use_nodes = True
+        nodes = mat.node_tree.nodes
+        nodes.clear()
+        links = mat.node_tree.links
+        
+        attr = nodes.new("ShaderNodeAttribute")
+        attr.attribute_type = attribute_type
+        attr.attribute_name = attribute
+        
+        map_range = nodes.new("ShaderNodeMapRange")
+        map_range.clamp = True
+        map_range.inputs["From Min"].default_value = float(clim[0])
+        map_range.inputs["From Max"].default_value = float(clim[1])
+        ramp = _build_color_ramp(nodes, colormap)
+        links.new(attr.outputs["Fac"], map_range.inputs["Value"])
+        links.new(map_range.outputs["Result"], ramp.inputs["Fac"])
+        
+        bsdf = nodes.new("ShaderNodeBsdfDiffuse")
+        links.new(ramp.outputs["Color"], bsdf.inputs[0])
+        
+        transparent = nodes.new("ShaderNodeBsdfTransparent")
+        mix = nodes.new("ShaderNodeMixShader")
+        mix.inputs[0].default_value = 1.0 - alpha
+        
+        links.new(bsdf.outputs[0], mix.inputs[1])
+        links.new(transparent.outputs[0], mix.inputs[2])
+        
+        material_output = nodes.new("ShaderNodeOutputMaterial")
+        links.new(mix.outputs[0], material_output.inputs[0])
+    
+    @recorded
+    def color_by(self, obj, values, attribute="scalar", colormap='viridis',
+                 clim=None, alpha=1.0, matl=None):
+        """Color a mesh by a per-vertex scalar array through a shared material.
+        
+        The values are written as a vertex attribute in one bulk write, on
+        a copy of the mesh if other objects (e.g. in a fork) share it.
+        Objects colored by the same attribute, colormap and limits share one
+        material, so any number of vertices and objects cost one material.
+        
+        Args:
+            obj: Object name
+            values: (V,) array of per-vertex scalars
+            attribute: Attribute name to store the values under
+            colormap: Matplotlib colormap name or colormap
+            clim: (min, max) values mapped to the colormap ends (defaults to
+                the range of ``values``)
+            alpha: Transparency
+            matl: Material name (defaults to one derived from the attribute,
+                colormap and limits)
+        
+        Returns:
+            Name of the material used
+        """
+        obj_ref = self._lookup(obj)
+        if obj_ref is None:
+            raise KeyError(f"Object '{obj}' not found")
+        values = np.asarray(values, dtype=np.float32).ravel()
+        if len(values) != len(obj_ref.data.vertices):
+            raise ValueError(f"Got {len(values)} values for "
+                             f"{len(obj_ref.data.vertices)} vertices of '{obj}'")
+        mesh = self._own_data(obj_ref)
+        _write_attribute(mesh, attribute, values)
+        mesh.update()
+        
+        if clim is None:
+            clim = (float(values.min()), float(values.max()))
+        if matl is None:
+            cmap_name = colormap if isinstance(colormap, str) else colormap.name
+            matl = f"{attribute}_{cmap_name}_{clim[0]:g}_{clim[1]:g}"
+            if alpha != 1.0:
+                matl = f"{matl}_{alpha:g}"
+        if matl not in self._materials:
+            self.scalar_color(name=matl, attribute=attribute, colormap=colormap,
+                              clim=clim, alpha=alpha)
+        self.set_matl(obj=obj, matl=matl)
+        return matl
+    
+    @recorded
+    def sem(self, name="Sem", e_color="#EEEEEE", bsdf_color='#000000',
+            lw_value=0.3, **kwargs):
         """Create a SEM-style material.
         
         Args:
@@ -587,6 +1975,7 @@ class bpwf:
             bsdf_rgb = bsdf_color
         
         mat = bpy.data.materials.new(name)
+        self._materials[name] = mat
         mat.use_nodes = True
         nodes = mat.node_tree.nodes
         nodes.clear()
@@ -615,6 +2004,7 @@ class bpwf:
         material_output = nodes.new("ShaderNodeOutputMaterial")
         links.new(mix.outputs[0], material_output.inputs[0])
     
+    @recorded
     def image(self, name="Image", fname=None, alpha=1.0, volume=False,
               color="#ffffff", layer='render'):
         """Create an image texture material.
@@ -629,6 +2019,7 @@ class bpwf:
         """
         rgb = Color(color).rgb
         mat = bpy.data.materials.new(name)
+        self._materials[name] = mat
         mat.use_nodes = True
         nodes = mat.node_tree.nodes
         nodes.clear()
@@ -653,17 +2044,99 @@ class bpwf:
         output_slot = 1 if volume else 0
         links.new(mix.outputs[0], material_output.inputs[output_slot])
     
+    @recorded
     def set_matl(self, obj=None, matl=None):
         """Assign a material to an object.
         
         Args:
             obj: Object name
-            matl: Material name
+            matl: Material name, material or PrincipledBSDF
+        """
+        obj_ref = self._lookup(obj)
+        if obj_ref is not None:
+            if hasattr(matl, 'material'):
+                matl = matl.material
+            matl_ref = self._lookup_material(matl) if isinstance(matl, str) else matl
+            if matl_ref is None:
+                return
+            data = obj_ref.data
+            if data is not None and data.users > 1:
+                # Data shared with a fork: keep the assignment on this object
+                if not obj_ref.material_slots:
+                    self._own_data(obj_ref)
+                else:
+                    obj_ref.material_slots[obj_ref.active_material_index].link = 'OBJECT'
+            obj_ref.active_material = matl_ref
+    
+    @staticmethod
+    def _datablock_bytes(datablock):
+        """Estimate the memory held by a mesh or image datablock."""
+        if hasattr(datablock, 'vertices'):
+            return (len(datablock.vertices) * 12 + len(datablock.edges) * 8 +
+                    len(datablock.loops) * 8 + len(datablock.polygons) * 8)
+        if hasattr(datablock, 'pixels') and datablock.has_data:
+            width, height = datablock.size
+            return width * height * datablock.channels * (4 if datablock.is_float else 1)
+        return 0
+    
+    def purge(self):
+        """Remove unused meshes, materials, images, lights and cameras.
+        
+        Deleting objects leaves their data and ``{name}_color`` materials
+        behind. This removes every datablock without users, repeating until
+        nothing more is freed (removing a mesh can orphan its material, and
+        a material its images). Datablocks with a fake user are kept, and so
+        are materials registered with this scene (e.g. made with flat() but
+        not assigned yet); an object's ``{name}_color`` material is released
+        when the object is deleted.
+        
+        Returns:
+            Dict with the number of datablocks removed, per type and in
+            total, and an estimate of the bytes freed
+        """
+        # Forget materials that no longer exist
+        for name, mat in list(self._materials.items()):
+            try:
+                mat.name
+            except ReferenceError:
+                del self._materials[name]
+        registered = list(self._materials.values())
+        
+        removed = {key: 0 for key in _PURGE_TYPES}
+        freed = 0
+        changed = True
+        while changed:
+            changed = False
+            for key in _PURGE_TYPES:
+                collection = getattr(bpy.data, key)
+                for datablock in [d for d in collection if d.users == 0]:
+                    if key == 'materials' and datablock in registered:
+                        continue
+                    freed += self._datablock_bytes(datablock)
+                    collection.remove(datablock)
+                    removed[key] += 1
+                    changed = True
+        
+        return {"datablocks": sum(removed.values()), "bytes": freed, "by_type": removed}
+    
+    def auto_purge(self, points=('delete', 'boolean', 'render')):
+        """Purge orphan datablocks automatically.
+        
+        Args:
+            points: When to purge: after 'delete', after a 'boolean' that
+                removes its right operand, and/or before 'render'. Pass an
+                empty tuple to disable.
+        
+        Returns:
+            self for method chaining
         """
-        if obj in bpy.data.objects:
-            obj_ref = bpy.data.objects[obj]
-            if matl in bpy.data.materials:
-                obj_ref.active_material = bpy.data.materials[matl]
+        self._auto_purge = set(points)
+        return self
+    
+    def _maybe_purge(self, point):
+        """Purge if automatic purging is enabled at this point."""
+        if point in self._auto_purge:
+            self.purge()
     
     def draft(self, i=True):
         """Enable draft mode for faster rendering.
@@ -677,30 +2150,277 @@ class bpwf:
         self._draft = i
         return self
     
+    def _camera(self):
+        """Return this scene's camera, creating it if needed."""
+        camera_name = f"Camera_{self.scene.name}" if self.scene.name != "Scene" else "Camera"
+        
+        if camera_name not in bpy.data.objects:
+            camera_data = bpy.data.cameras.new(camera_name)
+            camera = bpy.data.objects.new(camera_name, camera_data)
+            self.scene.collection.objects.link(camera)
+        else:
+            camera = bpy.data.objects[camera_name]
+            # Make sure camera is in this scene
+            if camera.name not in self.scene.objects:
+                self.scene.collection.objects.link(camera)
+        self.scene.camera = camera
+        return camera
+    
     def look_at(self, target=None):
-        """Point camera at a target object.
+        """Point camera at a target object or point.
+        
+        The camera gets a track-to constraint aimed at an empty, so it keeps
+        looking at the target when either moves.
         
         Args:
-            target: Target object name
+            target: Target object name or (x, y, z) point
+        """
+        camera = self._camera()
+        target_name = f"bpwf_target_{self.scene.name}"
+        if target_name not in bpy.data.objects:
+            empty = bpy.data.objects.new(target_name, None)
+            self.scene.collection.objects.link(empty)
+        empty = bpy.data.objects[target_name]
+        
+        if isinstance(target, str):
+            obj = self._lookup(target)
+            if obj is None:
+                raise KeyError(f"Object '{target}' not found")
+            empty.location = obj.matrix_world.translation
+        else:
+            empty.location = target if target is not None else (0., 0., 0.)
+        
+        constraint = camera.constraints.get("bpwf_track")
+        if constraint is None:
+            constraint = camera.constraints.new(type='TRACK_TO')
+            constraint.name = "bpwf_track"
+        constraint.target = empty
+        constraint.track_axis = 'TRACK_NEGATIVE_Z'
+        constraint.up_axis = 'UP_Y'
+    
+    def bounds(self):
+        """Return the world-space bounding box of all geometry in the scene.
+        
+        Corners of every object's bounding box are read in one pass and
+        transformed with a single vectorized matrix product. Assembly
+        placements contribute the bounds of their assembly.
+        
+        Returns:
+            (min, max) arrays of shape (3,), or None if there is no geometry
+        """
+        corners = []
+        matrices = []
+        assembly_corners = {}
+        for obj in self.scene.objects:
+            if obj.hide_render:
+                continue
+            if obj.type in _FRAMED_TYPES:
+                corners.append(obj.bound_box)
+                matrices.append(obj.matrix_world)
+            elif obj.instance_type == 'COLLECTION' and obj.instance_collection is not None:
+                coll = obj.instance_collection
+                if coll.name not in assembly_corners:
+                    assembly_corners[coll.name] = self._collection_corners(coll)
+                if assembly_corners[coll.name] is not None:
+                    corners.append(assembly_corners[coll.name])
+                    matrices.append(obj.matrix_world)
+        if not corners:
+            return None
+        corners = np.array(corners, dtype=np.float64)
+        matrices = np.array(matrices, dtype=np.float64)
+        world = (np.einsum('nij,nkj->nki', matrices[:, :3, :3], corners) +
+                 matrices[:, None, :3, 3])
+        return world.min(axis=(0, 1)), world.max(axis=(0, 1))
+    
+    @staticmethod
+    def _collection_corners(coll):
+        """Return the 8 bounding box corners of a collection's geometry, or None."""
+        objs = [obj for obj in coll.all_objects if obj.type in _FRAMED_TYPES]
+        if not objs:
+            return None
+        corners = np.array([obj.bound_box for obj in objs], dtype=np.float64)
+        matrices = np.array([obj.matrix_world for obj in objs], dtype=np.float64)
+        local = (np.einsum('nij,nkj->nki', matrices[:, :3, :3], corners) +
+                 matrices[:, None, :3, 3]) - np.asarray(coll.instance_offset)
+        low, high = local.min(axis=(0, 1)), local.max(axis=(0, 1))
+        return [[x, y, z] for x in (low[0], high[0]) for y in (low[1], high[1])
+                for z in (low[2], high[2])]
+    
+    @staticmethod
+    def _framing(camera_location, center, radius, perspective, fov, res, margin):
+        """Compute the camera position and ortho scale that frame a sphere.
+        
+        The camera keeps its viewing direction from ``camera_location`` to
+        ``center`` and is moved along it until the bounding sphere fits the
+        narrower image dimension.
+        
+        Returns:
+            (location, ortho_scale) tuple
+        """
+        center = np.asarray(center, dtype=np.float64)
+        direction = np.asarray(camera_location, dtype=np.float64) - center
+        norm = np.linalg.norm(direction)
+        direction = direction / norm if norm > 0 else np.array([0., 0., 1.])
+        aspect = max(res) / min(res)
+        radius = max(radius, 1e-6) * margin
+        
+        ortho_scale = 2. * radius * aspect
+        if perspective:
+            # The camera angle spans the wider image dimension
+            narrow_fov = 2. * np.arctan(np.tan(fov / 2.) / aspect)
+            distance = radius / np.sin(narrow_fov / 2.)
+        else:
+            distance = max(norm, 2. * radius)
+        return center + direction * distance, ortho_scale
+    
+    def content_hash(self):
+        """Hash the scene's objects, transforms, geometry, materials and world.
+
+        Two scenes with the same hash render identically for the same camera
+        and render settings, so the hash can be used as a cache key.
+
+        Returns:
+            Hex digest string
+        """
+        h = hashlib.sha1()
+        for name, digest in sorted(self._object_signatures().items()):
+            h.update(f"{name}={digest}".encode())
+        for name, digest in sorted(self._material_signatures().items()):
+            h.update(f"{name}={digest}".encode())
+        world = self.scene.world
+        if world is not None and world.node_tree is not None:
+            h.update(self._node_tree_signature(world.node_tree))
+        return h.hexdigest()
+
+    def _object_signatures(self):
+        """Map each object name to a digest of its transform, data and materials.
+        
+        Mesh and curve digests cover topology and every attribute buffer, so
+        recoloring with color_by counts as a change; modifier stacks are
+        included with their settings.
         """
-        if "Camera" in bpy.data.objects and target in bpy.data.objects:
-            camera = bpy.data.objects["Camera"]
-            # This would need the camera_track constraint to be set up
-            pass
+        # matrix_world lags behind location/rotation/scale edits until the
+        # depsgraph is evaluated
+        self.scene.view_layers[0].update()
+        signatures = {}
+        for obj in self.scene.objects:
+            h = hashlib.sha1()
+            h.update(obj.type.encode())
+            h.update(np.array(obj.matrix_world, dtype=np.float64).tobytes())
+            if obj.type == 'MESH':
+                for array in _mesh_arrays(obj.data).values():
+                    h.update(array.tobytes())
+                h.update(self._attributes_signature(obj.data))
+            elif obj.type == 'LIGHT':
+                h.update(repr((obj.data.type, tuple(obj.data.color),
+                               obj.data.energy)).encode())
+                if obj.data.node_tree is not None:
+                    h.update(self._node_tree_signature(obj.data.node_tree))
+            elif obj.type == 'VOLUME':
+                h.update(obj.data.filepath.encode())
+            elif obj.type == 'CURVES':
+                co = np.empty(len(obj.data.position_data) * 3, dtype=np.float32)
+                obj.data.position_data.foreach_get('vector', co)
+                h.update(co.tobytes())
+                h.update(self._attributes_signature(obj.data))
+            if obj.instance_collection is not None:
+                h.update(obj.instance_collection.name.encode())
+            for modifier in obj.modifiers:
+                h.update(self._rna_signature(modifier))
+                if getattr(modifier, 'node_group', None) is not None:
+                    h.update(self._node_tree_signature(modifier.node_group))
+            for slot in obj.material_slots:
+                if slot.material is not None:
+                    h.update(slot.material.name.encode())
+            signatures[obj.name] = h.hexdigest()
+        return signatures
+
+    def _material_signatures(self):
+        """Map each material used in the scene to a digest of its settings."""
+        signatures = {}
+        for obj in self.scene.objects:
+            for slot in obj.material_slots:
+                material = slot.material
+                if material is None or material.name in signatures:
+                    continue
+                h = hashlib.sha1(repr(tuple(material.diffuse_color)).encode())
+                if material.node_tree is not None:
+                    h.update(self._node_tree_signature(material.node_tree))
+                signatures[material.name] = h.hexdigest()
+        return signatures
+
+    @staticmethod
+    def _diff_signatures(old, new):
+        """Return the sorted keys that were added, changed or removed."""
+        return sorted(key for key in set(old) | set(new) if old.get(key) != new.get(key))
+
+    @staticmethod
+    def _attributes_signature(geometry):
+        """Serialize the names, domains and values of a mesh's attributes."""
+        parts = []
+        for attr in geometry.attributes:
+            if attr.data_type not in _ATTRIBUTE_BUFFERS:
+                continue
+            field, width, dtype = _ATTRIBUTE_BUFFERS[attr.data_type]
+            values = np.empty(len(attr.data) * width, dtype=dtype)
+            attr.data.foreach_get(field, values)
+            parts.append(f"{attr.name}:{attr.domain}:{attr.data_type}".encode())
+            parts.append(values.tobytes())
+        return b"|".join(parts)
+    
+    @staticmethod
+    def _rna_signature(struct):
+        """Serialize the type and plain settings of a modifier or similar struct."""
+        parts = [struct.type]
+        for prop in struct.bl_rna.properties:
+            if prop.identifier == 'rna_type':
+                continue
+            value = getattr(struct, prop.identifier, None)
+            if prop.type == 'POINTER':
+                value = getattr(value, 'name', None)
+            elif prop.type == 'COLLECTION':
+                continue
+            elif getattr(prop, 'is_array', False):
+                value = tuple(value)
+            parts.append(f"{prop.identifier}={value!r}")
+        return "|".join(parts).encode()
     
+    @staticmethod
+    def _node_tree_signature(node_tree):
+        """Serialize node types and unlinked input values of a node tree."""
+        parts = []
+        for node in node_tree.nodes:
+            parts.append(node.bl_idname)
+            for socket in node.inputs:
+                value = getattr(socket, 'default_value', None)
+                if value is None or socket.is_linked:
+                    continue
+                try:
+                    value = tuple(value)
+                except TypeError:
+                    pass
+                parts.append(repr(value))
+        for link in node_tree.links:
+            parts.append(f"{link.from_node.name}>{link.to_node.name}")
+        return "|".join(parts).encode()
+
     def render(self, camera_location=(500, 500, 300), c=(0., 0., 0.),
                l=(250., 250., 250.), render=True, fit=True, samples=20,
                res=[1920, 1080], draft=False, freestyle=True,
                perspective=True, pscale=350, bg_lum=1.0, bg_color=(1.0, 1.0, 1.0),
-               transparent=True, **kwargs):
+               transparent=True, engine='CYCLES', denoise=False, save_blend=True,
+               persistent=True, margin=1.1, lines='freestyle', layered=False,
+               keep_alpha=False, **kwargs):
         """Set up and execute rendering.
         
         Args:
-            camera_location: Camera position
-            c: Scene center
-            l: Scene extents
+            camera_location: Camera position; with ``fit`` only the direction
+                from the scene center to this point is used
+            c: Scene center (point the camera looks at without ``fit``, and
+                the framed box when the scene has no geometry)
+            l: Scene extents of the framed box when the scene has no geometry
             render: Whether to actually render
-            fit: Whether to fit scene
+            fit: Frame the scene's bounding box automatically
             samples: Render samples
             res: Resolution [width, height]
             draft: Draft mode
@@ -710,38 +2430,75 @@ class bpwf:
             bg_lum: Background luminance
             bg_color: Background color
             transparent: Transparent background
+            engine: Render engine ('CYCLES', 'BLENDER_EEVEE_NEXT' or
+                'BLENDER_WORKBENCH')
+            denoise: Enable the Cycles denoiser
+            save_blend: Whether to save the .blend file before rendering
+            persistent: Keep Cycles render data between renders so only
+                changed objects are re-synced
+            margin: Padding factor around the framed bounds
+            lines: Line drawing backend used when ``freestyle`` is on:
+                'freestyle' (scoped to the freestyle_group collection) or
+                'lineart' (Grease Pencil Line Art, usually much faster on
+                large meshes). Line and shading times of each render are
+                stored in ``last_timings``.
+            layered: Render the opaque objects and the transparent_group
+                overlay as separate cached passes and composite them, so
+                changing only the overlay re-renders only the overlay
+            keep_alpha: Keep the render with a transparent background as
+                ``<filename>_alpha.png`` and composite the background onto it,
+                so ``restyle`` can change background and outlines later
+                without re-rendering (implied by ``layered``)
+        
+        Returns:
+            Dict listing the objects, materials and settings that changed
+            since the last render (stored as ``last_changes``). If nothing
+            changed and the previous image exists, rendering is skipped.
         """
-        if self._draft or draft:
+        draft = self._draft or draft
+        if draft:
             res = [640, 480]
             samples = 10
+        settings = {
+            key: repr(value) for key, value in dict(
+                camera_location=camera_location, c=c, l=l, fit=fit, margin=margin,
+                samples=samples, res=res,
+                freestyle=freestyle, perspective=perspective, pscale=pscale,
+                bg_lum=bg_lum, bg_color=bg_color, transparent=transparent,
+                engine=engine, denoise=denoise, lines=lines, layered=layered,
+                keep_alpha=keep_alpha, path=self.path,
+                filename=self.filename
+            ).items()
+        }
         
         # Set render engine
-        self.scene.render.engine = 'CYCLES'
+        self.scene.render.engine = engine
         self.scene.render.resolution_x = res[0]
         self.scene.render.resolution_y = res[1]
         
         # Set up camera - create unique camera for each scene
-        camera_name = f"Camera_{self.scene.name}" if self.scene.name != "Scene" else "Camera"
-        
-        if camera_name not in bpy.data.objects:
-            camera_data = bpy.data.cameras.new(camera_name)
-            camera = bpy.data.objects.new(camera_name, camera_data)
-            self.scene.collection.objects.link(camera)
-            self.scene.camera = camera
-        else:
-            camera = bpy.data.objects[camera_name]
-            # Make sure camera is in this scene
-            if camera.name not in self.scene.objects:
-                self.scene.collection.objects.link(camera)
-            self.scene.camera = camera
-        
-        camera.location = camera_location
+        camera = self._camera()
+        camera.data.type = 'PERSP' if perspective else 'ORTHO'
+        
+        if fit:
+            bounds = self.bounds()
+            if bounds is None:
+                c = np.asarray(c, dtype=np.float64)
+                half = np.asarray(l, dtype=np.float64) / 2.
+                bounds = (c - half, c + half)
+            center = (bounds[0] + bounds[1]) / 2.
+            radius = np.linalg.norm(bounds[1] - bounds[0]) / 2.
+            camera_location, pscale = self._framing(
+                camera_location, center, radius, perspective, float(camera.data.angle),
+                res, margin)
+            c = center
+        
+        camera.location = tuple(camera_location)
         camera.data.clip_end = 10000.0
         camera.data.clip_start = 0.0
-        
         if not perspective:
-            camera.data.type = 'ORTHO'
             camera.data.ortho_scale = pscale
+        self.look_at(tuple(c))
         
         # Set up world
         world = bpy.data.worlds.get("World")
@@ -756,23 +2513,551 @@ class bpwf:
         self.scene.cycles.samples = samples
         self.scene.cycles.max_bounces = 32
         self.scene.cycles.transparent_max_bounces = 32
-        self.scene.render.film_transparent = transparent
-        self.scene.render.use_freestyle = freestyle
+        self.scene.cycles.use_denoising = denoise
+        if engine.startswith('BLENDER_EEVEE'):
+            self.scene.eevee.taa_render_samples = samples
+        self._select_volume_levels(draft)
+        composite = layered or keep_alpha
+        self.scene.render.film_transparent = transparent or composite
+        self._setup_lines(freestyle, lines)
+        self.scene.render.use_persistent_data = persistent
         
         # Set output path with absolute path
         output_path = os.path.join(self.path, f"{self.filename}.png")
-        self.scene.render.filepath = output_path
+        alpha_path = os.path.join(self.path, f"{self.filename}_alpha.png")
+        self.scene.render.filepath = alpha_path if composite else output_path
+        
+        self._maybe_purge('render')
+        
+        # Work out what changed since the last render
+        state = {
+            "objects": self._object_signatures(),
+            "materials": self._material_signatures(),
+            "settings": settings,
+        }
+        previous = self._render_state or {}
+        changes = {key: self._diff_signatures(previous.get(key, {}), value)
+                   for key, value in state.items()}
+        changes["full"] = self._render_state is None
+        self.last_changes = changes
+        dirty = changes["full"] or any(changes[key] for key in state)
+        
+        if render and not dirty and self.has_run and os.path.exists(output_path):
+            return changes
         
         # Save blend file
-        blend_path = os.path.join(self.path, f"{self.filename}.blend")
-        bpy.ops.wm.save_as_mainfile(filepath=blend_path)
+        if save_blend and dirty:
+            blend_path = os.path.join(self.path, f"{self.filename}.blend")
+            bpy.ops.wm.save_as_mainfile(filepath=blend_path)
         
         # Render - switch to the correct scene context
         if render:
             # Make sure we're rendering the correct scene
             bpy.context.window.scene = self.scene
-            bpy.ops.render.render(write_still=True)
+            if layered:
+                changes["layers"] = self._render_layers(state, alpha_path, freestyle and lines)
+            else:
+                self.last_timings = self._timed_render(freestyle and lines)
+            if composite:
+                self._style = dict(bg_color=tuple(bg_color), bg_lum=bg_lum,
+                                   transparent=transparent)
+                self.restyle()
             self.has_run = True
+            self._render_state = state
+        return changes
+    
+    def restyle(self, bg_color=None, bg_lum=None, transparent=None, exposure=0.0,
+                outline=0, outline_color=(0., 0., 0.), filename=None):
+        """Recomposite a kept alpha render without re-rendering.
+        
+        Works on the ``<filename>_alpha.png`` written by
+        ``render(keep_alpha=True)`` (or ``layered=True``). The background
+        only replaces what the film showed; the world lighting baked into
+        the render is unchanged.
+        
+        Args:
+            bg_color: Background color (defaults to the one last rendered)
+            bg_lum: Background luminance multiplier
+            transparent: Leave the background transparent
+            exposure: Foreground exposure adjustment in stops
+            outline: Silhouette outline width in pixels (0 for none)
+            outline_color: Outline color
+            filename: Output image name (defaults to the scene filename)
+        
+        Returns:
+            Path to the recomposited image
+        """
+        import matplotlib.image as mpimg
+        
+        alpha_path = os.path.join(self.path, f"{self.filename}_alpha.png")
+        if not os.path.exists(alpha_path):
+            raise FileNotFoundError(
+                f"No alpha render at {alpha_path}; render with keep_alpha=True first")
+        style = dict(self._style or {})
+        for key, value in dict(bg_color=bg_color, bg_lum=bg_lum,
+                               transparent=transparent).items():
+            if value is not None:
+                style[key] = value
+        
+        image = mpimg.imread(alpha_path)[..., :4].astype(np.float32)
+        image[..., :3] *= 2.0 ** exposure
+        if outline:
+            mask = image[..., 3] > 0.5
+            grown = mask.copy()
+            for _ in range(int(outline)):
+                grown[1:] |= grown[:-1].copy()
+                grown[:-1] |= grown[1:].copy()
+                grown[:, 1:] |= grown[:, :-1].copy()
+                grown[:, :-1] |= grown[:, 1:].copy()
+            edge = grown & ~mask
+            image[edge, :3] = outline_color
+            image[edge, 3] = 1.0
+        if not style.get("transparent", True):
+            background = np.ones_like(image)
+            background[..., :3] = (np.asarray(style.get("bg_color", (1., 1., 1.))) *
+                                   style.get("bg_lum", 1.0))
+            image = _alpha_over(image, background)
+        
+        output_path = os.path.join(self.path, f"{filename or self.filename}.png")
+        mpimg.imsave(output_path, np.clip(image, 0., 1.))
+        return output_path
+    
+    @recorded
+    def label(self, text, anchor, offset=(40, -40), color='black', fontsize=10,
+              leader=True):
+        """Add a text label pointing at a 3D point to the annotation overlay.
+        
+        Args:
+            text: Label text
+            anchor: Object name or (x, y, z) point the label refers to
+            offset: Text position relative to the projected anchor, in
+                pixels (x right, y up)
+            color: Text and leader line color
+            fontsize: Font size in points
+            leader: Draw a leader line from the text to the anchor
+        """
+        self._annotations.append(dict(kind='label', text=text,
+                                      anchor=self._anchor_spec(anchor),
+                                      offset=tuple(offset), color=color,
+                                      fontsize=fontsize, leader=leader))
+    
+    @recorded
+    def leader(self, start, end, color='black', linewidth=1.0):
+        """Add a line between two 3D points to the annotation overlay.
+        
+        Args:
+            start: Object name or (x, y, z) point
+            end: Object name or (x, y, z) point
+            color: Line color
+            linewidth: Line width in points
+        """
+        self._annotations.append(dict(kind='leader', start=self._anchor_spec(start),
+                                      end=self._anchor_spec(end),
+                                      color=color, linewidth=linewidth))
+    
+    @recorded
+    def scale_bar(self, length, label=None, anchor=None, loc=(0.05, 0.05),
+                  color='black', fontsize=10, linewidth=2.0):
+        """Add a scale bar to the annotation overlay.
+        
+        The bar is as long on screen as ``length`` scene units across the
+        view at ``anchor`` (in perspective views the scale depends on depth).
+        
+        Args:
+            length: Bar length in scene units
+            label: Bar text (defaults to the length)
+            anchor: Object name or (x, y, z) point at the depth the bar
+                measures (defaults to the camera target)
+            loc: Left end of the bar as a fraction of the image (x right,
+                y up)
+            color: Bar and text color
+            fontsize: Font size in points
+            linewidth: Bar width in points
+        """
+        self._annotations.append(dict(kind='scale_bar', length=length,
+                                      label=label if label is not None else f"{length:g}",
+                                      anchor=self._anchor_spec(anchor), loc=tuple(loc),
+                                      color=color,
+                                      fontsize=fontsize, linewidth=linewidth))
+    
+    @recorded
+    def clear_annotations(self):
+        """Remove every label, leader line and scale bar."""
+        self._annotations = []
+    
+    def _project(self, points):
+        """Project world points to pixel coordinates of the rendered image.
+        
+        Returns:
+            (N, 2) array of pixel coordinates with the origin at the top-left
+            corner and y pointing down
+        """
+        from mathutils import Vector
+        from .blender_mats_utils import project_by_object_utils
+        
+        camera = self._camera()
+        self.scene.view_layers[0].update()
+        return np.array([tuple(project_by_object_utils(camera, Vector(point), self.scene))
+                         for point in points], dtype=np.float64).reshape(-1, 2)
+    
+    @staticmethod
+    def _anchor_spec(anchor):
+        """Store an anchor as an object name, None or a plain tuple of floats."""
+        if anchor is None or isinstance(anchor, str):
+            return anchor
+        return tuple(float(value) for value in anchor)
+    
+    def _anchor_point(self, anchor):
+        """Resolve an object name or point to a world-space point."""
+        if anchor is None:
+            target = bpy.data.objects.get(f"bpwf_target_{self.scene.name}")
+            return np.array(target.location if target is not None else (0., 0., 0.),
+                            dtype=np.float64)
+        if isinstance(anchor, str):
+            obj = self._lookup(anchor)
+            if obj is None:
+                raise KeyError(f"Object '{anchor}' not found")
+            return np.array(obj.matrix_world.translation, dtype=np.float64)
+        return np.asarray(anchor, dtype=np.float64)
+    
+    def annotate(self, filename=None, dpi=100):
+        """Composite the annotation overlay onto the last render.
+        
+        Anchors are projected with the current camera, the labels, leader
+        lines and scale bars are drawn with matplotlib into a transparent
+        overlay (``<filename>_overlay.png``), and the overlay is composited
+        onto the rendered image. The render itself is never repeated, so
+        annotations can be edited and re-applied in milliseconds.
+        
+        Args:
+            filename: Output image name (defaults to
+                ``<filename>_annotated``)
+            dpi: Resolution used to convert point sizes to pixels
+        
+        Returns:
+            Path to the annotated image
+        """
+        import matplotlib.image as mpimg
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+        
+        image_path = os.path.join(self.path, f"{self.filename}.png")
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"No render at {image_path}; render first")
+        image = mpimg.imread(image_path).astype(np.float32)
+        if image.shape[2] == 3:
+            image = np.concatenate([image, np.ones_like(image[..., :1])], axis=-1)
+        height, width = image.shape[:2]
+        render = self.scene.render
+        # Projection is in render pixels; the image may have been resized
+        scale = width / (render.resolution_x * render.resolution_percentage / 100.)
+        
+        fig = Figure(figsize=(width / dpi, height / dpi), dpi=dpi)
+        canvas = FigureCanvasAgg(fig)
+        fig.patch.set_alpha(0.)
+        ax = fig.add_axes([0., 0., 1., 1.])
+        ax.set_xlim(0, width)
+        ax.set_ylim(height, 0)
+        ax.axis('off')
+        
+        for note in self._annotations:
+            if note['kind'] == 'label':
+                (x, y), = self._project([self._anchor_point(note['anchor'])]) * scale
+                arrowprops = (dict(arrowstyle='-', color=note['color'], shrinkA=2, shrinkB=0)
+                              if note['leader'] else None)
+                ax.annotate(note['text'], xy=(x, y),
+                            xytext=(x + note['offset'][0], y - note['offset'][1]),
+                            color=note['color'], fontsize=note['fontsize'],
+                            arrowprops=arrowprops)
+            elif note['kind'] == 'leader':
+                start, end = self._project([self._anchor_point(note['start']),
+                                            self._anchor_point(note['end'])]) * scale
+                ax.plot([start[0], end[0]], [start[1], end[1]], color=note['color'],
+                        linewidth=note['linewidth'])
+            elif note['kind'] == 'scale_bar':
+                anchor = self._anchor_point(note['anchor'])
+                right = np.array(self._camera().matrix_world, dtype=np.float64)[:3, 0]
+                ends = self._project([anchor, anchor + note['length'] * right]) * scale
+                bar = np.linalg.norm(ends[1] - ends[0])
+                x0 = note['loc'][0] * width
+                y0 = (1. - note['loc'][1]) * height
+                ax.plot([x0, x0 + bar], [y0, y0], color=note['color'],
+                        linewidth=note['linewidth'], solid_capstyle='butt')
+                ax.text(x0 + bar / 2., y0 - 4, note['label'], color=note['color'],
+                        fontsize=note['fontsize'], ha='center', va='bottom')
+        
+        canvas.draw()
+        overlay = np.asarray(canvas.buffer_rgba(), dtype=np.float32) / 255.
+        base = filename or f"{self.filename}_annotated"
+        mpimg.imsave(os.path.join(self.path, f"{self.filename}_overlay.png"), overlay)
+        output_path = os.path.join(self.path, f"{base}.png")
+        mpimg.imsave(output_path, np.clip(_alpha_over(overlay, image), 0., 1.))
+        return output_path
+    
+    def animate(self, name, source, fields=None, frames=None, prefetch=2, **kwargs):
+        """Render a time series by streaming per-frame data onto one object.
+        
+        The object's topology stays fixed; each frame writes its positions
+        and attributes in bulk with ``foreach_set`` and renders with
+        persistent render data, so only the changed geometry is re-synced.
+        Frames are read on a background thread at most ``prefetch`` frames
+        ahead, which bounds memory to a few frames. The camera is framed
+        on the first frame and then held still.
+        
+        Args:
+            name: Mesh or point cloud object to update
+            source: FrameSource, or anything FrameSource accepts (.npy,
+                .npz or HDF5 path, list of per-frame .npz paths, dict of
+                (T, N, ...) arrays)
+            fields: Dict mapping source fields to targets: 'co' for vertex
+                positions or an attribute name. Defaults to 'positions' ->
+                'co' and every other field to an attribute of the same name
+            frames: Frame indices to render (defaults to all)
+            prefetch: Number of frames to read ahead
+            **kwargs: Passed to render() for every frame
+        
+        Returns:
+            List of rendered image paths, one per frame
+        """
+        obj = self._lookup(name)
+        if obj is None:
+            raise KeyError(f"Object '{name}' not found")
+        mesh = self._own_data(obj)
+        n_vertices = len(mesh.vertices)
+        owned = not isinstance(source, FrameSource)
+        if owned:
+            source = FrameSource(source, list(fields) if fields else None)
+        if fields is None:
+            fields = {key: 'co' if key == 'positions' else key for key in source.fields}
+        frames = iter(range(len(source)) if frames is None else frames)
+        kwargs.setdefault('save_blend', False)
+        kwargs['persistent'] = True
+        
+        base = self.filename
+        paths = []
+        pending = deque()
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            def read_ahead():
+                frame = next(frames, None)
+                if frame is not None:
+                    pending.append((frame, pool.submit(source.read, frame)))
+            
+            for _ in range(prefetch + 1):
+                read_ahead()
+            try:
+                while pending:
+                    frame, future = pending.popleft()
+                    data = future.result()
+                    read_ahead()
+                    for key, target in fields.items():
+                        values = data[key]
+                        if len(values) != n_vertices:
+                            raise ValueError(f"Frame {frame} field '{key}' has {len(values)} "
+                                             f"values for {n_vertices} vertices")
+                        if target == 'co':
+                            mesh.vertices.foreach_set(
+                                "co", np.ascontiguousarray(values, dtype=np.float32).ravel())
+                        else:
+                            _write_attribute(mesh, target, values)
+                    mesh.update()
+                    
+                    self.filename = f"{base}_{frame:04d}"
+                    self.render(**kwargs)
+                    paths.append(os.path.join(self.path, f"{self.filename}.png"))
+                    if kwargs.get('fit', True):
+                        camera = self._camera()
+                        target = bpy.data.objects[f"bpwf_target_{self.scene.name}"]
+                        kwargs.update(fit=False, camera_location=tuple(camera.location),
+                                      c=tuple(target.location),
+                                      pscale=camera.data.ortho_scale)
+            finally:
+                self.filename = base
+                for _, future in pending:
+                    future.cancel()
+                if owned:
+                    source.close()
+        return paths
+    
+    def _render_layers(self, state, output_path, lines):
+        """Render opaque and transparent layers separately and composite them.
+        
+        Each layer is a pass over the same scene with per-object visibility:
+        the opaque pass hides transparent_group objects, and the transparent
+        pass renders them with the opaque geometry as a holdout so occlusion
+        stays correct. A layer is only re-rendered when its objects, their
+        materials (or, for the overlay, the occluding geometry), the lights,
+        camera, world or render settings change.
+        
+        The composite keeps its alpha; ``render`` adds the background.
+        
+        Returns:
+            Names of the layers that were re-rendered
+        """
+        import matplotlib.image as mpimg
+        
+        trans_names = {obj.name for obj in self.tg.objects}
+        # Objects hidden by the caller stay out of both layers
+        geometry = [obj for obj in self.scene.objects
+                    if obj.type not in ('LIGHT', 'CAMERA') and not obj.hide_render]
+        opaque = [obj for obj in geometry if obj.name not in trans_names]
+        overlay = [obj for obj in geometry if obj.name in trans_names]
+        
+        # Lights, the camera and the world affect every layer
+        shared = hashlib.sha1(repr(sorted(state["settings"].items())).encode())
+        for obj in sorted(self.scene.objects, key=lambda o: o.name):
+            if obj.type in ('LIGHT', 'CAMERA'):
+                shared.update(f"{obj.name}={state['objects'].get(obj.name)}".encode())
+        world = self.scene.world
+        if world is not None and world.node_tree is not None:
+            shared.update(self._node_tree_signature(world.node_tree))
+        
+        def digest(objs):
+            h = shared.copy()
+            for obj in sorted(objs, key=lambda o: o.name):
+                h.update(f"{obj.name}={state['objects'].get(obj.name)}".encode())
+                for slot in obj.material_slots:
+                    if slot.material is not None:
+                        h.update(str(state["materials"].get(slot.material.name)).encode())
+            return h.hexdigest()
+        
+        base = os.path.splitext(output_path)[0]
+        passes = {
+            "opaque": (digest(opaque), overlay, []),
+            "transparent": (digest(opaque + overlay), [], opaque),
+        }
+        rendered = []
+        timings = {}
+        film_transparent = self.scene.render.film_transparent
+        self.scene.render.film_transparent = True
+        try:
+            for layer, (layer_digest, hidden, holdout) in passes.items():
+                layer_path = f"{base}_{layer}.png"
+                if self._layer_state.get(layer) == layer_digest and os.path.exists(layer_path):
+                    continue
+                saved = [(obj, obj.hide_render, obj.is_holdout) for obj in hidden + holdout]
+                for obj in hidden:
+                    obj.hide_render = True
+                for obj in holdout:
+                    obj.is_holdout = True
+                self.scene.render.filepath = layer_path
+                try:
+                    timings[layer] = self._timed_render(lines)
+                finally:
+                    for obj, hide_render, is_holdout in saved:
+                        obj.hide_render = hide_render
+                        obj.is_holdout = is_holdout
+                self._layer_state[layer] = layer_digest
+                rendered.append(layer)
+        finally:
+            self.scene.render.film_transparent = film_transparent
+            self.scene.render.filepath = output_path
+        
+        image = _alpha_over(mpimg.imread(f"{base}_transparent.png"),
+                            mpimg.imread(f"{base}_opaque.png"))
+        mpimg.imsave(output_path, np.clip(image, 0., 1.))
+        
+        self.last_timings = timings
+        return rendered
+    
+    def _setup_lines(self, freestyle, lines):
+        """Configure the line drawing backend for the next render.
+        
+        Args:
+            freestyle: Whether to draw lines at all
+            lines: 'freestyle' or 'lineart'
+        """
+        if lines not in ('freestyle', 'lineart'):
+            raise ValueError(f"Unknown line backend '{lines}'; use 'freestyle' or 'lineart'")
+        
+        use_freestyle = freestyle and lines == 'freestyle'
+        self.scene.render.use_freestyle = use_freestyle
+        if use_freestyle:
+            # Only draw lines for objects in the freestyle group
+            settings = self.scene.view_layers[0].freestyle_settings
+            settings.mode = 'EDITOR'
+            lineset = settings.linesets.get("bpwf_lines")
+            if lineset is None:
+                lineset = settings.linesets.new("bpwf_lines")
+            for other in settings.linesets:
+                other.show_render = other.name == lineset.name
+            lineset.select_by_collection = True
+            lineset.collection = self.fg
+            lineset.collection_negation = 'INCLUSIVE'
+        
+        lineart_name = f"bpwf_lineart_{self.scene.name}"
+        if freestyle and lines == 'lineart':
+            self._lineart(lineart_name).hide_render = False
+        elif lineart_name in bpy.data.objects:
+            bpy.data.objects[lineart_name].hide_render = True
+    
+    def _lineart(self, name):
+        """Return the scene's Line Art object, creating it if needed."""
+        if name in bpy.data.objects:
+            return bpy.data.objects[name]
+        
+        bpy.context.window.scene = self.scene
+        if bpy.app.version >= (4, 3, 0):
+            bpy.ops.object.grease_pencil_add(type='LINEART_COLLECTION')
+            obj = bpy.context.object
+            modifier = obj.modifiers[0]
+        else:
+            bpy.ops.object.gpencil_add(type='LINEART_COLLECTION')
+            obj = bpy.context.object
+            modifier = obj.grease_pencil_modifiers[0]
+        obj.name = name
+        modifier.source_type = 'COLLECTION'
+        modifier.source_collection = self.fg
+        return obj
+    
+    def _timed_render(self, lines):
+        """Render the scene, timing the line pass separately from shading.
+        
+        Both line backends are timed from the render status messages:
+        Freestyle runs after shading, from its first message to the end of
+        the render; Line Art is evaluated with the render depsgraph, from the
+        first message naming it to the next message that does not.
+        
+        Args:
+            lines: Active line backend ('freestyle', 'lineart') or False
+        
+        Returns:
+            Dict of 'lines', 'shading' and 'total' times in seconds
+        """
+        if lines == 'lineart':
+            marks = ('Line Art', f"bpwf_lineart_{self.scene.name}")
+        else:
+            marks = ('Freestyle',)
+        events = []
+        
+        def on_stats(*args):
+            events.append((time.perf_counter(), " ".join(str(arg) for arg in args)))
+        
+        handlers = bpy.app.handlers.render_stats
+        if lines:
+            handlers.append(on_stats)
+        start = time.perf_counter()
+        try:
+            bpy.ops.render.render(write_still=True)
+        finally:
+            if on_stats in handlers:
+                handlers.remove(on_stats)
+        end = time.perf_counter()
+        
+        line_time = 0.0
+        marked = [any(mark in text for mark in marks) for _, text in events]
+        if any(marked):
+            first = marked.index(True)
+            stop = end
+            if lines == 'lineart':
+                stop = next((t for (t, _), hit in zip(events[first:], marked[first:])
+                             if not hit), end)
+            line_time = stop - events[first][0]
+        return {
+            "lines": line_time,
+            "shading": end - start - line_time,
+            "total": end - start,
+            "backend": lines or None,
+        }
     
     def run(self, filename=None, block=True, **kwargs):
         """Execute rendering (compatibility method).
@@ -797,6 +3082,127 @@ class bpwf:
             except ImportError:
                 print(f"Rendered image saved to: {self.filename}.png")
     
+    def fork(self, filename, scene_name=None):
+        """Create a cheap copy-on-write variant of the scene.
+        
+        The fork is a new Blender scene with its own objects that share mesh
+        and light data with the original. Materials are linked per object, so
+        each variant can be restyled independently. Mesh data is only copied
+        when a variant modifies it (booleans, color_by, animate), and
+        materials when a variant edits them (cutaway), in either scene.
+        
+        Args:
+            filename: Output filename for the fork
+            scene_name: Blender scene name (defaults to the filename)
+        
+        Returns:
+            New bpwf instance, whose registry resolves the original object
+            names to the fork's copies
+        """
+        new_scene = self.scene.copy()
+        new_scene.name = scene_name or filename
+        
+        names = {obj.name: name for name, obj in self._objects.items()}
+        objects = {}
+        layers = {}
+        for obj in list(new_scene.collection.objects):
+            new_scene.collection.objects.unlink(obj)
+            # Cameras are per scene and created by render()
+            if obj.type == 'CAMERA':
+                continue
+            clone = obj.copy()
+            for slot in clone.material_slots:
+                material = slot.material
+                slot.link = 'OBJECT'
+                slot.material = material
+            new_scene.collection.objects.link(clone)
+            name = names.get(obj.name, obj.name)
+            objects[name] = clone
+            layers[name] = self._layers.get(name)
+            if obj.name in self.fg.objects:
+                self.fg.objects.link(clone)
+            if obj.name in self.tg.objects:
+                self.tg.objects.link(clone)
+        
+        newscene = copy.copy(self)
+        newscene._init_state()
+        newscene.scene = new_scene
+        newscene.filename = filename
+        newscene._objects = objects
+        newscene._layers = layers
+        newscene._materials = dict(self._materials)
+        newscene._ops = list(self._ops)
+        newscene._volumes = dict(self._volumes)
+        newscene._annotations = list(self._annotations)
+        newscene._auto_purge = set(self._auto_purge)
+        newscene._assemblies = dict(self._assemblies)
+        newscene._geometry_cache = self._geometry_cache
+        return newscene
+    
+    def spec(self):
+        """Return the declarative spec of every call made on this scene.
+        
+        Returns:
+            JSON-serializable dict that build() can turn back into a scene
+        """
+        return _spec.to_spec(self._ops)
+    
+    def save_spec(self, filepath):
+        """Write the scene spec to a JSON file.
+        
+        Args:
+            filepath: Output path
+        """
+        with open(filepath, 'w') as f:
+            f.write(_spec.dumps(self.spec()))
+    
+    def build(self, spec):
+        """Rebuild a recorded spec into this scene with batched creation.
+        
+        Args:
+            spec: Spec dict, or path of a file written by save_spec
+        
+        Returns:
+            self for method chaining
+        """
+        if isinstance(spec, str):
+            with open(spec) as f:
+                spec = _spec.loads(f.read())
+        _spec.build(self, spec)
+        return self
+    
+    def _build_primitive(self, builder, op, kwargs):
+        """Create one primitive from a template mesh during build()."""
+        if self._ops is not None:
+            self._ops.append({"op": op, "kwargs": dict(kwargs)})
+        self._record_depth += 1
+        try:
+            obj, rest = getattr(builder, op)(**kwargs)
+            self._finish_primitive(kwargs.get('name', op), obj, **rest)
+        finally:
+            self._record_depth -= 1
+    
+    def _finish_primitive(self, name, obj, color=None, alpha=1.0, emis=False,
+                          layer='render', matl=None, **kwargs):
+        """Assign layer and material to a primitive, as the primitive methods do."""
+        self._register(name, obj, layer)
+        
+        if color == 'sem':
+            self.sem(name=f'{name}_sem')
+            self.set_matl(obj=name, matl=f'{name}_sem')
+        elif color is not None and not emis:
+            self.flat(name=f"{name}_color", color=color, alpha=alpha)
+            self.set_matl(obj=name, matl=f"{name}_color")
+        elif color is not None and emis:
+            self.emis(name=f"{name}_color", alpha=alpha, color=color, **kwargs)
+            self.set_matl(obj=name, matl=f"{name}_color")
+        
+        if matl is not None:
+            if hasattr(matl, 'material'):
+                self.set_matl(obj=name, matl=matl.material.name)
+            else:
+                self.set_matl(obj=name, matl=matl)
+    
     def split_scene(self, filename):
         """Create a copy of the scene with a new filename.
         
@@ -804,8 +3210,129 @@ class bpwf:
             filename: New filename
         
         Returns:
-            New bpwf instance
+            New bpwf instance (see fork)
         """
-        newscene = copy.deepcopy(self)
-        newscene.filename = filename
-        return newscene
+        return self.fork(filename)
+    
+    @contextmanager
+    def _detached_layer_collections(self):
+        """Temporarily clear this scene's references to the shared layer collections.
+        
+        The freestyle line set and Line Art modifier point at the layer
+        collections, which hold objects of every scene; detaching them keeps
+        other scenes out of a snapshot of this one.
+        """
+        refs = [(lineset, 'collection')
+                for lineset in self.scene.view_layers[0].freestyle_settings.linesets]
+        lineart = self.scene.objects.get(f"bpwf_lineart_{self.scene.name}")
+        if lineart is not None:
+            for modifier in (*lineart.modifiers, *getattr(lineart, 'grease_pencil_modifiers', ())):
+                if hasattr(modifier, 'source_collection'):
+                    refs.append((modifier, 'source_collection'))
+        saved = [(owner, attr, getattr(owner, attr)) for owner, attr in refs]
+        for owner, attr, _ in saved:
+            setattr(owner, attr, None)
+        try:
+            yield
+        finally:
+            for owner, attr, value in saved:
+                setattr(owner, attr, value)
+    
+    def save_snapshot(self, filepath):
+        """Write the scene and everything it uses to a .blend library.
+        
+        Only this scene's objects and assemblies are written. bpwf names and
+        layers are stored as custom properties on the datablocks, so the
+        registry survives Blender renaming them when they are loaded.
+        
+        Args:
+            filepath: Path of the .blend file to write
+        
+        Returns:
+            Metadata dict needed by load_snapshot to rebuild the bpwf state
+        """
+        members = [obj for coll in self._assemblies.values() for obj in coll.all_objects]
+        for obj in (*self.scene.objects, *members):
+            if obj.name in self.fg.objects:
+                obj["bpwf_layer"] = 'render'
+            elif obj.name in self.tg.objects:
+                obj["bpwf_layer"] = 'trans'
+            else:
+                obj["bpwf_layer"] = ""
+        for name, obj in self._objects.items():
+            obj["bpwf_name"] = name
+        for name, coll in self._assemblies.items():
+            coll["bpwf_assembly"] = name
+        with self._detached_layer_collections():
+            bpy.data.libraries.write(filepath, {self.scene, *self._assemblies.values()},
+                                     fake_user=True, compress=True)
+        return {
+            "scene_name": self.scene.name,
+            "filename": self.filename,
+            "path": self.path,
+            "draft": self._draft,
+            "default_light": self.default_light,
+            "has_run": self.has_run,
+            "objects": {name: [obj.name, self._layers.get(name)]
+                        for name, obj in self._objects.items()},
+            "assemblies": {name: coll.name for name, coll in self._assemblies.items()},
+            "volumes": {name: {str(factor): path for factor, path in paths.items()}
+                        for name, paths in self._volumes.items()},
+            "annotations": copy.deepcopy(self._annotations),
+        }
+    
+    @classmethod
+    def load_snapshot(cls, filepath, metadata):
+        """Restore a scene written by save_snapshot.
+        
+        Args:
+            filepath: Path of the .blend library
+            metadata: Metadata dict returned by save_snapshot
+        
+        Returns:
+            New bpwf instance wrapping the restored scene
+        """
+        if bpy is None:
+            raise RuntimeError("bpy module not available. Install with: pip install bpy")
+        
+        with bpy.data.libraries.load(filepath, link=False) as (data_from, data_to):
+            data_to.scenes = [metadata["scene_name"]]
+            data_to.collections = list(metadata.get("assemblies", {}).values())
+        
+        self = cls.__new__(cls)
+        self.filename = metadata["filename"]
+        self._draft = metadata["draft"]
+        self.path = metadata["path"]
+        self.default_light = metadata["default_light"]
+        self._init_state()
+        self.has_run = metadata["has_run"]
+        self._volumes = {name: {int(factor): path for factor, path in paths.items()}
+                         for name, paths in metadata.get("volumes", {}).items()}
+        self._annotations = copy.deepcopy(metadata.get("annotations", []))
+        self.scene = data_to.scenes[0]
+        self._layer_collections()
+        
+        # Loaded datablocks may have been renamed, so match them by their tags
+        for coll in data_to.collections:
+            name = coll.get("bpwf_assembly") if coll is not None else None
+            if name is not None:
+                self._assemblies[name] = coll
+        members = [obj for coll in self._assemblies.values() for obj in coll.all_objects]
+        for obj in (*self.scene.objects, *members):
+            layer = obj.get("bpwf_layer") or None
+            if layer == 'render' and obj.name not in self.fg.objects:
+                self.fg.objects.link(obj)
+            elif layer == 'trans' and obj.name not in self.tg.objects:
+                self.tg.objects.link(obj)
+        for obj in self.scene.objects:
+            name = obj.get("bpwf_name")
+            if name is not None:
+                self._objects[name] = obj
+                self._layers[name] = obj.get("bpwf_layer") or None
+        
+        lineart = self.scene.objects.get(f"bpwf_lineart_{self.scene.name}")
+        if lineart is not None:
+            for modifier in (*lineart.modifiers, *getattr(lineart, 'grease_pencil_modifiers', ())):
+                if hasattr(modifier, 'source_collection'):
+                    modifier.source_collection = self.fg
+        return self
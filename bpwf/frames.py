@@ -0,0 +1,102 @@
+"""
+Lazy per-frame readers for time-series data.
+
+A FrameSource gives the arrays of one timestep at a time, so an animation
+of a long simulation only ever holds a few frames in memory. Supported
+sources are:
+
+- a ``.npy`` file holding a (T, N, ...) array (memory-mapped)
+- a ``.npz`` archive of (T, N, ...) arrays; stored (uncompressed) members
+  are memory-mapped, compressed members are loaded when first read
+- an HDF5 file of (T, N, ...) datasets (requires h5py)
+- a sequence of per-frame ``.npz`` files
+- a dict of (T, N, ...) arrays already in memory
+"""
+
+import os
+import zipfile
+
+import numpy as np
+
+
+def _npz_member(path, key):
+    """Memory-map a stored member of an .npz archive, or load it if compressed."""
+    member = key if key.endswith('.npy') else f"{key}.npy"
+    with zipfile.ZipFile(path) as archive:
+        info = archive.getinfo(member)
+        if info.compress_type != zipfile.ZIP_STORED:
+            with archive.open(member) as f:
+                return np.lib.format.read_array(f, allow_pickle=False)
+    with open(path, 'rb') as f:
+        # Local file header: 30 fixed bytes, then the name and extra field
+        f.seek(info.header_offset + 26)
+        name_len, extra_len = np.frombuffer(f.read(4), dtype='<u2')
+        f.seek(info.header_offset + 30 + int(name_len) + int(extra_len))
+        if np.lib.format.read_magic(f) == (1, 0):
+            header = np.lib.format.read_array_header_1_0(f)
+        else:
+            header = np.lib.format.read_array_header_2_0(f)
+        shape, fortran_order, dtype = header
+        offset = f.tell()
+    return np.memmap(path, dtype=dtype, mode='r', shape=shape, offset=offset,
+                     order='F' if fortran_order else 'C')
+
+
+class FrameSource:
+    """Read the fields of a time series one frame at a time.
+
+    Args:
+        source: Path, sequence of per-frame .npz paths, or dict of arrays
+        fields: Names of the arrays to read (for a .npy file, the single
+            name its array is reported under; defaults to all arrays)
+    """
+
+    def __init__(self, source, fields=None):
+        self._files = None
+        self._h5 = None
+        if isinstance(source, dict):
+            self._arrays = {key: source[key] for key in (fields or source)}
+        elif isinstance(source, (list, tuple)):
+            self._files = list(source)
+            with np.load(self._files[0]) as first:
+                self.fields = list(fields or first.files)
+            self._arrays = None
+        elif str(source).endswith('.npy'):
+            name = fields[0] if fields else os.path.splitext(os.path.basename(source))[0]
+            self._arrays = {name: np.load(source, mmap_mode='r')}
+        elif str(source).endswith('.npz'):
+            with zipfile.ZipFile(source) as archive:
+                keys = [name[:-4] for name in archive.namelist() if name.endswith('.npy')]
+            self._arrays = {key: _npz_member(source, key) for key in (fields or keys)}
+        elif str(source).endswith(('.h5', '.hdf5')):
+            try:
+                import h5py
+            except ImportError:
+                raise ImportError("Reading HDF5 time series requires h5py")
+            self._h5 = h5py.File(source, 'r')
+            self._arrays = {key: self._h5[key] for key in (fields or self._h5.keys())}
+        else:
+            raise ValueError(f"Unsupported time-series source: {source}")
+        if self._arrays is not None:
+            self.fields = list(self._arrays)
+            lengths = {len(array) for array in self._arrays.values()}
+            if len(lengths) != 1:
+                raise ValueError(f"Fields have different numbers of frames: {sorted(lengths)}")
+
+    def __len__(self):
+        if self._files is not None:
+            return len(self._files)
+        return len(next(iter(self._arrays.values())))
+
+    def read(self, frame):
+        """Return a dict of in-memory arrays for one frame."""
+        if self._files is not None:
+            with np.load(self._files[frame]) as data:
+                return {key: np.array(data[key]) for key in self.fields}
+        return {key: np.array(array[frame]) for key, array in self._arrays.items()}
+
+    def close(self):
+        """Close any open file handles."""
+        if self._h5 is not None:
+            self._h5.close()
+            self._h5 = None
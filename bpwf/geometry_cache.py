@@ -0,0 +1,124 @@
+"""
+Persistent on-disk cache for expensive geometry.
+
+Results of exact booleans and generated meshes are stored as ``.npz`` files
+named by a hash of everything that produced them (operand geometry,
+transforms and the operation), so re-running a script or notebook restores
+them instead of recomputing. The least recently used entries are evicted
+once the cache grows past its size limit.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+
+class GeometryCache:
+    """Content-addressed store of NumPy geometry arrays.
+
+    Args:
+        directory: Cache directory (created if missing)
+        max_bytes: Size limit; least recently used entries are evicted
+            beyond it
+    """
+
+    def __init__(self, directory, max_bytes=1024 * 1024 * 1024):
+        self.directory = str(directory)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    @classmethod
+    def from_env(cls):
+        """Create the cache configured by BPWF_GEOMETRY_CACHE_DIR, if set.
+
+        The size limit is read from BPWF_GEOMETRY_CACHE_MB (default 1024).
+        """
+        directory = os.environ.get("BPWF_GEOMETRY_CACHE_DIR")
+        if not directory:
+            return None
+        max_mb = float(os.environ.get("BPWF_GEOMETRY_CACHE_MB", "1024"))
+        return cls(directory, int(max_mb * 1024 * 1024))
+
+    @staticmethod
+    def key(*parts):
+        """Hash arrays, strings and numbers into a cache key."""
+        h = hashlib.sha1()
+        for part in parts:
+            if isinstance(part, np.ndarray):
+                h.update(str(part.dtype).encode())
+                h.update(str(part.shape).encode())
+                h.update(np.ascontiguousarray(part).data)
+            else:
+                h.update(repr(part).encode())
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.npz")
+
+    def get(self, key):
+        """Return the cached dict of arrays for a key, or None on a miss."""
+        path = self._path(key)
+        try:
+            with np.load(path, allow_pickle=False) as data:
+                arrays = {name: data[name] for name in data.files}
+        except (FileNotFoundError, OSError, ValueError):
+            self.misses += 1
+            return None
+        os.utime(path)
+        self.hits += 1
+        return arrays
+
+    def put(self, key, **arrays):
+        """Store arrays under a key, then evict entries beyond the size limit."""
+        fd, tmp = tempfile.mkstemp(suffix='.npz', dir=self.directory)
+        with os.fdopen(fd, 'wb') as f:
+            np.savez(f, **arrays)
+        os.replace(tmp, self._path(key))
+        self.writes += 1
+        self._evict()
+
+    def _entries(self):
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.npz'):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+        return sorted(entries)
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        # Never evict the newest entry, even if it alone exceeds the limit
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+            self.evictions += 1
+
+    def stats(self):
+        """Return hit/miss counts and the current size of the cache."""
+        entries = self._entries()
+        return {
+            "directory": self.directory,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "entries": len(entries),
+            "bytes": sum(size for _, size, _ in entries),
+            "max_bytes": self.max_bytes,
+        }
+
+    def clear(self):
+        """Remove every cached entry."""
+        for _, _, path in self._entries():
+            os.remove(path)
@@ -5,13 +5,30 @@ This module provides a FastMCP server that exposes bpwf functionality
 for AI-assisted 3D scene creation and rendering.
 """
 
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Union
+import base64
+import functools
+import hashlib
+import io
 import json
 import os
+import re
+import sys
 import tempfile
+import threading
+import time
 from pathlib import Path
 
+import numpy as np
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak memory is reported as null there
+    resource = None
+
 from fastmcp import FastMCP
+from fastmcp.utilities.types import Image
 
 # Import bpwf components
 from .bpwf import bpwf
@@ -20,11 +37,326 @@ from .bpwf import bpwf
 # Initialize FastMCP server
 mcp = FastMCP("bpwf-server")
 
-# Global scene storage (in-memory for now)
-_scenes: Dict[str, bpwf] = {}
+# Scene snapshots: one .blend library plus a JSON metadata file per scene
+_SNAPSHOT_DIR = Path(os.environ.get(
+    "BPWF_SNAPSHOT_DIR", Path(tempfile.gettempdir()) / "bpwf_snapshots"
+))
+_SNAPSHOT_INTERVAL = float(os.environ.get("BPWF_SNAPSHOT_INTERVAL", "0"))
+_snapshot_hashes: Dict[str, str] = {}
+_last_autosnapshot = time.monotonic()
+
+
+def _snapshot_paths(scene_id: str):
+    """Return the (.blend, .json) snapshot paths for a scene ID."""
+    stem = re.sub(r"[^\w.-]", "_", scene_id)
+    return _SNAPSHOT_DIR / f"{stem}.blend", _SNAPSHOT_DIR / f"{stem}.json"
+
+
+def _snapshot_scene(scene_id: str, scene: bpwf) -> bool:
+    """Snapshot one scene to disk if it changed since its last snapshot.
+    
+    Returns:
+        Whether a snapshot was written
+    """
+    content_hash = scene.content_hash()
+    if _snapshot_hashes.get(scene_id) == content_hash:
+        return False
+    
+    _SNAPSHOT_DIR.mkdir(parents=True, exist_ok=True)
+    blend_path, meta_path = _snapshot_paths(scene_id)
+    metadata = scene.save_snapshot(str(blend_path))
+    metadata["scene_id"] = scene_id
+    meta_path.write_text(json.dumps(metadata, indent=2))
+    _snapshot_hashes[scene_id] = content_hash
+    return True
+
+
+def _restore_scene(scene_id: str) -> Optional[bpwf]:
+    """Restore a scene from its snapshot, or return None if there is none."""
+    blend_path, meta_path = _snapshot_paths(scene_id)
+    if not (blend_path.exists() and meta_path.exists()):
+        return None
+    metadata = json.loads(meta_path.read_text())
+    if metadata.get("scene_id") != scene_id:
+        return None
+    scene = bpwf.load_snapshot(str(blend_path), metadata)
+    _snapshot_hashes[scene_id] = scene.content_hash()
+    return scene
+
+
+def _snapshotted_scene_ids() -> List[str]:
+    """Return IDs of all scenes with a snapshot on disk."""
+    if not _SNAPSHOT_DIR.exists():
+        return []
+    ids = []
+    for meta_path in _SNAPSHOT_DIR.glob("*.json"):
+        try:
+            ids.append(json.loads(meta_path.read_text())["scene_id"])
+        except (OSError, ValueError, KeyError):
+            continue
+    return ids
+
+
+class _SceneStore(dict):
+    """Scene table that lazily restores snapshotted scenes on first access."""
+    
+    def __contains__(self, scene_id):
+        if dict.__contains__(self, scene_id):
+            return True
+        scene = _restore_scene(scene_id)
+        if scene is None:
+            return False
+        self[scene_id] = scene
+        return True
+    
+    def __missing__(self, scene_id):
+        if scene_id in self:
+            return self[scene_id]
+        raise KeyError(scene_id)
+
+
+# Global scene storage, backed by on-disk snapshots
+_scenes: Dict[str, bpwf] = _SceneStore()
+
+
+def _maybe_autosnapshot() -> None:
+    """Snapshot changed scenes if the snapshot interval has elapsed."""
+    global _last_autosnapshot
+    if _SNAPSHOT_INTERVAL <= 0:
+        return
+    if time.monotonic() - _last_autosnapshot < _SNAPSHOT_INTERVAL:
+        return
+    _last_autosnapshot = time.monotonic()
+    for scene_id, scene in list(_scenes.items()):
+        try:
+            _snapshot_scene(scene_id, scene)
+        except Exception:
+            continue
+
+# Preview thumbnails, keyed by scene content hash and preview settings
+_PREVIEW_DIR = Path(tempfile.gettempdir()) / "bpwf_previews"
+
+# Rendered images served as resources, addressed by content hash (ETag)
+_IMAGE_DIR = Path(os.environ.get(
+    "BPWF_IMAGE_CACHE_DIR", Path(tempfile.gettempdir()) / "bpwf_images"
+))
+_IMAGE_CACHE_BYTES = int(float(os.environ.get("BPWF_IMAGE_CACHE_MB", "512")) * 1024 * 1024)
+_ETAG = re.compile(r"^[0-9a-f]{40}$")
+_latest_images: Dict[str, str] = {}
+
+
+def _evict(directory: Path, max_bytes: int, keep: Optional[Path] = None) -> int:
+    """Delete least recently used PNGs until the directory fits in max_bytes.
+    
+    Downscaled variants (``{etag}_{size}.png``) count towards the budget and
+    are deleted along with their original.
+    
+    Returns:
+        Number of bytes freed
+    """
+    files = sorted(directory.glob("*.png"), key=lambda p: p.stat().st_mtime)
+    total = sum(p.stat().st_size for p in files)
+    freed = 0
+    for path in files:
+        if total <= max_bytes:
+            break
+        if not path.exists():
+            continue
+        group = [path]
+        if _ETAG.match(path.stem):
+            group += list(directory.glob(f"{path.stem}_*.png"))
+        if keep in group:
+            continue
+        for member in group:
+            size = member.stat().st_size
+            member.unlink()
+            total -= size
+            freed += size
+    return freed
+
+
+def _store_image(path: str) -> str:
+    """Copy a rendered image into the content-addressed cache.
+    
+    Returns:
+        The image ETag (SHA-1 of its bytes)
+    """
+    data = Path(path).read_bytes()
+    etag = hashlib.sha1(data).hexdigest()
+    _IMAGE_DIR.mkdir(parents=True, exist_ok=True)
+    target = _IMAGE_DIR / f"{etag}.png"
+    if target.exists():
+        os.utime(target)
+    else:
+        target.write_bytes(data)
+    _evict(_IMAGE_DIR, _IMAGE_CACHE_BYTES, keep=target)
+    return etag
+
+
+def _cached_image(etag: str, size: Optional[int] = None) -> Path:
+    """Return the cached image for an ETag, downscaled to fit ``size`` pixels."""
+    if not _ETAG.match(etag):
+        raise ValueError(f"Invalid image ETag '{etag}'")
+    original = _IMAGE_DIR / f"{etag}.png"
+    if not original.exists():
+        raise FileNotFoundError(f"Image '{etag}' is not cached (it may have been evicted)")
+    
+    os.utime(original)
+    if size is None:
+        return original
+    path = _IMAGE_DIR / f"{etag}_{size}.png"
+    if path.exists():
+        os.utime(path)
+        return path
+    from PIL import Image as PILImage
+    with PILImage.open(original) as img:
+        img.thumbnail((size, size))
+        img.save(path)
+    _evict(_IMAGE_DIR, _IMAGE_CACHE_BYTES, keep=path)
+    return path
+
+# Array references look like "data.npy", "data.npz:key" or "base64:<npy bytes>"
+_NPZ_REF = re.compile(r"^(?P<path>.*\.npz)(?::(?P<key>[^:/\\]+))?$")
+
+
+def _load_array(ref: str) -> np.ndarray:
+    """Load an array reference without copying file data where possible.
+    
+    ``.npy`` files are memory-mapped read-only; only the requested ``.npz``
+    member is read, and the archive is closed afterwards; ``base64:``
+    references carry the bytes of a ``.npy`` file.
+    """
+    if ref.startswith("base64:"):
+        return np.load(io.BytesIO(base64.b64decode(ref[len("base64:"):])),
+                       allow_pickle=False)
+    
+    match = _NPZ_REF.match(ref)
+    if match:
+        # Reading the member loads it into memory, so the archive can close
+        with np.load(match.group("path"), allow_pickle=False) as archive:
+            key = match.group("key")
+            if key is None:
+                if len(archive.files) != 1:
+                    raise ValueError(
+                        f"'{ref}' holds {len(archive.files)} arrays; use '{ref}:<key>' "
+                        f"with one of {archive.files}"
+                    )
+                key = archive.files[0]
+            return archive[key]
+    
+    return np.load(ref, mmap_mode="r", allow_pickle=False)
+
+
+# Per-tool latency metrics; histogram bucket upper bounds are in milliseconds
+_LATENCY_BUCKETS_MS = (10, 50, 100, 500, 1000, 5000, 10000, 60000)
+_metrics: Dict[str, Dict[str, Any]] = {}
+_metrics_lock = threading.Lock()
+
+
+def _peak_rss_mb() -> Optional[float]:
+    """Return the peak resident memory of the server process in MB."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def _record_call(tool: str, elapsed_ms: float, error: bool,
+                 peak_growth_mb: Optional[float]) -> None:
+    """Add one tool call to the metrics table."""
+    with _metrics_lock:
+        entry = _metrics.setdefault(tool, {
+            "calls": 0,
+            "errors": 0,
+            "total_ms": 0.0,
+            "max_ms": 0.0,
+            "histogram": [0] * (len(_LATENCY_BUCKETS_MS) + 1),
+            "max_peak_growth_mb": None
+        })
+        entry["calls"] += 1
+        entry["errors"] += int(error)
+        entry["total_ms"] += elapsed_ms
+        entry["max_ms"] = max(entry["max_ms"], elapsed_ms)
+        bucket = sum(elapsed_ms > bound for bound in _LATENCY_BUCKETS_MS)
+        entry["histogram"][bucket] += 1
+        if peak_growth_mb is not None:
+            entry["max_peak_growth_mb"] = max(entry["max_peak_growth_mb"] or 0.0, peak_growth_mb)
+
+
+def _instrumented(func):
+    """Record latency, errors and memory growth for an MCP tool.
+    
+    Tools report failures as strings starting with "Error", so those count
+    as errors alongside raised exceptions. Memory is attributed to a call as
+    the amount it raised the process peak RSS by, so calls that stay below
+    an earlier high-water mark record zero.
+    
+    Changed scenes are auto-snapshotted after a successful call, outside
+    the timed section.
+    """
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        peak_before = _peak_rss_mb()
+        start = time.perf_counter()
+        error = True
+        try:
+            result = func(*args, **kwargs)
+            error = isinstance(result, str) and result.startswith("Error")
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000.0
+            peak_after = _peak_rss_mb()
+            growth = None if peak_before is None else max(0.0, peak_after - peak_before)
+            _record_call(func.__name__, elapsed_ms, error, growth)
+        _maybe_autosnapshot()
+        return result
+    return wrapper
+
+
+def _metrics_snapshot() -> Dict[str, Any]:
+    """Return a JSON-serializable copy of the metrics table."""
+    with _metrics_lock:
+        tools = {}
+        for name, entry in _metrics.items():
+            tools[name] = dict(entry, histogram=list(entry["histogram"]))
+            tools[name]["mean_ms"] = entry["total_ms"] / entry["calls"]
+    return {
+        "timestamp": time.time(),
+        "histogram_buckets_ms": list(_LATENCY_BUCKETS_MS) + ["inf"],
+        "process_peak_rss_mb": _peak_rss_mb(),
+        "tools": tools
+    }
+
+
+def _dump_metrics(path: str) -> None:
+    """Atomically write the current metrics to a JSON file."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(_metrics_snapshot(), f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _start_metrics_dump(path: str, interval: float) -> threading.Event:
+    """Dump metrics to ``path`` every ``interval`` seconds in a daemon thread.
+    
+    Returns:
+        Event that stops the dump thread when set
+    """
+    stop = threading.Event()
+    
+    def loop():
+        while not stop.wait(interval):
+            try:
+                _dump_metrics(path)
+            except OSError:
+                pass
+    
+    threading.Thread(target=loop, name="bpwf-metrics", daemon=True).start()
+    return stop
 
 
 @mcp.tool()
+@_instrumented
 def create_scene(
     scene_id: str,
     default_light: bool = True,
@@ -53,6 +385,7 @@ def create_scene(
 
 
 @mcp.tool()
+@_instrumented
 def list_scenes() -> str:
     """
     List all active scenes.
@@ -60,13 +393,15 @@ def list_scenes() -> str:
     Returns:
         JSON string with list of scene IDs
     """
+    scene_ids = sorted(set(_scenes.keys()) | set(_snapshotted_scene_ids()))
     return json.dumps({
-        "scenes": list(_scenes.keys()),
-        "count": len(_scenes)
+        "scenes": scene_ids,
+        "count": len(scene_ids)
     }, indent=2)
 
 
 @mcp.tool()
+@_instrumented
 def delete_scene(scene_id: str) -> str:
     """
     Delete a scene.
@@ -81,10 +416,15 @@ def delete_scene(scene_id: str) -> str:
         return f"Error: Scene '{scene_id}' not found."
     
     del _scenes[scene_id]
+    _snapshot_hashes.pop(scene_id, None)
+    for path in _snapshot_paths(scene_id):
+        if path.exists():
+            path.unlink()
     return f"Scene '{scene_id}' deleted successfully."
 
 
 @mcp.tool()
+@_instrumented
 def add_sphere(
     scene_id: str,
     x: float,
@@ -123,6 +463,7 @@ def add_sphere(
 
 
 @mcp.tool()
+@_instrumented
 def add_cube(
     scene_id: str,
     x1: float,
@@ -162,6 +503,7 @@ def add_cube(
 
 
 @mcp.tool()
+@_instrumented
 def add_cylinder(
     scene_id: str,
     x: float,
@@ -203,6 +545,7 @@ def add_cylinder(
 
 
 @mcp.tool()
+@_instrumented
 def add_cone(
     scene_id: str,
     x: float,
@@ -246,6 +589,94 @@ def add_cone(
 
 
 @mcp.tool()
+@_instrumented
+def add_point_cloud(
+    scene_id: str,
+    name: str,
+    positions: str,
+    radii: Optional[str] = None,
+    colors: Optional[str] = None,
+    radius: float = 0.05,
+    color: str = "#FFFFFF",
+    alpha: float = 1.0
+) -> str:
+    """
+    Add a point cloud from array data as a single object.
+    
+    Array arguments are references: a path to a ``.npy`` file (memory-mapped),
+    ``path.npz:key`` for an archive member, or ``base64:`` followed by the
+    base64-encoded bytes of a ``.npy`` file.
+    
+    Args:
+        scene_id: ID of the scene
+        name: Object name
+        positions: Reference to an (N, 3) array of point positions
+        radii: Optional reference to an (N,) array of per-point radii
+        colors: Optional reference to an (N, 3) or (N, 4) array of colors
+        radius: Radius used when no per-point radii are given
+        color: Hex color used when no per-point colors are given
+        alpha: Transparency (0.0-1.0)
+    
+    Returns:
+        Success or error message
+    """
+    if scene_id not in _scenes:
+        return f"Error: Scene '{scene_id}' not found."
+    
+    try:
+        scene = _scenes[scene_id]
+        points = _load_array(positions)
+        scene.points(
+            points,
+            radii=_load_array(radii) if radii is not None else radius,
+            colors=_load_array(colors) if colors is not None else None,
+            name=name, color=color, alpha=alpha
+        )
+        return f"Point cloud '{name}' with {len(points)} points added to scene '{scene_id}'."
+    except Exception as e:
+        return f"Error adding point cloud: {str(e)}"
+
+
+@mcp.tool()
+@_instrumented
+def add_triangle_mesh(
+    scene_id: str,
+    name: str,
+    vertices: str,
+    faces: str,
+    color: str = "#FFFFFF",
+    alpha: float = 1.0
+) -> str:
+    """
+    Add a triangle mesh from array data.
+    
+    Array arguments are references, as for ``add_point_cloud``.
+    
+    Args:
+        scene_id: ID of the scene
+        name: Object name
+        vertices: Reference to a (V, 3) array of vertex positions
+        faces: Reference to an (F, 3) array of vertex indices
+        color: Hex color code
+        alpha: Transparency (0.0-1.0)
+    
+    Returns:
+        Success or error message
+    """
+    if scene_id not in _scenes:
+        return f"Error: Scene '{scene_id}' not found."
+    
+    try:
+        scene = _scenes[scene_id]
+        tris = _load_array(faces)
+        scene.mesh(_load_array(vertices), tris, name=name, color=color, alpha=alpha)
+        return f"Mesh '{name}' with {len(tris)} triangles added to scene '{scene_id}'."
+    except Exception as e:
+        return f"Error adding mesh: {str(e)}"
+
+
+@mcp.tool()
+@_instrumented
 def add_point_light(
     scene_id: str,
     x: float,
@@ -280,6 +711,7 @@ def add_point_light(
 
 
 @mcp.tool()
+@_instrumented
 def add_sun_light(
     scene_id: str,
     strength: float = 1.0
@@ -306,6 +738,7 @@ def add_sun_light(
 
 
 @mcp.tool()
+@_instrumented
 def boolean_operation(
     scene_id: str,
     left_object: str,
@@ -347,6 +780,7 @@ def boolean_operation(
 
 
 @mcp.tool()
+@_instrumented
 def render_scene(
     scene_id: str,
     camera_x: float = 5.0,
@@ -358,7 +792,8 @@ def render_scene(
     samples: int = 128,
     resolution_x: int = 1920,
     resolution_y: int = 1080,
-    output_filename: Optional[str] = None
+    output_filename: Optional[str] = None,
+    fit: bool = False
 ) -> str:
     """
     Render the scene to an image.
@@ -371,6 +806,8 @@ def render_scene(
         resolution_x: Image width in pixels
         resolution_y: Image height in pixels
         output_filename: Optional output filename (without extension)
+        fit: Frame the whole scene automatically, keeping only the camera's
+            viewing direction
     
     Returns:
         Success message with output path or error message
@@ -392,16 +829,99 @@ def render_scene(
             l=[2, 2, 2],
             samples=samples,
             res=[resolution_x, resolution_y],
+            fit=fit,
             block=True
         )
         
         output_path = f"{scene.filename}.png"
-        return f"Scene '{scene_id}' rendered successfully to: {output_path}"
+        etag = _store_image(os.path.join(scene.path, output_path))
+        _latest_images[scene_id] = etag
+        return (
+            f"Scene '{scene_id}' rendered successfully to: {output_path} "
+            f"(etag: {etag}, resource: bpwf://images/{etag})"
+        )
     except Exception as e:
         return f"Error rendering scene: {str(e)}"
 
 
 @mcp.tool()
+@_instrumented
+def preview_scene(
+    scene_id: str,
+    camera_x: float = 5.0,
+    camera_y: float = -5.0,
+    camera_z: float = 3.0,
+    target_x: float = 0.0,
+    target_y: float = 0.0,
+    target_z: float = 0.0,
+    samples: int = 8,
+    resolution_x: int = 320,
+    resolution_y: int = 180,
+    engine: str = "CYCLES",
+    fit: bool = False
+) -> Union[Image, str]:
+    """
+    Render a small, low-sample, denoised preview of the scene.
+    
+    Previews are cached by scene content, so calling this again on an
+    unchanged scene returns the cached thumbnail without rendering.
+    
+    Args:
+        scene_id: ID of the scene to preview
+        camera_x, camera_y, camera_z: Camera position
+        target_x, target_y, target_z: Point the camera looks at
+        samples: Number of render samples
+        resolution_x: Thumbnail width in pixels
+        resolution_y: Thumbnail height in pixels
+        engine: Render engine ('CYCLES', 'BLENDER_EEVEE_NEXT' or 'BLENDER_WORKBENCH')
+        fit: Frame the whole scene automatically
+    
+    Returns:
+        The preview image, or an error message
+    """
+    if scene_id not in _scenes:
+        return f"Error: Scene '{scene_id}' not found."
+    
+    try:
+        scene = _scenes[scene_id]
+        
+        key = hashlib.sha1(json.dumps([
+            scene.content_hash(),
+            [camera_x, camera_y, camera_z],
+            [target_x, target_y, target_z],
+            samples, resolution_x, resolution_y, engine, fit
+        ]).encode()).hexdigest()
+        preview_path = _PREVIEW_DIR / f"{key}.png"
+        
+        if not preview_path.exists():
+            _PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+            
+            # Render into the preview cache without touching the scene's own output
+            saved = (scene.path, scene.filename, scene.has_run)
+            scene.path, scene.filename = str(_PREVIEW_DIR), key
+            try:
+                scene.render(
+                    camera_location=[camera_x, camera_y, camera_z],
+                    c=[target_x, target_y, target_z],
+                    l=[2, 2, 2],
+                    samples=samples,
+                    res=[resolution_x, resolution_y],
+                    engine=engine,
+                    fit=fit,
+                    denoise=True,
+                    save_blend=False
+                )
+            finally:
+                scene.path, scene.filename, scene.has_run = saved
+            _evict(_PREVIEW_DIR, _IMAGE_CACHE_BYTES, keep=preview_path)
+        
+        return Image(path=preview_path)
+    except Exception as e:
+        return f"Error previewing scene: {str(e)}"
+
+
+@mcp.tool()
+@_instrumented
 def get_bpy_status() -> str:
     """
     Check bpy availability and configuration.
@@ -432,6 +952,62 @@ def get_bpy_status() -> str:
 
 
 @mcp.tool()
+@_instrumented
+def snapshot_scene(scene_id: Optional[str] = None) -> str:
+    """
+    Save scenes to disk so they survive a server restart.
+    
+    Snapshotted scenes are restored automatically the first time they are
+    used after a restart. Unchanged scenes are not rewritten.
+    
+    Args:
+        scene_id: ID of the scene to snapshot; all scenes if omitted
+    
+    Returns:
+        JSON string listing written and unchanged scenes, or error message
+    """
+    if scene_id is not None and scene_id not in _scenes:
+        return f"Error: Scene '{scene_id}' not found."
+    
+    scene_ids = [scene_id] if scene_id is not None else list(_scenes.keys())
+    written, unchanged = [], []
+    try:
+        for sid in scene_ids:
+            if _snapshot_scene(sid, _scenes[sid]):
+                written.append(sid)
+            else:
+                unchanged.append(sid)
+    except Exception as e:
+        return f"Error snapshotting scene: {str(e)}"
+    
+    return json.dumps({
+        "written": written,
+        "unchanged": unchanged,
+        "directory": str(_SNAPSHOT_DIR)
+    }, indent=2)
+
+
+@mcp.tool()
+@_instrumented
+def get_server_metrics(reset: bool = False) -> str:
+    """
+    Get per-tool latency histograms, error counts and memory growth.
+    
+    Args:
+        reset: Whether to clear the metrics after reading them
+    
+    Returns:
+        JSON string with server metrics
+    """
+    snapshot = _metrics_snapshot()
+    if reset:
+        with _metrics_lock:
+            _metrics.clear()
+    return json.dumps(snapshot, indent=2)
+
+
+@mcp.tool()
+@_instrumented
 def get_scene_info(scene_id: str) -> str:
     """
     Get information about a scene.
@@ -452,7 +1028,39 @@ def get_scene_info(scene_id: str) -> str:
         "filename": scene.filename,
         "has_run": scene.has_run,
         "particles_count": len(scene.particles) if hasattr(scene, 'particles') else 0,
-        "draft_mode": scene._draft
+        "draft_mode": scene._draft,
+        "last_timings": getattr(scene, 'last_timings', None)
+    }, indent=2)
+
+
+@mcp.resource("bpwf://images/{etag}", mime_type="image/png")
+def rendered_image(etag: str) -> bytes:
+    """
+    A rendered image, addressed by its content hash.
+    
+    The URI changes whenever the image does, so clients can cache by URI.
+    """
+    return _cached_image(etag).read_bytes()
+
+
+@mcp.resource("bpwf://images/{etag}/{size}", mime_type="image/png")
+def rendered_image_thumbnail(etag: str, size: int) -> bytes:
+    """
+    A rendered image downscaled to fit within ``size`` x ``size`` pixels.
+    """
+    return _cached_image(etag, int(size)).read_bytes()
+
+
+@mcp.resource("bpwf://renders/{scene_id}", mime_type="application/json")
+def latest_render(scene_id: str) -> str:
+    """
+    The ETag and image URI of a scene's most recent render.
+    """
+    etag = _latest_images.get(scene_id)
+    return json.dumps({
+        "scene_id": scene_id,
+        "etag": etag,
+        "uri": f"bpwf://images/{etag}" if etag else None
     }, indent=2)
 
 
@@ -473,11 +1081,23 @@ def main():
     print("\nServer ready. Available tools:")
     print("  - create_scene: Create a new 3D scene")
     print("  - add_sphere, add_cube, add_cylinder, add_cone: Add primitives")
+    print("  - add_point_cloud, add_triangle_mesh: Add bulk geometry from arrays")
     print("  - add_point_light, add_sun_light: Add lighting")
     print("  - boolean_operation: Perform boolean operations")
     print("  - render_scene: Render the scene to an image")
+    print("  - preview_scene: Render a cached low-resolution thumbnail")
     print("  - get_bpy_status: Check bpy configuration")
+    print("  - bpwf://images/{etag}[/{size}]: Cached rendered images (resources)")
     print("  - list_scenes, get_scene_info, delete_scene: Scene management")
+    print("  - snapshot_scene: Persist scenes across server restarts")
+    print("  - get_server_metrics: Per-tool latency and memory metrics")
+    
+    # Optional periodic metrics dump for dashboards
+    metrics_file = os.environ.get("BPWF_METRICS_FILE")
+    if metrics_file:
+        interval = float(os.environ.get("BPWF_METRICS_INTERVAL", "60"))
+        _start_metrics_dump(metrics_file, interval)
+        print(f"\nWriting metrics to {metrics_file} every {interval:g} s")
     
     # Start the server
     mcp.run()
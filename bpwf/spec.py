@@ -0,0 +1,242 @@
+"""
+Declarative scene specs for bpwf.
+
+Every primitive, material, boolean and light call on a bpwf scene is
+recorded as an operation in a compact, JSON-serializable spec. A spec can
+be saved, shipped to another process and rebuilt with ``build``, which
+creates primitives from shared template meshes instead of one operator
+call per object.
+"""
+
+import base64
+import functools
+import inspect
+import io
+import json
+
+import numpy as np
+
+try:
+    import bpy
+    import bmesh
+    from mathutils import Euler, Matrix
+except ImportError:
+    # Allow import without bpy for testing
+    bpy = None
+
+SPEC_VERSION = 1
+
+# Operations that build() creates from template meshes
+_BATCHED_OPS = ('sph', 'rpp', 'rcc', 'cone')
+
+
+def recorded(func):
+    """Record a top-level call of a bpwf method in the scene's spec.
+
+    Calls made from inside another recorded method (e.g. the material that
+    ``sph`` creates for its color) are not recorded separately, because
+    replaying the outer call recreates them.
+    """
+    signature = inspect.signature(func)
+
+    @functools.wraps(func)
+    def wrapper(self, *args, **kwargs):
+        depth = getattr(self, '_record_depth', 0)
+        if depth == 0 and getattr(self, '_ops', None) is not None:
+            bound = signature.bind(self, *args, **kwargs)
+            arguments = dict(bound.arguments)
+            arguments.pop('self')
+            for name, param in signature.parameters.items():
+                if param.kind == param.VAR_KEYWORD:
+                    arguments.update(arguments.pop(name, {}))
+            self._ops.append({"op": func.__name__, "kwargs": arguments})
+        self._record_depth = depth + 1
+        try:
+            return func(self, *args, **kwargs)
+        finally:
+            self._record_depth = depth
+    return wrapper
+
+
+def encode_value(value):
+    """Convert a recorded argument into a JSON-serializable value."""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return value
+    if isinstance(value, np.ndarray):
+        buf = io.BytesIO()
+        np.save(buf, np.ascontiguousarray(value), allow_pickle=False)
+        return {"__ndarray__": base64.b64encode(buf.getvalue()).decode('ascii')}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, dict):
+        return {key: encode_value(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_value(item) for item in value]
+    if hasattr(value, 'material') and hasattr(value, 'params'):
+        return {"__principled__": encode_value(value.params)}
+    if hasattr(value, 'name') and hasattr(value, 'bl_rna'):
+        # Blender datablocks are recorded by name
+        return value.name
+    try:
+        # mathutils vectors, colors and other sequences
+        return [encode_value(item) for item in value]
+    except TypeError:
+        return value
+
+
+def decode_value(value):
+    """Invert encode_value."""
+    if isinstance(value, dict):
+        if "__ndarray__" in value:
+            return np.load(io.BytesIO(base64.b64decode(value["__ndarray__"])),
+                           allow_pickle=False)
+        if "__principled__" in value:
+            from .bpwf import PrincipledBSDF
+            return PrincipledBSDF(**decode_value(value["__principled__"]))
+        return {key: decode_value(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [decode_value(item) for item in value]
+    return value
+
+
+def to_spec(ops):
+    """Build a serializable spec from a list of recorded operations."""
+    return {
+        "version": SPEC_VERSION,
+        "ops": [{"op": op["op"], "kwargs": encode_value(op["kwargs"])} for op in ops],
+    }
+
+
+def dumps(spec):
+    """Serialize a spec to a compact JSON string."""
+    return json.dumps(spec, separators=(',', ':'))
+
+
+def loads(text):
+    """Parse a JSON spec, checking its version."""
+    spec = json.loads(text)
+    if spec.get("version") != SPEC_VERSION:
+        raise ValueError(f"Unsupported scene spec version: {spec.get('version')}")
+    return spec
+
+
+class _TemplateBuilder:
+    """Create primitives by copying and transforming shared template meshes.
+
+    Geometry matches the operator-based bpwf primitives, but each object
+    costs a mesh copy and a matrix multiply instead of several operator
+    calls and depsgraph updates.
+    """
+
+    def __init__(self, scene):
+        self.scene = scene
+        self.templates = {}
+
+    def template(self, key, create):
+        if key not in self.templates:
+            bm = bmesh.new()
+            create(bm)
+            mesh = bpy.data.meshes.new(f"_bpwf_template_{key[0]}")
+            bm.to_mesh(mesh)
+            bm.free()
+            self.templates[key] = mesh
+        return self.templates[key]
+
+    def place(self, template, matrix, name):
+        mesh = template.copy()
+        mesh.name = name
+        mesh.transform(matrix)
+        obj = bpy.data.objects.new(name, mesh)
+        self.scene.scene.collection.objects.link(obj)
+        return obj
+
+    def free(self):
+        for mesh in self.templates.values():
+            bpy.data.meshes.remove(mesh)
+        self.templates.clear()
+
+    def sph(self, c=None, r=None, name="sph", subd=4, **kwargs):
+        mesh = self.template(
+            ("sph", subd),
+            lambda bm: bmesh.ops.create_icosphere(bm, subdivisions=subd, radius=1.0))
+        matrix = Matrix.Translation(c if c is not None else (0., 0., 0.)) @ Matrix.Scale(r, 4)
+        return self.place(mesh, matrix, name), kwargs
+
+    def rpp(self, x1=None, x2=None, y1=None, y2=None, z1=None, z2=None, c=None,
+            l=None, name="rpp", r=None, **kwargs):
+        if None not in (x1, x2, y1, y2, z1, z2):
+            c = [np.mean([x1, x2]), np.mean([y1, y2]), np.mean([z1, z2])]
+            l = [x2 - x1, y2 - y1, z2 - z1]
+        mesh = self.template(("rpp",), lambda bm: bmesh.ops.create_cube(bm, size=2.0))
+        matrix = Matrix.Translation(c) @ Matrix.Diagonal((l[0]/2., l[1]/2., l[2]/2., 1.))
+        if r is not None:
+            matrix = Euler(r).to_matrix().to_4x4() @ matrix
+        return self.place(mesh, matrix, name), kwargs
+
+    def rcc(self, c=None, r=None, h=None, name="rcc", direction='z', **kwargs):
+        direction, rotation = _axis_rotation(direction)
+        c = list(c)
+        c[direction] += h/2.
+        axis = [r, r, r]
+        axis[direction] = h/2.
+        mesh = self.template(
+            ("rcc",),
+            lambda bm: bmesh.ops.create_cone(bm, cap_ends=True, segments=128,
+                                             radius1=1.0, radius2=1.0, depth=2.0))
+        matrix = (Matrix.Translation(c) @ Matrix.Diagonal((*axis, 1.)) @
+                  Euler(rotation).to_matrix().to_4x4())
+        return self.place(mesh, matrix, name), kwargs
+
+    def cone(self, c=(0., 0., 0.), r1=None, r2=None, h=None, name="cone",
+             direction='z', rotation=None, **kwargs):
+        direction, default_rotation = _axis_rotation(direction)
+        if rotation is None:
+            rotation = default_rotation
+        c = list(c)
+        c[direction] += h/2.
+        mesh = self.template(
+            ("cone", r1, r2, h),
+            lambda bm: bmesh.ops.create_cone(bm, cap_ends=True, segments=32,
+                                             radius1=r1, radius2=r2, depth=h))
+        matrix = Matrix.Translation(c) @ Euler(rotation).to_matrix().to_4x4()
+        return self.place(mesh, matrix, name), kwargs
+
+
+def _axis_rotation(direction):
+    """Return the axis index and Euler rotation bpwf uses for a direction."""
+    rotation = [0., 0., 0.]
+    if direction == 'z':
+        direction, rotdir = 2, 2
+    elif direction == 'y':
+        direction, rotdir = 1, 0
+    elif direction == 'x':
+        direction, rotdir = 0, 1
+    else:
+        direction = int(direction)
+        rotdir = 1 if direction == 0 else (0 if direction == 1 else 2)
+    rotation[rotdir] = np.pi/2.
+    return direction, rotation
+
+
+def build(scene, spec):
+    """Rebuild a spec into a bpwf scene.
+
+    Spheres, boxes, cylinders and cones are created from shared template
+    meshes; every other operation is replayed through the bpwf method it
+    was recorded from. The rebuilt operations are recorded in ``scene``.
+
+    Args:
+        scene: Target bpwf scene
+        spec: Spec dict (from bpwf.spec() or loads())
+    """
+    builder = _TemplateBuilder(scene)
+    try:
+        for entry in spec["ops"]:
+            op = entry["op"]
+            kwargs = decode_value(entry["kwargs"])
+            if op in _BATCHED_OPS and kwargs.get('verts') is None:
+                scene._build_primitive(builder, op, kwargs)
+            else:
+                getattr(scene, op)(**kwargs)
+    finally:
+        builder.free()
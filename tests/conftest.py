@@ -60,6 +60,21 @@ def sample_scene(mock_bpy):
     return scene
 
 
+@pytest.fixture
+def mocked_scene(mock_bpy):
+    """Create a bpwf scene whose bpy.data collections are all mocks."""
+    for attr in ('objects', 'materials', 'meshes', 'lights', 'cameras',
+                 'collections', 'node_groups', 'images'):
+        setattr(mock_bpy.data, attr, MagicMock())
+    # New objects own their data unless a test shares it
+    mock_bpy.data.objects.new.return_value.data.users = 1
+    mock_bpy.context.object.data.users = 1
+    
+    from bpwf import bpwf
+    
+    return bpwf(default_light=False)
+
+
 @pytest.fixture
 def mock_mcp_scenes(monkeypatch):
     """Mock the global _scenes dictionary for MCP server tests."""
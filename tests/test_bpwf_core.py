@@ -342,3 +342,1288 @@ class TestBpwfRendering:
         
         # Verify render was called
         assert scene.scene.render.engine == 'CYCLES'
+
+
+class TestBpwfBulkGeometry:
+    """Test NumPy-backed bulk geometry creation."""
+    
+    def test_points(self, mocked_scene, mock_bpy):
+        """Test point cloud creation writes positions in one call."""
+        import numpy as np
+        
+        positions = np.random.rand(100, 3)
+        mocked_scene.points(positions, radii=np.full(100, 0.1), name="cloud")
+        
+        mesh = mock_bpy.data.meshes.new.return_value
+        mesh.vertices.add.assert_called_with(100)
+        co = mesh.vertices.foreach_set.call_args[0][1]
+        assert co.dtype == np.float32 and co.size == 300
+        mock_bpy.data.node_groups.new.assert_called()
+    
+    def test_mesh(self, mocked_scene, mock_bpy):
+        """Test triangle mesh creation from arrays."""
+        import numpy as np
+        
+        verts = np.array([[0, 0, 0], [1, 0, 0], [0, 1, 0], [0, 0, 1]], dtype=float)
+        faces = np.array([[0, 1, 2], [0, 1, 3], [0, 2, 3], [1, 2, 3]])
+        mocked_scene.mesh(verts, faces, name="tet", color="#FF0000")
+        
+        mesh = mock_bpy.data.meshes.new.return_value
+        mesh.polygons.add.assert_called_with(4)
+        loop_start = mesh.polygons.foreach_set.call_args[0][1]
+        assert list(loop_start) == [0, 3, 6, 9]
+    
+    def test_tracks(self, mocked_scene, mock_bpy):
+        """Test that ragged polylines become one curves object."""
+        import numpy as np
+        
+        tracks = [np.zeros((3, 3)), np.ones((5, 3)), np.zeros((2, 3))]
+        colors = np.array([[255, 0, 0], [0, 255, 0], [0, 0, 255]], dtype=np.uint8)
+        mocked_scene.tracks(tracks, radius=0.1, colors=colors, name="tr")
+        
+        curves = mock_bpy.data.hair_curves.new.return_value
+        curves.add_curves.assert_called_once_with([3, 5, 2])
+        co = curves.position_data.foreach_set.call_args[0][1]
+        assert co.size == 30
+        rgba = curves.attributes.new.return_value.data.foreach_set.call_args[0][1]
+        assert rgba.reshape(-1, 4)[2].tolist() == [0., 0., 1., 1.]
+        mock_bpy.data.objects.new.assert_called_once()
+    
+    def test_tracks_concatenated(self, mocked_scene, mock_bpy):
+        """Test passing concatenated points with track lengths."""
+        import numpy as np
+        
+        mocked_scene.tracks(np.zeros((7, 3)), lengths=[4, 3])
+        with pytest.raises(ValueError):
+            mocked_scene.tracks(np.zeros((7, 3)), lengths=[4, 4])
+        with pytest.raises(ValueError):
+            mocked_scene.tracks([np.zeros((1, 3))])
+    
+    def test_glyphs(self, mocked_scene, mock_bpy):
+        """Test that vectors become instanced arrows on one object."""
+        import numpy as np
+        
+        mock_bpy.data.materials.new.side_effect = lambda name: MagicMock(name=name)
+        mesh = mock_bpy.data.meshes.new.return_value
+        mesh.attributes.get.return_value = None
+        vectors = np.array([[0., 0., 2.], [1., 0., 0.], [0., 3., 4.]])
+        
+        mocked_scene.glyphs(np.zeros((3, 3)), vectors, scale=0.5, colormap="viridis",
+                            name="field")
+        
+        written = {c[0][0]: c[0][1] for c in mesh.attributes.new.call_args_list}
+        assert written == {"direction": 'FLOAT_VECTOR', "magnitude": 'FLOAT',
+                           "length": 'FLOAT'}
+        length = mesh.attributes.new.return_value.data.foreach_set.call_args[0][1]
+        assert np.allclose(length, [1., 0.5, 2.5])
+        material = mocked_scene._materials["field_color"]
+        nodes = material.node_tree.nodes.new.call_args_list
+        assert ("ShaderNodeValToRGB",) in [c[0] for c in nodes]
+        mock_bpy.data.objects.new.assert_called_once()
+    
+    def test_glyph_count_mismatch(self, mocked_scene, mock_bpy):
+        """Test rejecting mismatched positions and vectors."""
+        import numpy as np
+        
+        with pytest.raises(ValueError):
+            mocked_scene.glyphs(np.zeros((3, 3)), np.zeros((2, 3)))
+    
+    def test_mixed_polygons(self, mock_bpy):
+        """Test flattening faces with different numbers of corners."""
+        from bpwf.bpwf import _face_arrays
+        
+        loops, starts = _face_arrays([[0, 1, 2, 3], [3, 2, 4]])
+        
+        assert list(loops) == [0, 1, 2, 3, 3, 2, 4]
+        assert list(starts) == [0, 4]
+    
+    def test_mesh_normals_and_attributes(self, mocked_scene, mock_bpy):
+        """Test writing custom normals and per-vertex attributes."""
+        import numpy as np
+        
+        verts = np.zeros((4, 3))
+        normals = np.tile([0., 0., 1.], (4, 1))
+        mock_bpy.data.meshes.new.return_value.attributes.get.return_value = None
+        mocked_scene.mesh(verts, np.array([[0, 1, 2, 3]]), normals=normals,
+                          attributes={"dose": np.arange(4.), "flow": normals})
+        
+        mesh = mock_bpy.data.meshes.new.return_value
+        kinds = [c[0][1] for c in mesh.attributes.new.call_args_list]
+        assert kinds == ['FLOAT', 'FLOAT_VECTOR']
+        assert mesh.normals_split_custom_set_from_vertices.call_args[0][0].shape == (4, 3)
+    
+    def test_mesh_bad_attribute(self, mocked_scene, mock_bpy):
+        """Test rejecting attributes with an unsupported shape."""
+        import numpy as np
+        
+        mock_bpy.data.meshes.new.return_value.attributes.get.return_value = None
+        with pytest.raises(ValueError):
+            mocked_scene.mesh(np.zeros((3, 3)), np.array([[0, 1, 2]]),
+                              attributes={"bad": np.zeros((3, 2))})
+
+
+class TestBpwfSnapshots:
+    """Test saving scenes to .blend libraries."""
+    
+    def test_save_snapshot(self, mocked_scene, mock_bpy):
+        """Test that a snapshot writes only the scene and tags its objects."""
+        obj = MagicMock()
+        mocked_scene._register("ball", obj, layer='trans')
+        metadata = mocked_scene.save_snapshot("/tmp/scene.blend")
+        
+        args = mock_bpy.data.libraries.write.call_args[0]
+        assert args[0] == "/tmp/scene.blend"
+        assert args[1] == {mocked_scene.scene}
+        assert metadata["filename"] == mocked_scene.filename
+        obj.__setitem__.assert_any_call("bpwf_name", "ball")
+    
+    def test_load_snapshot_survives_renames(self, mocked_scene, mock_bpy):
+        """Test that the registry is rebuilt from tags, not datablock names."""
+        from bpwf import bpwf
+        
+        class Tagged(dict):
+            name = "ball.001"
+        
+        obj = Tagged(bpwf_name="ball", bpwf_layer="render")
+        scene = MagicMock()
+        scene.objects.__iter__.return_value = [obj]
+        scene.objects.get.return_value = None
+        data_to = MagicMock()
+        
+        def loaded(*args):
+            data_to.scenes = [scene]
+            data_to.collections = []
+            return False
+        
+        mock_bpy.data.libraries.load.return_value.__enter__.return_value = (MagicMock(), data_to)
+        mock_bpy.data.libraries.load.return_value.__exit__.side_effect = loaded
+        restored = bpwf.load_snapshot("/tmp/scene.blend", {
+            "scene_name": "s", "filename": "f", "path": "/tmp", "draft": False,
+            "default_light": True, "has_run": False,
+            "objects": {"ball": ["ball", "render"]}})
+        
+        assert restored._lookup("ball") is obj
+        assert restored._layers["ball"] == 'render'
+        restored.fg.objects.link.assert_called_once_with(obj)
+
+
+class TestBpwfFork:
+    """Test copy-on-write scene forks."""
+    
+    def test_fork_clones_objects(self, mocked_scene):
+        """Test that a fork links object copies and resolves original names."""
+        original = MagicMock()
+        original.name = "sphere"
+        original.type = 'MESH'
+        camera = MagicMock()
+        camera.type = 'CAMERA'
+        forked_scene = mocked_scene.scene.copy.return_value
+        forked_scene.collection.objects.__iter__.return_value = [original, camera]
+        
+        fork = mocked_scene.fork("variant")
+        
+        assert fork.filename == "variant"
+        assert fork.scene is forked_scene
+        assert fork._lookup("sphere") is original.copy.return_value
+        forked_scene.collection.objects.link.assert_called_once_with(
+            original.copy.return_value)
+        assert mocked_scene._lookup("sphere") is not original.copy.return_value
+
+
+class TestBpwfSpec:
+    """Test recording and rebuilding declarative scene specs."""
+    
+    def test_records_top_level_calls(self, mocked_scene):
+        """Test that only top-level calls are recorded."""
+        mocked_scene.sph(c=[0, 0, 0], r=1.0, name="ball", color="#FF0000")
+        mocked_scene.sun(strength=2.0)
+        
+        ops = mocked_scene.spec()["ops"]
+        assert [op["op"] for op in ops] == ["sph", "sun"]
+        assert ops[0]["kwargs"] == {"c": [0, 0, 0], "r": 1.0, "name": "ball",
+                                    "color": "#FF0000"}
+    
+    def test_spec_round_trip(self, mocked_scene, temp_dir):
+        """Test that specs with arrays survive JSON serialization."""
+        import os
+        import numpy as np
+        from bpwf import spec
+        
+        verts = np.random.rand(4, 3)
+        mocked_scene.mesh(verts, np.array([[0, 1, 2], [1, 2, 3]]), name="m")
+        path = os.path.join(temp_dir, "scene.json")
+        mocked_scene.save_spec(path)
+        
+        with open(path) as f:
+            loaded = spec.loads(f.read())
+        kwargs = spec.decode_value(loaded["ops"][0]["kwargs"])
+        assert np.array_equal(kwargs["vertices"], verts)
+    
+    def test_build_replays_ops(self, mocked_scene):
+        """Test that build replays non-primitive operations."""
+        from unittest.mock import patch
+        
+        spec = {"version": 1, "ops": [
+            {"op": "flat", "kwargs": {"name": "red", "color": "#FF0000"}},
+            {"op": "sun", "kwargs": {"strength": 3.0}},
+        ]}
+        with patch.object(type(mocked_scene), "sun") as sun:
+            mocked_scene.build(spec)
+        
+        sun.assert_called_once_with(strength=3.0)
+        assert mocked_scene.spec()["ops"][0]["op"] == "flat"
+
+
+class TestBpwfIncrementalRender:
+    """Test change tracking between renders."""
+    
+    def test_unchanged_scene_skips_render(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that re-rendering an unchanged scene is skipped."""
+        import os
+        
+        mocked_scene.path = temp_dir
+        open(os.path.join(temp_dir, "brender_01.png"), "wb").close()
+        
+        first = mocked_scene.render()
+        second = mocked_scene.render()
+        
+        assert first["full"] is True
+        assert second == {"objects": [], "materials": [], "settings": [], "full": False}
+        assert mock_bpy.ops.render.render.call_count == 1
+        assert mocked_scene.scene.render.use_persistent_data is True
+    
+    def test_changed_settings_reported(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that changed render settings are reported and re-rendered."""
+        import os
+        
+        mocked_scene.path = temp_dir
+        open(os.path.join(temp_dir, "brender_01.png"), "wb").close()
+        
+        mocked_scene.render(samples=20)
+        changes = mocked_scene.render(samples=64)
+        
+        assert changes["settings"] == ["samples"]
+        assert mock_bpy.ops.render.render.call_count == 2
+
+
+    def test_color_by_triggers_rerender(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that rewriting an attribute marks its object as changed."""
+        import os
+        import numpy as np
+        
+        class Buffer:
+            def __init__(self, n):
+                self.values = np.zeros(n, dtype=np.float32)
+            
+            def __len__(self):
+                return len(self.values)
+            
+            def foreach_set(self, field, values):
+                self.values[:] = values
+            
+            def foreach_get(self, field, out):
+                out[:] = self.values
+        
+        attr = MagicMock(data_type='FLOAT', domain='POINT', data=Buffer(4))
+        attr.name = "dose"
+        obj = MagicMock(type='MESH', matrix_world=np.eye(4), material_slots=[],
+                        instance_collection=None)
+        obj.name = "part"
+        obj.data.users = 1
+        obj.data.vertices.__len__.return_value = 4
+        obj.data.attributes.get.return_value = attr
+        obj.data.attributes.__iter__.return_value = [attr]
+        mocked_scene._register("part", obj)
+        mocked_scene.scene.objects.__iter__.return_value = [obj]
+        mocked_scene.path = temp_dir
+        open(os.path.join(temp_dir, "brender_01.png"), "wb").close()
+        
+        mocked_scene.render()
+        mocked_scene.color_by("part", np.arange(4.), attribute="dose")
+        changes = mocked_scene.render()
+        
+        assert changes["objects"] == ["part"]
+        assert mock_bpy.ops.render.render.call_count == 2
+
+
+    def test_moved_object_is_dirty(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that a .location edit is seen once the depsgraph is updated."""
+        import os
+        import numpy as np
+        
+        obj = MagicMock(type='MESH', material_slots=[], instance_collection=None,
+                        location=(0., 0., 0.), matrix_world=np.eye(4))
+        obj.name = "part"
+        mocked_scene.scene.objects.__iter__.return_value = [obj]
+        
+        def update():
+            matrix = np.eye(4)
+            matrix[:3, 3] = obj.location
+            obj.matrix_world = matrix
+        
+        mocked_scene.scene.view_layers[0].update.side_effect = update
+        mocked_scene.path = temp_dir
+        open(os.path.join(temp_dir, "brender_01.png"), "wb").close()
+        
+        mocked_scene.render(fit=False)
+        obj.location = (0., 5., 0.)
+        changes = mocked_scene.render(fit=False)
+        
+        assert changes["objects"] == ["part"]
+        assert mock_bpy.ops.render.render.call_count == 2
+
+
+class TestBpwfRegistry:
+    """Test the per-scene object and material registry."""
+    
+    def test_lookup_survives_blender_renames(self, mocked_scene, mock_bpy):
+        """Test that names resolve to the datablocks bpwf created."""
+        mock_bpy.data.materials.new.side_effect = lambda name: MagicMock(name=name)
+        first = MagicMock()
+        first.data.users = 1
+        second = MagicMock()
+        mocked_scene._register("part", first)
+        mocked_scene._register("other", second, layer='trans')
+        mocked_scene.flat(name="part_color", color="#FF0000")
+        
+        mocked_scene.set_matl(obj="part", matl="part_color")
+        
+        assert first.active_material is mocked_scene._materials["part_color"]
+        assert mocked_scene._lookup("other") is second
+    
+    def test_objects_by_layer(self, mocked_scene):
+        """Test listing registered objects by layer."""
+        mocked_scene._register("a", MagicMock(), layer='render')
+        mocked_scene._register("b", MagicMock(), layer='trans')
+        mocked_scene._register("c", MagicMock())
+        
+        assert mocked_scene.objects() == ["a", "b", "c"]
+        assert mocked_scene.objects(layer='trans') == ["b"]
+    
+    def test_delete_unregisters(self, mocked_scene, mock_bpy):
+        """Test that deleting an object removes it from the registry."""
+        obj = MagicMock()
+        mocked_scene._register("gone", obj)
+        
+        mocked_scene.delete("gone")
+        
+        mock_bpy.data.objects.remove.assert_called_with(obj, do_unlink=True)
+        assert "gone" not in mocked_scene.objects()
+
+
+class TestBpwfPurge:
+    """Test orphan datablock purging."""
+    
+    class _Collection(list):
+        """List-backed stand-in for a bpy.data collection."""
+        
+        def remove(self, datablock):
+            super().remove(datablock)
+            for user in getattr(datablock, 'uses', []):
+                user.users -= 1
+    
+    def _datablock(self, users, **attrs):
+        datablock = MagicMock(spec=['users', 'uses', 'vertices', 'edges', 'loops',
+                                    'polygons'])
+        datablock.users = users
+        datablock.uses = []
+        for key, value in attrs.items():
+            setattr(datablock, key, value)
+        return datablock
+    
+    def test_purge_is_recursive(self, mocked_scene, mock_bpy):
+        """Test that orphaned meshes and the materials they used are removed."""
+        material = MagicMock(spec=['users'])
+        material.users = 1
+        orphan = self._datablock(0, vertices=[0] * 10, edges=[], loops=[], polygons=[])
+        orphan.uses = [material]
+        used = self._datablock(1, vertices=[], edges=[], loops=[], polygons=[])
+        for key in ('meshes', 'curves', 'lights', 'cameras', 'materials',
+                    'node_groups', 'images'):
+            setattr(mock_bpy.data, key, self._Collection())
+        mock_bpy.data.meshes.extend([orphan, used])
+        mock_bpy.data.materials.append(material)
+        
+        report = mocked_scene.purge()
+        
+        assert report["by_type"]["meshes"] == 1
+        assert report["by_type"]["materials"] == 1
+        assert report["datablocks"] == 2
+        assert report["bytes"] == 120
+        assert list(mock_bpy.data.meshes) == [used]
+    
+    def test_registered_materials_kept(self, mocked_scene, mock_bpy):
+        """Test that unassigned scene materials survive until their object is deleted."""
+        for key in ('meshes', 'curves', 'lights', 'cameras', 'materials',
+                    'node_groups', 'images'):
+            setattr(mock_bpy.data, key, self._Collection())
+        steel = MagicMock(spec=['users', 'name'])
+        steel.users = 0
+        color = MagicMock(spec=['users', 'name'])
+        color.users = 0
+        mock_bpy.data.materials.extend([steel, color])
+        mocked_scene._materials.update({"steel": steel, "part_color": color})
+        mocked_scene._register("part", MagicMock())
+        
+        assert mocked_scene.purge()["datablocks"] == 0
+        
+        mocked_scene.delete("part")
+        report = mocked_scene.purge()
+        
+        assert report["by_type"]["materials"] == 1
+        assert list(mock_bpy.data.materials) == [steel]
+    
+    def test_auto_purge_after_delete(self, mocked_scene):
+        """Test that auto_purge purges after deleting an object."""
+        from unittest.mock import patch
+        
+        mocked_scene.auto_purge(points=('delete',))
+        mocked_scene._register("tmp", MagicMock())
+        with patch.object(type(mocked_scene), "purge") as purge:
+            mocked_scene.delete("tmp")
+        
+        purge.assert_called_once()
+
+
+class TestBpwfFraming:
+    """Test automatic camera framing."""
+    
+    def _box(self, offset):
+        import numpy as np
+        
+        obj = MagicMock()
+        obj.type = 'MESH'
+        obj.hide_render = False
+        obj.bound_box = [[x, y, z] for x in (-1, 1) for y in (-1, 1) for z in (-1, 1)]
+        matrix = np.eye(4)
+        matrix[:3, 3] = offset
+        obj.matrix_world = matrix
+        return obj
+    
+    def test_bounds(self, mocked_scene):
+        """Test world-space bounds across several objects."""
+        mocked_scene.scene.objects = [self._box([0, 0, 0]), self._box([10, 0, 0])]
+        
+        low, high = mocked_scene.bounds()
+        
+        assert list(low) == [-1, -1, -1]
+        assert list(high) == [11, 1, 1]
+    
+    def test_perspective_framing_keeps_direction(self, mock_bpy):
+        """Test that the camera moves along its direction until the scene fits."""
+        import numpy as np
+        from bpwf import bpwf
+        
+        location, _ = bpwf._framing((10, 0, 0), (0, 0, 0), 1.0, True,
+                                    np.pi / 2, (100, 100), 1.0)
+        
+        assert np.allclose(location, [np.sqrt(2), 0, 0])
+    
+    def test_ortho_framing_scale(self, mock_bpy):
+        """Test that the orthographic scale covers the narrow dimension."""
+        from bpwf import bpwf
+        
+        _, scale = bpwf._framing((0, 0, 5), (0, 0, 0), 2.0, False, 0.8,
+                                 (200, 100), 1.0)
+        
+        assert scale == 8.0
+
+
+class TestBpwfAssemblies:
+    """Test reusable assemblies placed as collection instances."""
+    
+    def test_assembly_collects_new_objects(self, mocked_scene, mock_bpy):
+        """Test that objects created in the block move into the assembly."""
+        before = MagicMock()
+        part = MagicMock()
+        mocked_scene._register("before", before)
+        
+        with mocked_scene.assembly("module"):
+            mocked_scene._register("part", part)
+        
+        coll = mock_bpy.data.collections.new.return_value
+        coll.objects.link.assert_called_once_with(part)
+        assert mocked_scene.objects() == ["before"]
+        assert mocked_scene._assemblies["module"] is coll
+    
+    def test_place_many(self, mocked_scene, mock_bpy):
+        """Test placing an assembly from arrays of transforms."""
+        import numpy as np
+        
+        with mocked_scene.assembly("module"):
+            pass
+        placements = mocked_scene.place_many("module", np.zeros((5, 3)), scales=np.full(5, 2.0))
+        
+        assert len(placements) == 5
+        assert placements[0].instance_type == 'COLLECTION'
+        assert placements[0].scale == (2.0, 2.0, 2.0)
+        assert mocked_scene.objects() == [f"module_{i}" for i in range(5)]
+        assert [op["op"] for op in mocked_scene.spec()["ops"]] == [
+            "begin_assembly", "end_assembly", "place_many"]
+
+
+class TestBpwfLines:
+    """Test line drawing backends."""
+    
+    def test_freestyle_scoped_to_group(self, mocked_scene):
+        """Test that the Freestyle line set only selects the freestyle group."""
+        mocked_scene._setup_lines(True, 'freestyle')
+        
+        settings = mocked_scene.scene.view_layers[0].freestyle_settings
+        lineset = settings.linesets.get.return_value
+        assert mocked_scene.scene.render.use_freestyle is True
+        assert lineset.select_by_collection is True
+        assert lineset.collection is mocked_scene.fg
+    
+    def test_unknown_backend(self, mocked_scene):
+        """Test that an unknown line backend is rejected."""
+        with pytest.raises(ValueError):
+            mocked_scene._setup_lines(True, 'ink')
+    
+    def test_line_time_reported(self, mocked_scene, mock_bpy):
+        """Test that the Freestyle pass is timed separately from shading."""
+        import time
+        
+        handlers = []
+        mock_bpy.app.handlers.render_stats = handlers
+        
+        def render(**kwargs):
+            time.sleep(0.01)
+            for handler in list(handlers):
+                handler("Freestyle Rendering")
+            time.sleep(0.01)
+        
+        mock_bpy.ops.render.render.side_effect = render
+        timings = mocked_scene._timed_render('freestyle')
+        
+        assert timings["lines"] > 0
+        assert timings["shading"] > 0
+        assert abs(timings["lines"] + timings["shading"] - timings["total"]) < 1e-6
+        assert handlers == []
+
+
+    def test_lineart_time_from_render_stats(self, mocked_scene, mock_bpy):
+        """Test that Line Art is timed inside the render, without a separate evaluation."""
+        import time
+        
+        handlers = []
+        mock_bpy.app.handlers.render_stats = handlers
+        mocked_scene.scene.name = "Scene"
+        
+        def render(**kwargs):
+            for message in ("Synchronizing object | bpwf_lineart_Scene",
+                            "Rendering 1 / 20 samples"):
+                for handler in list(handlers):
+                    handler(message)
+                time.sleep(0.01)
+        
+        mock_bpy.ops.render.render.side_effect = render
+        timings = mocked_scene._timed_render('lineart')
+        
+        assert 0.005 < timings["lines"] < timings["total"]
+        assert abs(timings["lines"] + timings["shading"] - timings["total"]) < 1e-6
+        mock_bpy.context.evaluated_depsgraph_get.assert_not_called()
+        assert handlers == []
+
+
+class TestBpwfLayeredRender:
+    """Test per-layer render caching and compositing."""
+    
+    def test_alpha_over(self, mock_bpy):
+        """Test compositing a half-transparent layer over an opaque one."""
+        import numpy as np
+        from bpwf.bpwf import _alpha_over
+        
+        top = np.array([[[1., 0., 0., 0.5]]])
+        bottom = np.array([[[0., 0., 1., 1.]]])
+        
+        assert np.allclose(_alpha_over(top, bottom), [[[0.5, 0., 0.5, 1.]]])
+        assert np.allclose(_alpha_over(np.zeros((1, 1, 4)), np.zeros((1, 1, 4))), 0.)
+    
+    def test_only_changed_layer_rerenders(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that changing the overlay re-renders only the overlay."""
+        import os
+        import numpy as np
+        import matplotlib.image as mpimg
+        
+        solid = self._obj("solid")
+        glass = self._obj("glass")
+        mocked_scene.scene.objects = [solid, glass]
+        mocked_scene.tg.objects = [glass]
+        rendered = []
+        
+        def render(**kwargs):
+            path = mocked_scene.scene.render.filepath
+            rendered.append(os.path.basename(path))
+            mpimg.imsave(path, np.ones((4, 4, 4)))
+        
+        mock_bpy.ops.render.render.side_effect = render
+        mock_bpy.app.handlers.render_stats = []
+        output = os.path.join(temp_dir, "out.png")
+        state = {"objects": {"solid": "a", "glass": "b"}, "materials": {}, "settings": {}}
+        
+        first = mocked_scene._render_layers(state, output, False)
+        state["objects"]["glass"] = "c"
+        second = mocked_scene._render_layers(state, output, False)
+        
+        assert first == ["opaque", "transparent"]
+        assert second == ["transparent"]
+        assert rendered == ["out_opaque.png", "out_transparent.png", "out_transparent.png"]
+        assert os.path.exists(output)
+        assert solid.is_holdout is False
+    
+    def test_light_change_rerenders_all_layers(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that lights and the camera are part of every layer's cache key."""
+        import os
+        import numpy as np
+        import matplotlib.image as mpimg
+        
+        solid = self._obj("solid")
+        glass = self._obj("glass")
+        lamp = self._obj("L")
+        lamp.type = 'LIGHT'
+        mocked_scene.scene.objects = [solid, glass, lamp]
+        mocked_scene.tg.objects = [glass]
+        
+        def render(**kwargs):
+            mpimg.imsave(mocked_scene.scene.render.filepath, np.ones((4, 4, 4)))
+        
+        mock_bpy.ops.render.render.side_effect = render
+        mock_bpy.app.handlers.render_stats = []
+        output = os.path.join(temp_dir, "out.png")
+        state = {"objects": {"solid": "a", "glass": "b", "L": "dim"},
+                 "materials": {}, "settings": {}}
+        
+        mocked_scene._render_layers(state, output, False)
+        state["objects"]["L"] = "bright"
+        
+        assert mocked_scene._render_layers(state, output, False) == ["opaque", "transparent"]
+    
+    def _obj(self, name, hide_render=False, is_holdout=False):
+        obj = MagicMock(type='MESH', material_slots=[], hide_render=hide_render,
+                        is_holdout=is_holdout)
+        obj.name = name
+        return obj
+    
+    def test_visibility_restored(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that hidden and holdout objects keep their own settings."""
+        import os
+        import numpy as np
+        import matplotlib.image as mpimg
+        
+        solid = self._obj("solid")
+        mask = self._obj("mask", is_holdout=True)
+        hidden = self._obj("hidden", hide_render=True)
+        glass = self._obj("glass")
+        mocked_scene.scene.objects = [solid, mask, hidden, glass]
+        mocked_scene.tg.objects = [glass]
+        visible = []
+        
+        def render(**kwargs):
+            visible.append({obj.name for obj in mocked_scene.scene.objects
+                            if not obj.hide_render})
+            mpimg.imsave(mocked_scene.scene.render.filepath, np.ones((4, 4, 4)))
+        
+        mock_bpy.ops.render.render.side_effect = render
+        mock_bpy.app.handlers.render_stats = []
+        state = {"objects": {}, "materials": {}, "settings": {}}
+        
+        mocked_scene._render_layers(state, os.path.join(temp_dir, "out.png"), False)
+        
+        assert visible == [{"solid", "mask"}, {"solid", "mask", "glass"}]
+        assert hidden.hide_render is True
+        assert mask.is_holdout is True
+        assert solid.is_holdout is False and glass.hide_render is False
+
+
+class TestBpwfRestyle:
+    """Test recompositing kept alpha renders."""
+    
+    def _alpha_render(self, scene, temp_dir):
+        import os
+        import numpy as np
+        import matplotlib.image as mpimg
+        
+        scene.path = temp_dir
+        image = np.zeros((8, 8, 4))
+        image[2:6, 2:6] = (0.5, 0.5, 0.5, 1.)
+        mpimg.imsave(os.path.join(temp_dir, f"{scene.filename}_alpha.png"), image)
+    
+    def test_background_and_exposure(self, mocked_scene, temp_dir):
+        """Test replacing the background and brightening the foreground."""
+        import matplotlib.image as mpimg
+        
+        self._alpha_render(mocked_scene, temp_dir)
+        path = mocked_scene.restyle(bg_color=(0., 0., 1.), transparent=False,
+                                    exposure=1.0, filename="journal")
+        image = mpimg.imread(path)
+        
+        assert path.endswith("journal.png")
+        assert tuple(image[0, 0]) == (0., 0., 1., 1.)
+        assert abs(image[4, 4, 0] - 1.0) < 0.01
+    
+    def test_outline(self, mocked_scene, temp_dir):
+        """Test drawing a silhouette outline around the foreground."""
+        import matplotlib.image as mpimg
+        
+        self._alpha_render(mocked_scene, temp_dir)
+        image = mpimg.imread(mocked_scene.restyle(outline=1, outline_color=(1., 0., 0.)))
+        
+        assert tuple(image[1, 3]) == (1., 0., 0., 1.)
+        assert image[0, 0, 3] == 0.
+    
+    def test_requires_alpha_render(self, mocked_scene, temp_dir):
+        """Test that restyling without a kept alpha render fails."""
+        mocked_scene.path = temp_dir
+        with pytest.raises(FileNotFoundError):
+            mocked_scene.restyle()
+
+
+class TestBpwfVolumes:
+    """Test volumes built from in-memory arrays."""
+    
+    def test_downsample(self, mock_bpy):
+        """Test block averaging, including padding of ragged edges."""
+        import numpy as np
+        from bpwf.bpwf import _downsample
+        
+        arr = np.arange(27, dtype=np.float32).reshape(3, 3, 3)
+        
+        assert np.array_equal(_downsample(arr, 1), arr)
+        assert _downsample(np.ones((4, 4, 4)), 2).shape == (2, 2, 2)
+        assert _downsample(arr, 2).shape == (2, 2, 2)
+        assert _downsample(arr, 3)[0, 0, 0] == arr.mean()
+    
+    def test_colormap_stops(self, mock_bpy):
+        """Test sampling a matplotlib colormap into ramp stops."""
+        from bpwf.bpwf import _colormap_stops
+        
+        stops = _colormap_stops('viridis', 4)
+        
+        assert [pos for pos, _ in stops] == [0., 1. / 3., 2. / 3., 1.]
+        assert len(stops[0][1]) == 4
+    
+    def test_pyramid_levels(self, mocked_scene, mock_bpy, temp_dir, monkeypatch):
+        """Test writing one sparse grid per level and switching for drafts."""
+        import sys
+        import numpy as np
+        
+        vdb = MagicMock()
+        monkeypatch.setitem(sys.modules, "pyopenvdb", vdb)
+        mocked_scene.path = temp_dir
+        obj = MagicMock()
+        obj.data = mock_bpy.data.volumes.new.return_value
+        obj.data.users = 1
+        mock_bpy.data.objects.new.return_value = obj
+        
+        mocked_scene.volume_from_array(np.random.rand(16, 16, 16), spacing=0.5,
+                                       name="dose", threshold=0.1)
+        paths = mocked_scene._volumes["dose"]
+        
+        assert sorted(paths) == [1, 2, 4, 8]
+        assert vdb.write.call_count == 4
+        assert vdb.FloatGrid.return_value.copyFromArray.call_args[1]["tolerance"] == 0.1
+        assert obj.data.filepath == paths[1]
+        
+        mocked_scene._select_volume_levels(draft=True)
+        assert obj.data.filepath == paths[8]
+
+
+class TestBpwfIsosurface:
+    """Test isosurface extraction into meshes."""
+    
+    def _sphere(self):
+        import numpy as np
+        
+        g = np.linspace(-1, 1, 21)
+        x, y, z = np.meshgrid(g, g, g, indexing='ij')
+        return 1. - np.sqrt(x**2 + y**2 + z**2), g[1] - g[0]
+    
+    def test_closed_outward_surface(self, mock_bpy):
+        """Test that chunked extraction gives one closed, outward-facing surface."""
+        import numpy as np
+        from bpwf.bpwf import _isosurface
+        
+        field, spacing = self._sphere()
+        vertices, faces, normals = _isosurface(field, 0.52, spacing, (-1, -1, -1), chunk=4)
+        
+        radii = np.linalg.norm(vertices, axis=1)
+        assert np.allclose(radii, 0.48, atol=0.02)
+        edges = np.concatenate([faces[:, [0, 1]], faces[:, [1, 2]], faces[:, [2, 0]]])
+        assert len(np.unique(edges, axis=0)) == len(edges)
+        assert len(np.unique(np.sort(edges, axis=1), axis=0)) * 2 == len(edges)
+        face_normals = np.cross(vertices[faces[:, 1]] - vertices[faces[:, 0]],
+                                vertices[faces[:, 2]] - vertices[faces[:, 0]])
+        assert (np.einsum('ij,ij->i', face_normals, vertices[faces].mean(axis=1)) > 0).all()
+        assert (np.einsum('ij,ij->i', normals, vertices) > 0).all()
+        
+        whole = _isosurface(field, 0.52, spacing, (-1, -1, -1), chunk=100)
+        assert whole[1].shape == faces.shape
+    
+    def test_isosurface_mesh_and_decimate(self, mocked_scene, mock_bpy):
+        """Test that the surface is meshed with normals and decimated to a budget."""
+        field, spacing = self._sphere()
+        obj = MagicMock()
+        obj.modifiers.get.return_value = None
+        mock_bpy.data.objects.new.return_value = obj
+        
+        mocked_scene.isosurface(field, 0.52, spacing=spacing, name="iso",
+                                target_triangles=100)
+        
+        mesh = mock_bpy.data.meshes.new.return_value
+        mesh.normals_split_custom_set_from_vertices.assert_called_once()
+        modifier = obj.modifiers.new.return_value
+        assert modifier.decimate_type == 'COLLAPSE'
+        assert 0 < modifier.ratio < 1
+    
+    def test_no_surface(self, mocked_scene):
+        """Test that a level outside the data range is rejected."""
+        field, _ = self._sphere()
+        with pytest.raises(ValueError):
+            mocked_scene.isosurface(field, 5.0)
+
+
+class TestBpwfAnimation:
+    """Test streaming time-series animation."""
+    
+    def test_npz_members_memory_mapped(self, mock_bpy, temp_dir):
+        """Test that stored .npz members are memory-mapped per frame."""
+        import os
+        import numpy as np
+        from bpwf.frames import FrameSource
+        
+        path = os.path.join(temp_dir, "run.npz")
+        positions = np.random.rand(5, 10, 3)
+        np.savez(path, positions=positions, dose=np.random.rand(5, 10))
+        source = FrameSource(path)
+        
+        assert len(source) == 5
+        assert sorted(source.fields) == ["dose", "positions"]
+        assert isinstance(source._arrays["positions"], np.memmap)
+        assert np.allclose(source.read(3)["positions"], positions[3])
+    
+    def test_frame_files(self, mock_bpy, temp_dir):
+        """Test reading one .npz file per frame."""
+        import os
+        import numpy as np
+        from bpwf.frames import FrameSource
+        
+        paths = []
+        for i in range(3):
+            paths.append(os.path.join(temp_dir, f"f{i}.npz"))
+            np.savez(paths[-1], positions=np.full((4, 3), i))
+        
+        assert FrameSource(paths).read(2)["positions"][0, 0] == 2
+    
+    def test_animate_streams_frames(self, mocked_scene, mock_bpy, monkeypatch):
+        """Test that each frame updates the mesh in bulk and renders once."""
+        import numpy as np
+        
+        obj = MagicMock()
+        obj.data.users = 1
+        obj.data.vertices.__len__.return_value = 10
+        obj.data.attributes.get.return_value = None
+        mocked_scene._register("cloud", obj)
+        rendered = []
+        monkeypatch.setattr(mocked_scene, "render",
+                            lambda **kw: rendered.append((mocked_scene.filename, kw)))
+        data = {"positions": np.random.rand(4, 10, 3), "dose": np.random.rand(4, 10)}
+        
+        paths = mocked_scene.animate("cloud", data, frames=[0, 2, 3], samples=8)
+        
+        assert [name for name, _ in rendered] == ["brender_01_0000", "brender_01_0002",
+                                                  "brender_01_0003"]
+        assert rendered[0][1]["persistent"] is True
+        assert rendered[1][1]["fit"] is False
+        assert len(paths) == 3 and mocked_scene.filename == "brender_01"
+        co = obj.data.vertices.foreach_set.call_args[0][1]
+        assert np.allclose(co, data["positions"][3].ravel())
+        obj.data.attributes.new.assert_called_with("dose", 'FLOAT', 'POINT')
+    
+    def test_topology_must_match(self, mocked_scene, mock_bpy, monkeypatch):
+        """Test rejecting frames with a different vertex count."""
+        import numpy as np
+        
+        obj = MagicMock()
+        obj.data.users = 1
+        obj.data.vertices.__len__.return_value = 10
+        mocked_scene._register("cloud", obj)
+        monkeypatch.setattr(mocked_scene, "render", lambda **kw: None)
+        
+        with pytest.raises(ValueError):
+            mocked_scene.animate("cloud", {"positions": np.zeros((2, 5, 3))})
+        assert mocked_scene.filename == "brender_01"
+
+
+class TestBpwfScalarColor:
+    """Test per-vertex scalar coloring."""
+    
+    def _obj(self, mocked_scene, name, n=6):
+        obj = MagicMock()
+        obj.data.users = 1
+        obj.data.vertices.__len__.return_value = n
+        obj.data.attributes.get.return_value = None
+        mocked_scene._register(name, obj)
+        return obj
+    
+    def test_color_by_shares_material(self, mocked_scene, mock_bpy):
+        """Test that objects with the same mapping share one material."""
+        import numpy as np
+        
+        mock_bpy.data.materials.new.side_effect = lambda name: MagicMock(name=name)
+        first = self._obj(mocked_scene, "a")
+        second = self._obj(mocked_scene, "b")
+        
+        matl = mocked_scene.color_by("a", np.linspace(0, 1, 6), attribute="dose",
+                                     colormap="inferno", clim=(0, 10))
+        mocked_scene.color_by("b", np.zeros(6), attribute="dose", colormap="inferno",
+                              clim=(0, 10))
+        
+        assert matl == "dose_inferno_0_10"
+        assert mock_bpy.data.materials.new.call_count == 1
+        assert first.active_material is second.active_material
+        first.data.attributes.new.assert_called_with("dose", 'FLOAT', 'POINT')
+    
+    def test_default_limits(self, mocked_scene, mock_bpy):
+        """Test that limits default to the range of the values."""
+        import numpy as np
+        
+        self._obj(mocked_scene, "a")
+        
+        assert mocked_scene.color_by("a", np.arange(6.)) == "scalar_viridis_0_5"
+    
+    def test_shared_mesh_copied(self, mocked_scene, mock_bpy):
+        """Test that coloring an object does not write to a mesh it shares."""
+        import numpy as np
+        
+        obj = self._obj(mocked_scene, "a")
+        shared = obj.data
+        shared.users = 2
+        copied = shared.copy.return_value
+        copied.users = 1
+        copied.vertices.__len__.return_value = 6
+        copied.attributes.get.return_value = None
+        
+        mocked_scene.color_by("a", np.zeros(6), attribute="dose")
+        
+        assert obj.data is copied
+        copied.attributes.new.assert_called_with("dose", 'FLOAT', 'POINT')
+        shared.attributes.new.assert_not_called()
+    
+    def test_length_must_match(self, mocked_scene, mock_bpy):
+        """Test rejecting values that do not match the vertex count."""
+        import numpy as np
+        
+        self._obj(mocked_scene, "a")
+        with pytest.raises(ValueError):
+            mocked_scene.color_by("a", np.zeros(3))
+
+
+class TestBpwfGeometryCache:
+    """Test the on-disk cache for booleans and generated meshes."""
+    
+    def test_hit_miss_and_eviction(self, mock_bpy, temp_dir):
+        """Test storing, restoring and evicting cached arrays."""
+        import os
+        import numpy as np
+        from bpwf.geometry_cache import GeometryCache
+        
+        cache = GeometryCache(temp_dir, max_bytes=1)
+        first = cache.key("boolean", np.arange(3.), "DIFFERENCE")
+        second = cache.key("boolean", np.arange(3.), "UNION")
+        
+        assert first != second
+        assert cache.get(first) is None
+        cache.put(first, co=np.arange(3.))
+        assert cache.get(first)["co"].tolist() == [0., 1., 2.]
+        os.utime(os.path.join(temp_dir, f"{first}.npz"), (0, 0))
+        cache.put(second, co=np.zeros(3))
+        
+        stats = cache.stats()
+        assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+        assert stats["entries"] == 1
+        assert cache.get(first) is None
+    
+    def test_boolean_restored_from_cache(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that a repeated boolean is restored instead of recomputed."""
+        import numpy as np
+        
+        mocked_scene.geometry_cache(temp_dir)
+        for _ in range(2):
+            mocked_scene._register("a", self._operand())
+            mocked_scene._register("b", self._operand())
+            mocked_scene.subtract("a", "b")
+        
+        assert mock_bpy.ops.object.modifier_apply.call_count == 1
+        stats = mocked_scene._geometry_cache.stats()
+        assert (stats["hits"], stats["misses"], stats["writes"]) == (1, 1, 1)
+    
+    def _operand(self, uv=None, custom_normals=False):
+        import numpy as np
+        
+        obj = MagicMock()
+        obj.matrix_world = np.eye(4)
+        obj.data.users = 1
+        obj.data.materials = []
+        meshes = (obj.data, obj.evaluated_get.return_value.to_mesh.return_value)
+        for mesh in meshes:
+            for collection in (mesh.vertices, mesh.loops, mesh.polygons):
+                collection.__len__.return_value = 0
+            mesh.has_custom_normals = custom_normals
+        if uv is not None:
+            attr = MagicMock(domain='CORNER', data_type='FLOAT2')
+            attr.name = "UVMap"
+            attr.data.__len__.return_value = len(uv) // 2
+            attr.data.foreach_get.side_effect = lambda field, out: out.__setitem__(
+                slice(None), uv)
+            obj.data.attributes.__iter__.return_value = [attr]
+        return obj
+    
+    def test_boolean_cache_restores_uvs(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that UV maps of the result are stored and restored."""
+        import numpy as np
+        
+        uv = np.array([0., 0., 1., 0., 1., 1.], dtype=np.float32)
+        mocked_scene.geometry_cache(temp_dir)
+        for _ in range(2):
+            mocked_scene._register("a", self._operand(uv))
+            mocked_scene._register("b", self._operand())
+            mocked_scene.subtract("a", "b")
+        
+        restored = mock_bpy.data.meshes.new.return_value
+        restored.attributes.new.assert_called_once_with("UVMap", 'FLOAT2', 'CORNER')
+        values = restored.attributes.new.return_value.data.foreach_set.call_args[0][1]
+        assert np.array_equal(values, uv)
+    
+    def test_custom_normals_skip_cache(self, mocked_scene, mock_bpy, temp_dir):
+        """Test that operands with custom normals are always recomputed."""
+        mocked_scene.geometry_cache(temp_dir)
+        for _ in range(2):
+            mocked_scene._register("a", self._operand(custom_normals=True))
+            mocked_scene._register("b", self._operand())
+            mocked_scene.subtract("a", "b")
+        
+        assert mock_bpy.ops.object.modifier_apply.call_count == 2
+        assert mocked_scene._geometry_cache.stats()["writes"] == 0
+    
+    def test_disable(self, mocked_scene, temp_dir):
+        """Test turning the cache off."""
+        mocked_scene.geometry_cache(temp_dir)
+        
+        assert mocked_scene.geometry_cache(False) is None
+        assert mocked_scene._geometry_cache is None
+
+
+class TestBpwfCutaway:
+    """Test shader-based cutaway planes."""
+    
+    def _material(self):
+        output = MagicMock(bl_idname='ShaderNodeOutputMaterial', is_active_output=True)
+        material = MagicMock(use_nodes=True, users=2, use_fake_user=False)
+        material.name = "steel"
+        material.node_tree.nodes.__iter__.return_value = [output]
+        material.node_tree.nodes.get.return_value = None
+        return material, output
+    
+    def test_cut_inserted_once_per_material(self, mocked_scene, mock_bpy):
+        """Test that shared materials get one clip stage driven by the plane."""
+        material, output = self._material()
+        objects = []
+        for name in ("a", "b"):
+            obj = MagicMock(type='MESH')
+            obj.material_slots = [MagicMock(material=material)]
+            mocked_scene._register(name, obj)
+            objects.append(obj)
+        mocked_scene.scene.objects.__iter__.return_value = objects
+        mock_bpy.data.objects.get.return_value = None
+        
+        plane = mocked_scene.cutaway(location=(1, 0, 0), normal=(0, 0, -1),
+                                     objects=["a", "b"])
+        
+        assert plane.location == (1, 0, 0)
+        assert plane.rotation_quaternion == (0., 1., 0., 0.)
+        created = [c[0][0] for c in material.node_tree.nodes.new.call_args_list]
+        assert created.count("ShaderNodeMixShader") == 1
+        assert material.node_tree.nodes.new.return_value.object is plane
+        last_link = material.node_tree.links.new.call_args_list[-1][0]
+        assert last_link[1] is output.inputs[0]
+    
+    def test_moving_plane_does_not_rebuild(self, mocked_scene, mock_bpy):
+        """Test that a second call only moves the plane and retargets the cut."""
+        material, _ = self._material()
+        material.users = 1
+        obj = MagicMock(type='MESH')
+        obj.material_slots = [MagicMock(material=material)]
+        mocked_scene._register("a", obj)
+        mocked_scene.scene.objects.__iter__.return_value = [obj]
+        coords = MagicMock()
+        material.node_tree.nodes.get.return_value = coords
+        
+        plane = mocked_scene.cutaway(location=(2, 0, 0), objects=["a"])
+        
+        material.node_tree.nodes.new.assert_not_called()
+        assert coords.object is plane
+        mock_bpy.ops.object.modifier_apply.assert_not_called()
+    
+    def test_fork_cut_leaves_parent_material(self, mocked_scene, mock_bpy):
+        """Test that cutting a fork copies materials it shares with its parent."""
+        material, _ = self._material()
+        mock_bpy.data.objects.get.return_value = None
+        original = MagicMock(type='MESH')
+        original.name = "a"
+        original.material_slots = [MagicMock(material=material)]
+        mocked_scene._register("a", original)
+        forked_scene = mocked_scene.scene.copy.return_value
+        forked_scene.collection.objects.__iter__.return_value = [original]
+        fork = mocked_scene.fork("variant")
+        clone = fork._lookup("a")
+        clone.type = 'MESH'
+        clone_slot = MagicMock(material=material)
+        clone.material_slots = [clone_slot]
+        forked_scene.objects.__iter__.return_value = [clone]
+        
+        fork.cutaway(objects=["a"])
+        
+        copied = material.copy.return_value
+        assert clone_slot.material is copied
+        assert clone_slot.link == 'OBJECT'
+        assert original.material_slots[0].material is material
+        material.node_tree.nodes.get.assert_not_called()
+        copied.node_tree.nodes.get.assert_called_once_with("bpwf_cut_cutaway_coords")
+    
+    def test_fork_set_matl_leaves_parent_mesh(self, mocked_scene, mock_bpy):
+        """Test that assigning a material in a fork does not touch shared mesh data."""
+        original = MagicMock(type='MESH')
+        original.name = "a"
+        mocked_scene._register("a", original)
+        forked_scene = mocked_scene.scene.copy.return_value
+        forked_scene.collection.objects.__iter__.return_value = [original]
+        fork = mocked_scene.fork("variant")
+        clone = fork._lookup("a")
+        clone.data = original.data
+        clone.data.users = 2
+        clone.material_slots = []
+        shared = clone.data
+        
+        fork.set_matl(obj="a", matl=MagicMock())
+        
+        assert clone.data is shared.copy.return_value
+        assert original.data is shared
+    
+    def test_placement_cuts_assembly_meshes(self, mocked_scene, mock_bpy):
+        """Test that a placement name resolves to the meshes of its assembly."""
+        material, _ = self._material()
+        material.users = 1
+        member = MagicMock(type='MESH')
+        member.material_slots = [MagicMock(material=material)]
+        assembly = MagicMock()
+        assembly.all_objects = [member]
+        placement = MagicMock(type='EMPTY', instance_type='COLLECTION',
+                              instance_collection=assembly)
+        mocked_scene._register("p1", placement)
+        mocked_scene._assemblies["widget"] = assembly
+        mock_bpy.data.objects.get.return_value = None
+        
+        mocked_scene.cutaway(objects=["p1"])
+        
+        assert material.copy.call_count == 0
+        assert "ShaderNodeMixShader" in [c[0][0] for c in
+                                         material.node_tree.nodes.new.call_args_list]
+    
+    def test_unmaterialed_mesh_gets_default(self, mocked_scene, mock_bpy):
+        """Test that meshes without a material get a plain one carrying the cut."""
+        mock_bpy.data.materials.new.side_effect = lambda name: MagicMock(
+            use_nodes=False, users=1, use_fake_user=False, diffuse_color=(0.6,) * 4)
+        bare = MagicMock(type='MESH', material_slots=[])
+        bare.data.users = 1
+        bare.data.materials.append.side_effect = lambda m: bare.material_slots.append(
+            MagicMock(material=m))
+        mocked_scene._register("bare", bare)
+        mocked_scene.scene.objects.__iter__.return_value = [bare]
+        mock_bpy.data.objects.get.return_value = None
+        mock_bpy.data.materials.__contains__.return_value = False
+        
+        mocked_scene.cutaway(name="x", objects=["bare"])
+        
+        default = mocked_scene._materials["bpwf_cut_x_default"]
+        bare.data.materials.append.assert_called_once_with(default)
+        assert default.use_nodes is True
+    
+    def test_plane_scoped_to_scene(self, mocked_scene, mock_bpy):
+        """Test that each scene gets its own plane and reuses it."""
+        from bpwf import bpwf
+        
+        mock_bpy.data.objects.new.side_effect = lambda name, data: MagicMock()
+        other = bpwf(default_light=False)
+        other.scene = MagicMock()
+        
+        first = mocked_scene.cutaway("c", objects=[])
+        again = mocked_scene.cutaway("c", location=(0, 0, 5), objects=[])
+        elsewhere = other.cutaway("c", location=(1, 0, 0), objects=[])
+        
+        assert again is first
+        assert elsewhere is not first
+        assert first.location == (0, 0, 5)
+        other.scene.collection.objects.link.assert_called_with(elsewhere)
+    
+    def test_unknown_object(self, mocked_scene, mock_bpy):
+        """Test that cutting a missing object fails."""
+        mock_bpy.data.objects.get.return_value = None
+        with pytest.raises(KeyError):
+            mocked_scene.cutaway(objects=["missing"])
+
+
+class TestBpwfAnnotations:
+    """Test the 2D annotation overlay."""
+    
+    @pytest.fixture
+    def rendered(self, mocked_scene, temp_dir, monkeypatch):
+        """A scene with a white 100x50 render and a fixed projection."""
+        import os
+        import numpy as np
+        import matplotlib.image as mpimg
+        
+        mocked_scene.path = temp_dir
+        mocked_scene.scene.render.resolution_x = 100
+        mocked_scene.scene.render.resolution_percentage = 100
+        mpimg.imsave(os.path.join(temp_dir, "brender_01.png"), np.ones((50, 100, 3)))
+        # Map world x/y straight to pixels for the test
+        monkeypatch.setattr(mocked_scene, "_project",
+                            lambda points: np.array([[p[0], p[1]] for p in points]))
+        camera = MagicMock()
+        camera.matrix_world = np.eye(4)
+        monkeypatch.setattr(mocked_scene, "_camera", lambda: camera)
+        return mocked_scene
+    
+    def test_annotate_does_not_rerender(self, rendered, mock_bpy):
+        """Test drawing labels, leaders and scale bars onto the render."""
+        import os
+        import matplotlib.image as mpimg
+        
+        rendered.label("core", (20, 25, 0), offset=(30, 10), color='red')
+        rendered.leader((10, 40, 0), (90, 40, 0), color='blue', linewidth=3)
+        rendered.scale_bar(20, label="20 cm", anchor=(0, 0, 0))
+        path = rendered.annotate()
+        
+        image = mpimg.imread(path)
+        assert path.endswith("brender_01_annotated.png")
+        assert image.shape[:2] == (50, 100)
+        assert image[40, 50, 2] > 0.5 and image[40, 50, 0] < 0.5
+        assert os.path.exists(os.path.join(rendered.path, "brender_01_overlay.png"))
+        mock_bpy.ops.render.render.assert_not_called()
+    
+    def test_clear_annotations(self, rendered):
+        """Test that clearing leaves the render unchanged."""
+        import numpy as np
+        import matplotlib.image as mpimg
+        
+        rendered.label("core", (20, 25, 0))
+        rendered.clear_annotations()
+        
+        assert np.allclose(mpimg.imread(rendered.annotate())[..., :3], 1.)
+    
+    def test_requires_render(self, mocked_scene, temp_dir):
+        """Test that annotating before rendering fails."""
+        mocked_scene.path = temp_dir
+        with pytest.raises(FileNotFoundError):
+            mocked_scene.annotate()
@@ -0,0 +1,358 @@
+"""
+Tests for the bpwf MCP server tools.
+"""
+
+from pathlib import Path
+import pytest
+from unittest.mock import MagicMock
+
+
+def _fake_scene(content_hash="abc123"):
+    """Build a mock bpwf scene whose render writes an empty PNG."""
+    scene = MagicMock()
+    scene.path = "/original"
+    scene.filename = "original"
+    scene.has_run = False
+    scene.content_hash.return_value = content_hash
+
+    def render(**kwargs):
+        Path(scene.path, f"{scene.filename}.png").write_bytes(b"png")
+
+    scene.render.side_effect = render
+    return scene
+
+
+class TestPreviewScene:
+    """Test the cached preview_scene tool."""
+
+    def test_missing_scene(self, mock_mcp_scenes):
+        """Test previewing a scene that does not exist."""
+        from bpwf.mcp_server import preview_scene
+
+        assert preview_scene("missing").startswith("Error")
+
+    def test_preview_is_cached(self, mock_mcp_scenes, temp_dir, monkeypatch):
+        """Test that an unchanged scene is rendered only once."""
+        from bpwf import mcp_server
+
+        monkeypatch.setattr(mcp_server, "_PREVIEW_DIR", Path(temp_dir))
+        scene = _fake_scene()
+        mock_mcp_scenes["s"] = scene
+
+        first = mcp_server.preview_scene("s")
+        second = mcp_server.preview_scene("s")
+
+        assert scene.render.call_count == 1
+        assert first.path == second.path
+        assert scene.filename == "original"
+        assert scene.path == "/original"
+
+    def test_preview_rerenders_on_change(self, mock_mcp_scenes, temp_dir, monkeypatch):
+        """Test that a changed scene hash produces a new preview."""
+        from bpwf import mcp_server
+
+        monkeypatch.setattr(mcp_server, "_PREVIEW_DIR", Path(temp_dir))
+        scene = _fake_scene()
+        mock_mcp_scenes["s"] = scene
+
+        mcp_server.preview_scene("s")
+        scene.content_hash.return_value = "def456"
+        mcp_server.preview_scene("s")
+
+        assert scene.render.call_count == 2
+
+
+class TestServerMetrics:
+    """Test per-tool metrics collection."""
+
+    @pytest.fixture(autouse=True)
+    def clean_metrics(self, monkeypatch):
+        """Start every test with an empty metrics table."""
+        monkeypatch.setattr("bpwf.mcp_server._metrics", {})
+
+    def test_calls_and_errors_recorded(self, mock_mcp_scenes):
+        """Test that tool calls and error results are counted."""
+        import json
+        from bpwf.mcp_server import delete_scene, list_scenes, get_server_metrics
+
+        list_scenes()
+        delete_scene("missing")
+        tools = json.loads(get_server_metrics())["tools"]
+
+        assert tools["list_scenes"]["calls"] == 1
+        assert tools["list_scenes"]["errors"] == 0
+        assert tools["delete_scene"]["errors"] == 1
+        assert sum(tools["delete_scene"]["histogram"]) == 1
+
+    def test_reset(self, mock_mcp_scenes):
+        """Test clearing metrics after reading them."""
+        import json
+        from bpwf.mcp_server import list_scenes, get_server_metrics
+
+        list_scenes()
+        get_server_metrics(reset=True)
+        tools = json.loads(get_server_metrics())["tools"]
+
+        assert "list_scenes" not in tools
+
+    def test_dump_to_file(self, mock_mcp_scenes, temp_dir):
+        """Test writing metrics to a JSON file."""
+        import json
+        import os
+        from bpwf.mcp_server import list_scenes, _dump_metrics
+
+        list_scenes()
+        path = os.path.join(temp_dir, "metrics.json")
+        _dump_metrics(path)
+
+        with open(path) as f:
+            assert json.load(f)["tools"]["list_scenes"]["calls"] == 1
+
+    def test_memory_is_per_call_growth(self, mock_mcp_scenes):
+        """Test that memory is recorded as growth of the peak during a call."""
+        import json
+        from bpwf.mcp_server import list_scenes, get_server_metrics
+
+        list_scenes()
+        metrics = json.loads(get_server_metrics())
+        growth = metrics["tools"]["list_scenes"]["max_peak_growth_mb"]
+
+        assert "peak_rss_mb" not in metrics["tools"]["list_scenes"]
+        assert growth is None or 0.0 <= growth <= metrics["process_peak_rss_mb"]
+
+    def test_autosnapshot_after_successful_calls_only(self, mock_mcp_scenes, monkeypatch):
+        """Test that auto-snapshots run after a call, not on its error path."""
+        from bpwf import mcp_server
+
+        calls = []
+        monkeypatch.setattr(mcp_server, "_maybe_autosnapshot", lambda: calls.append(1))
+
+        @mcp_server._instrumented
+        def failing():
+            raise RuntimeError("boom")
+
+        with pytest.raises(RuntimeError):
+            failing()
+        assert calls == []
+        assert mcp_server._metrics["failing"]["errors"] == 1
+
+        mcp_server.list_scenes()
+        assert calls == [1]
+
+
+class TestArrayUpload:
+    """Test array references for bulk geometry tools."""
+
+    def test_load_npy_is_memory_mapped(self, temp_dir):
+        """Test that .npy references are memory-mapped."""
+        import os
+        import numpy as np
+        from bpwf.mcp_server import _load_array
+
+        path = os.path.join(temp_dir, "pos.npy")
+        np.save(path, np.arange(12.0).reshape(4, 3))
+
+        arr = _load_array(path)
+        assert isinstance(arr, np.memmap)
+        assert arr.shape == (4, 3)
+
+    def test_load_npz_member(self, temp_dir):
+        """Test loading a named member of an .npz archive."""
+        import os
+        import numpy as np
+        from bpwf.mcp_server import _load_array
+
+        path = os.path.join(temp_dir, "mesh.npz")
+        np.savez(path, vertices=np.zeros((3, 3)), faces=np.array([[0, 1, 2]]))
+
+        assert _load_array(f"{path}:faces").tolist() == [[0, 1, 2]]
+        with pytest.raises(ValueError):
+            _load_array(path)
+
+    def test_load_npz_closes_archive(self, temp_dir, monkeypatch):
+        """Test that the .npz archive is closed after reading a member."""
+        import os
+        import numpy as np
+        from bpwf import mcp_server
+
+        path = os.path.join(temp_dir, "mesh.npz")
+        np.savez(path, faces=np.array([[0, 1, 2]]))
+        opened = []
+        load = np.load
+
+        def tracking_load(*args, **kwargs):
+            opened.append(load(*args, **kwargs))
+            return opened[-1]
+
+        monkeypatch.setattr(mcp_server.np, "load", tracking_load)
+        assert mcp_server._load_array(path).tolist() == [[0, 1, 2]]
+        assert opened[0].fid is None
+
+    def test_load_base64(self):
+        """Test loading an inline base64 .npy buffer."""
+        import base64
+        import io
+        import numpy as np
+        from bpwf.mcp_server import _load_array
+
+        buf = io.BytesIO()
+        np.save(buf, np.ones(5))
+        ref = "base64:" + base64.b64encode(buf.getvalue()).decode()
+
+        assert _load_array(ref).sum() == 5
+
+    def test_add_point_cloud(self, mock_mcp_scenes, temp_dir):
+        """Test that the point cloud tool passes arrays to the scene."""
+        import os
+        import numpy as np
+        from bpwf.mcp_server import add_point_cloud
+
+        path = os.path.join(temp_dir, "pos.npy")
+        np.save(path, np.zeros((10, 3)))
+        scene = MagicMock()
+        mock_mcp_scenes["s"] = scene
+
+        result = add_point_cloud("s", "cloud", path, radius=0.2)
+
+        assert "10 points" in result
+        assert scene.points.call_args[1]["radii"] == 0.2
+
+
+class TestSceneSnapshots:
+    """Test persisting scenes across server restarts."""
+
+    @pytest.fixture
+    def snapshot_dir(self, temp_dir, monkeypatch):
+        """Point snapshots at a temporary directory."""
+        monkeypatch.setattr("bpwf.mcp_server._SNAPSHOT_DIR", Path(temp_dir))
+        monkeypatch.setattr("bpwf.mcp_server._snapshot_hashes", {})
+        return Path(temp_dir)
+
+    def _scene(self):
+        scene = MagicMock()
+        scene.content_hash.return_value = "h1"
+
+        def save_snapshot(path):
+            Path(path).write_bytes(b"blend")
+            return {"scene_name": "Scene"}
+
+        scene.save_snapshot.side_effect = save_snapshot
+        return scene
+
+    def test_snapshot_skips_unchanged(self, mock_mcp_scenes, snapshot_dir):
+        """Test that unchanged scenes are not rewritten."""
+        import json
+        from bpwf.mcp_server import snapshot_scene
+
+        mock_mcp_scenes["s"] = self._scene()
+
+        assert json.loads(snapshot_scene("s"))["written"] == ["s"]
+        assert json.loads(snapshot_scene("s"))["unchanged"] == ["s"]
+        assert (snapshot_dir / "s.blend").exists()
+
+    def test_lazy_restore(self, snapshot_dir, monkeypatch):
+        """Test that a snapshotted scene is restored on first access."""
+        from bpwf import mcp_server
+
+        mcp_server._snapshot_scene("s", self._scene())
+        restored = MagicMock()
+        load = MagicMock(return_value=restored)
+        monkeypatch.setattr(mcp_server.bpwf, "load_snapshot", load)
+        store = mcp_server._SceneStore()
+
+        assert "s" in store
+        assert store["s"] is restored
+        assert load.call_args[0][1]["scene_id"] == "s"
+        assert "other" not in store
+
+    def test_delete_removes_snapshot(self, mock_mcp_scenes, snapshot_dir):
+        """Test that deleting a scene removes its snapshot."""
+        from bpwf.mcp_server import snapshot_scene, delete_scene, list_scenes
+
+        mock_mcp_scenes["s"] = self._scene()
+        snapshot_scene("s")
+        delete_scene("s")
+
+        assert not (snapshot_dir / "s.blend").exists()
+        assert '"count": 0' in list_scenes()
+
+
+class TestImageResources:
+    """Test content-addressed rendered image resources."""
+
+    @pytest.fixture
+    def image_dir(self, temp_dir, monkeypatch):
+        """Point the image cache at a temporary directory."""
+        cache = Path(temp_dir) / "images"
+        monkeypatch.setattr("bpwf.mcp_server._IMAGE_DIR", cache)
+        return cache
+
+    def _png(self, path, width=64, height=32, value=0):
+        from PIL import Image as PILImage
+        PILImage.new("RGB", (width, height), (value, 0, 0)).save(path)
+        return str(path)
+
+    def test_store_is_content_addressed(self, image_dir, temp_dir):
+        """Test that identical images share one ETag."""
+        from bpwf.mcp_server import _store_image
+
+        a = _store_image(self._png(Path(temp_dir) / "a.png"))
+        b = _store_image(self._png(Path(temp_dir) / "b.png"))
+        c = _store_image(self._png(Path(temp_dir) / "c.png", value=255))
+
+        assert a == b
+        assert a != c
+        assert len(list(image_dir.glob("*.png"))) == 2
+
+    def test_thumbnail_variant(self, image_dir, temp_dir):
+        """Test serving a downscaled variant."""
+        import io
+        from PIL import Image as PILImage
+        from bpwf.mcp_server import _store_image, rendered_image_thumbnail
+
+        etag = _store_image(self._png(Path(temp_dir) / "a.png"))
+        thumb = PILImage.open(io.BytesIO(rendered_image_thumbnail(etag, 16)))
+
+        assert thumb.size == (16, 8)
+
+    def test_eviction(self, image_dir, temp_dir, monkeypatch):
+        """Test that old images are evicted when the cache is full."""
+        from bpwf.mcp_server import _store_image, rendered_image
+
+        monkeypatch.setattr("bpwf.mcp_server._IMAGE_CACHE_BYTES", 1)
+        old = _store_image(self._png(Path(temp_dir) / "a.png"))
+        new = _store_image(self._png(Path(temp_dir) / "b.png", value=255))
+
+        assert rendered_image(new)
+        with pytest.raises(FileNotFoundError):
+            rendered_image(old)
+
+    def test_eviction_counts_thumbnails(self, image_dir, temp_dir, monkeypatch):
+        """Test that thumbnails count towards the budget and go with their original."""
+        import os
+        from bpwf.mcp_server import _store_image, rendered_image_thumbnail
+
+        old = _store_image(self._png(Path(temp_dir) / "a.png"))
+        rendered_image_thumbnail(old, 16)
+        os.utime(image_dir / f"{old}.png", (0, 0))
+        os.utime(image_dir / f"{old}_16.png", (0, 0))
+        monkeypatch.setattr("bpwf.mcp_server._IMAGE_CACHE_BYTES", 1)
+        new = _store_image(self._png(Path(temp_dir) / "b.png", value=255))
+
+        assert sorted(p.name for p in image_dir.glob("*.png")) == [f"{new}.png"]
+
+    def test_render_scene_reports_etag(self, mock_mcp_scenes, image_dir, temp_dir):
+        """Test that render_scene exposes the image as a resource."""
+        import json
+        from bpwf.mcp_server import render_scene, latest_render
+
+        scene = MagicMock()
+        scene.path = temp_dir
+        scene.filename = "out"
+        scene.run.side_effect = lambda **kw: self._png(Path(temp_dir) / "out.png")
+        mock_mcp_scenes["s"] = scene
+
+        result = render_scene("s")
+        etag = json.loads(latest_render("s"))["etag"]
+
+        assert f"bpwf://images/{etag}" in result